@@ -0,0 +1,69 @@
+"""
+Utilization report of a multi-year synthetic season -> analytics.report() with NumPy against the same aggregates
+counted row by row over get_reservations(), the booked slots of every hour of the week must agree.
+
+    $ python -m benchmarks.bench_analytics [--backend raw] [--years 3] [--courts 6] [--per-year 2500]
+"""
+import argparse
+import os
+import tempfile
+import time
+from collections import Counter
+from datetime import datetime, timedelta
+
+from benchmarks import generator
+from tennis_scheduler.reservation import analytics, slots
+from tennis_scheduler.reservation.database.backend import open_backend
+
+
+def row_by_row(database, start_date: datetime, end_date: datetime) -> tuple:
+    """ booked slots per (weekday, hour) and hours per user, one reservation and one slot at a time """
+    booked, played = Counter(), Counter()
+    for name, start_time, end_time, court in database.get_reservations(start_date, end_date):
+        last = slots.SLOTS_PER_DAY if end_time.date() > start_time.date() else slots.slot_index(end_time)
+        for slot in range(max(slots.slot_index(start_time), 0), min(last, slots.SLOTS_PER_DAY)):
+            booked[start_time.weekday(), slots.slot_time(start_time, slot).hour] += 1
+        played[name] += (end_time - start_time) / timedelta(hours=1)
+    return booked, played
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--backend", choices=["raw", "orm", "memory"], default="raw")
+    parser.add_argument("--years", type=int, default=3)
+    parser.add_argument("--courts", type=int, default=6)
+    parser.add_argument("--per-year", type=int, default=2500,
+                        help="reservations of every court in a year, at most about 2900 fit in one")
+    args = parser.parse_args()
+
+    first_year = generator.FIRST_DAY.year
+    start_date, end_date = datetime(first_year, 1, 1), datetime(first_year + args.years, 1, 1)
+    with tempfile.TemporaryDirectory() as directory:
+        database = open_backend(os.path.join(directory, "season.sqlite"), args.backend, cache_size=0)
+        database.insert_many([row + (court,)
+                              for year in range(first_year, first_year + args.years)
+                              for court in slots.COURT_NUMBERS[:args.courts]
+                              for row in generator.generate(args.per_year, court, first_day=datetime(year, 1, 3))])
+
+        start = time.perf_counter()
+        report = analytics.report(database, start_date, end_date)
+        vectorized = time.perf_counter() - start
+        start = time.perf_counter()
+        booked, played = row_by_row(database, start_date, end_date)
+        rows = time.perf_counter() - start
+        database.close_database()
+
+    assert {(hour["weekday"], hour["hour"]): hour["booked_slots"] for hour in report["hours_of_week"]} == \
+           {(analytics.calendar.day_name[weekday], f"{hour:02d}:00"): booked[weekday, hour]
+            for weekday in range(7) for hour in range(slots.DAY_START // 60, slots.DAY_START // 60 + 11)}
+    assert report["top_users"][0]["hours"] == max(played.values())
+
+    print(f"{args.backend}: {report['reservations']} reservations on {args.courts} courts over {args.years} years, "
+          f"fill rate {report['fill_rate']:.1%}")
+    print(f"{'report (NumPy)':<20}{vectorized * 1e3:>10.0f} ms")
+    print(f"{'row by row':<20}{rows * 1e3:>10.0f} ms")
+    print(f"speedup {rows / vectorized:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+"""
+Lookups of the current season on files with more and more past seasons -> before and after archiving the past ones,
+archived the times should stay flat as the years pile up, the unified read of an archived range is measured too.
+
+    $ python -m benchmarks.bench_archive [--backend raw] [--per-year 2500] [--courts 4] [--calls 500]
+"""
+import argparse
+import os
+import random
+import sqlite3
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from benchmarks import generator
+from tennis_scheduler.reservation import slots
+from tennis_scheduler.reservation.database import schema
+from tennis_scheduler.reservation.database.backend import open_backend
+
+YEARS = (1, 4, 8)
+
+
+def history(years: int, per_year: int, courts: int, seed: int) -> list:
+    """ per_year reservations of every court in every year, the last year is the current season """
+    first_year = generator.FIRST_DAY.year - years + 1
+    return [row + (court,)
+            for year in range(first_year, first_year + years)
+            for court in slots.COURT_NUMBERS[:courts]
+            for row in generator.generate(per_year, seed + court, first_day=datetime(year, 1, 3))]
+
+
+def measure(database, per_year: int, calls: int, seed: int) -> dict:
+    rng = random.Random(seed)
+    days = generator.days_covered(per_year, seed)
+    times = [generator.FIRST_DAY + timedelta(days=rng.randrange(days), minutes=480 + 30 * rng.randrange(20))
+             for _ in range(calls)]
+    past = generator.FIRST_DAY.replace(year=generator.FIRST_DAY.year - 1)
+    operations = {
+        "check_availability (off grid)": lambda start_time: database.check_availability(
+            start_time + timedelta(minutes=15), start_time + timedelta(minutes=45), 1),
+        "check_too_many_reservations": lambda start_time: database.check_too_many_reservations(
+            "Adam Kowalski", start_time),
+        "get_reservations (week)": lambda start_time: database.get_reservations(
+            start_time, start_time + timedelta(days=7)),
+        "get_reservations (last year week)": lambda start_time: database.get_reservations(
+            start_time.replace(year=past.year), start_time.replace(year=past.year) + timedelta(days=7)),
+    }
+    results = {}
+    for operation, call in operations.items():
+        start = time.perf_counter()
+        for start_time in times:
+            call(start_time)
+        results[operation] = (time.perf_counter() - start) / calls * 1e6
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--backend", choices=["raw", "orm"], default="raw")
+    parser.add_argument("--per-year", type=int, default=2500,
+                        help="reservations of every court in a year, at most about 2900 fit in one")
+    parser.add_argument("--courts", type=int, default=4)
+    parser.add_argument("--calls", type=int, default=500)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    results = {}
+    archived = {}
+    with tempfile.TemporaryDirectory() as directory:
+        for years in YEARS:
+            filename = os.path.join(directory, f"{years}.sqlite")
+            database = open_backend(filename, args.backend, cache_size=0)
+            database.insert_many(history(years, args.per_year, args.courts, args.seed))
+            results[(years, "all in clients")] = measure(database, args.per_year, args.calls, args.seed)
+            database.close_database()
+
+            conn = sqlite3.connect(filename)
+            start = time.perf_counter()
+            moved = schema.archive_reservations(conn, datetime(generator.FIRST_DAY.year, 1, 1))
+            archived[years] = (sum(moved.values()), time.perf_counter() - start)
+            conn.close()
+
+            database = open_backend(filename, args.backend, cache_size=0)
+            results[(years, "archived")] = measure(database, args.per_year, args.calls, args.seed)
+            database.close_database()
+
+    print(f"{args.backend}: {args.per_year} reservations a year on {args.courts} courts, mean of {args.calls} calls")
+    for years, (rows, seconds) in archived.items():
+        print(f"{years} years -> archived {rows} reservations in {seconds * 1e3:.0f} ms")
+    columns = [(years, state) for years in YEARS for state in ("all in clients", "archived")]
+    print(f"{'operation':<36}" + "".join(f"{f'{years}y {state} (us)':>26}" for years, state in columns))
+    for operation in results[columns[0]]:
+        print(f"{operation:<36}" + "".join(f"{results[column][operation]:>26.1f}" for column in columns))
+
+
+if __name__ == "__main__":
+    main()
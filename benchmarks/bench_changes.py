@@ -0,0 +1,55 @@
+"""
+Nightly sync -> a full csv export of the schedule against an export of the changes since the last watermark,
+on files of growing size with the same number of changes a day.
+
+    $ python -m benchmarks.bench_changes [--backend raw] [--sizes 10000 100000] [--changes 100]
+"""
+import argparse
+import os
+import tempfile
+import time
+from datetime import timedelta
+
+from benchmarks import generator
+from tennis_scheduler.reservation import export
+from tennis_scheduler.reservation.database.backend import open_backend
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--backend", choices=["raw", "orm", "memory"], default="raw")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10000, 100000])
+    parser.add_argument("--changes", type=int, default=100, help="reservations added and cancelled in a day")
+    args = parser.parse_args()
+
+    print(f"{args.backend}: {args.changes} changes since the last export")
+    print(f"{'reservations':>12}{'full export (ms)':>20}{'changes (ms)':>16}")
+    with tempfile.TemporaryDirectory() as directory:
+        for size in args.sizes:
+            database = open_backend(os.path.join(directory, f"{size}.sqlite"), args.backend, cache_size=0)
+            rows = list(generator.generate(size))
+            database.insert_many(rows)
+            filename = os.path.join(directory, f"sync_{size}")
+            # the first export takes everything, the measured one only the day after it
+            export.save_changes_since_watermark(database, filename)
+            last_day = rows[-1][1].replace(hour=0, minute=0) + timedelta(days=1)
+            for i in range(args.changes // 2):
+                start_time = last_day + timedelta(days=i // 20, minutes=480 + 30 * (i % 20))
+                database.insert("Adam Kowalski", start_time, start_time + timedelta(minutes=30))
+            for name, start_time, _ in rows[:args.changes - args.changes // 2]:
+                database.delete(name, start_time)
+
+            start = time.perf_counter()
+            export.save_to_csv(os.path.join(directory, "full"), database.iter_reservations(
+                generator.FIRST_DAY, last_day + timedelta(days=args.changes)))
+            full = time.perf_counter() - start
+            start = time.perf_counter()
+            written, _ = export.save_changes_since_watermark(database, filename)
+            changes = time.perf_counter() - start
+            assert written == args.changes
+            database.close_database()
+            print(f"{size:>12}{full * 1e3:>20.1f}{changes * 1e3:>16.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+"""
+Several processes book overlapping times in one SQLite file at the same time.
+Every booking goes through book_if_free(), afterwards the file is checked for overlapping reservations
+and the booking throughput is reported. --check-then-insert books the old way, with check_availability()
+and insert() as two separate steps, to show the double bookings it lets through.
+
+    $ python -m benchmarks.bench_concurrent_booking [--backend raw|orm] [--processes 8] [--attempts 500]
+"""
+import argparse
+import multiprocessing
+import os
+import random
+import sqlite3
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from tennis_scheduler.reservation.database.database import Database
+from tennis_scheduler.reservation.database.database_orm import DatabaseORM
+
+BACKENDS = {"raw": Database, "orm": DatabaseORM}
+FIRST_DAY = datetime(2050, 1, 3)
+
+OVERLAPS = ("SELECT COUNT(*) FROM clients a JOIN clients b "
+            "ON a.id < b.id AND a.court = b.court AND a.start_time < b.end_time AND b.start_time < a.end_time")
+
+
+def check_then_insert(database, name: str, start_time: datetime, end_time: datetime) -> bool:
+    if not database.check_availability(start_time, end_time, 1):
+        return False
+    database.insert(name, start_time, end_time, 1)
+    return True
+
+
+def book(backend: str, db_file: str, worker: int, attempts: int, days: int, start, atomic: bool = True) -> int:
+    """ number of reservations the worker managed to book """
+    database = BACKENDS[backend](db_file, cache_size=0)
+    rng = random.Random(worker)
+    # every worker fights for court 1, any court would hide most of the contention
+    book_time = (lambda *args: database.book_if_free(*args, 1) is not None) if atomic else \
+        (lambda *args: check_then_insert(database, *args))
+    start.wait()
+    booked = 0
+    for _ in range(attempts):
+        date = FIRST_DAY + timedelta(days=rng.randrange(days), minutes=480 + 30 * rng.randrange(21))
+        booked += book_time(f"Player {worker}", date, date + timedelta(minutes=rng.choice([30, 60, 90])))
+    database.close_database()
+    return booked
+
+
+def stress(backend: str, db_file: str, processes: int, attempts: int, days: int, atomic: bool = True) -> dict:
+    BACKENDS[backend](db_file).close_database()
+    context = multiprocessing.get_context("spawn")
+    start = context.Manager().Barrier(processes + 1)
+    with context.Pool(processes) as pool:
+        results = [pool.apply_async(book, (backend, db_file, worker, attempts, days, start, atomic))
+                   for worker in range(processes)]
+        start.wait()
+        began = time.perf_counter()
+        booked = sum(result.get() for result in results)
+        elapsed = time.perf_counter() - began
+
+    conn = sqlite3.connect(db_file)
+    rows = conn.execute("SELECT COUNT(*) FROM clients").fetchone()[0]
+    overlaps = conn.execute(OVERLAPS).fetchone()[0]
+    conn.close()
+    return {"attempts": processes * attempts, "booked": booked, "rows": rows, "overlaps": overlaps,
+            "seconds": elapsed, "attempts_per_second": processes * attempts / elapsed}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--backend", choices=BACKENDS, default="raw")
+    parser.add_argument("--processes", type=int, default=8)
+    parser.add_argument("--attempts", type=int, default=500, help="bookings tried by every process")
+    parser.add_argument("--days", type=int, default=14, help="days the bookings are spread over")
+    parser.add_argument("--check-then-insert", action="store_true", help="book without book_if_free()")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        result = stress(args.backend, os.path.join(directory, "bench.sqlite"), args.processes, args.attempts,
+                        args.days, not args.check_then_insert)
+
+    print(f"{args.backend}: {args.processes} processes, {result['attempts']} attempts in {result['seconds']:.2f} s "
+          f"-> {result['attempts_per_second']:.0f} attempts/s")
+    print(f"booked {result['booked']}, rows {result['rows']}, overlapping reservations {result['overlaps']}")
+
+
+if __name__ == "__main__":
+    main()
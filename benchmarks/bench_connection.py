@@ -0,0 +1,92 @@
+"""
+Per-operation latency of the raw sqlite3 backend with one connection per call (old behaviour)
+and with the persistent connection held by Database.
+
+    $ python -m benchmarks.bench_connection [--operations 2000]
+"""
+import argparse
+import os
+import sqlite3
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from tennis_scheduler.reservation.database.database import Database
+from tennis_scheduler.reservation.database import schema
+
+
+class ConnectionPerCall(object):
+    """ the statements of Database, each one run on a fresh connection like before """
+
+    def __init__(self, db):
+        self.__db_file = db
+
+    def __run(self, sql: str, params: tuple, commit: bool = False) -> list:
+        conn = sqlite3.connect(self.__db_file)
+        rows = conn.execute(sql, params).fetchall()
+        if commit:
+            conn.commit()
+        conn.close()
+        return rows
+
+    def insert(self, name: str, start_time: datetime, end_time: datetime) -> None:
+        self.__run("INSERT INTO clients (name, start_time, end_time) VALUES (?, ?, ?)",
+                   (name, start_time, end_time), commit=True)
+
+    def check_availability(self, date_start: datetime, date_end: datetime) -> bool:
+        return len(self.__run("SELECT 1 FROM clients WHERE start_time > ? AND ? < end_time AND ? > start_time "
+                              "LIMIT 1", (date_start - schema.MAX_RESERVATION_LENGTH, date_start, date_end))) <= 0
+
+    def get_reservations(self, start_date: datetime, end_date: datetime) -> list:
+        rows = self.__run("SELECT name, start_time, end_time FROM clients "
+                          "WHERE start_time >= ? AND start_time < ? AND end_time <= ? ORDER BY start_time ASC",
+                          (start_date, end_date, end_date))
+        return [(name_, (datetime.strptime(start_date_, '%Y-%m-%d %H:%M:%S')),
+                 (datetime.strptime(end_date_, '%Y-%m-%d %H:%M:%S')))
+                for name_, start_date_, end_date_ in rows]
+
+    def delete(self, name: str, date: datetime) -> None:
+        self.__run("DELETE FROM clients WHERE name == ? AND start_time == ?", (name, date), commit=True)
+
+    def close_database(self) -> None:
+        pass
+
+
+def measure(database, operations: int) -> dict:
+    first_day = datetime(2050, 1, 3, 8, 0)
+    dates = [first_day + timedelta(days=i // 20, minutes=30 * (i % 20)) for i in range(operations)]
+    calls = {
+        "insert": lambda date: database.insert("Adam Kowalski", date, date + timedelta(minutes=30)),
+        "check_availability": lambda date: database.check_availability(date, date + timedelta(minutes=30)),
+        "get_reservations": lambda date: database.get_reservations(date, date + timedelta(days=7)),
+        "delete": lambda date: database.delete("Adam Kowalski", date),
+    }
+    results = {}
+    for operation, call in calls.items():
+        start = time.perf_counter()
+        for date in dates:
+            call(date)
+        results[operation] = (time.perf_counter() - start) / operations * 1e6
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--operations", type=int, default=2000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        db_file = os.path.join(directory, "bench.sqlite")
+        persistent = Database(db_file)
+        before = measure(ConnectionPerCall(db_file), args.operations)
+        after = measure(persistent, args.operations)
+        persistent.close_database()
+
+    print(f"{'operation':<20}{'per call (us)':>16}{'persistent (us)':>18}{'speedup':>10}")
+    for operation in before:
+        print(f"{operation:<20}{before[operation]:>16.1f}{after[operation]:>18.1f}"
+              f"{before[operation] / after[operation]:>9.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+"""
+Lookups of one court on files where more and more courts are booked -> court 1 always has the same reservations,
+the other courts get the same number each, so the times should stay flat as the courts are added.
+
+    $ python -m benchmarks.bench_courts [--backend raw] [--reservations 20000] [--calls 500]
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+from datetime import timedelta
+
+from benchmarks import generator
+from tennis_scheduler.reservation import slots
+from tennis_scheduler.reservation.database.backend import open_backend
+
+COURT_COUNTS = (1, 3, 6, 12)
+
+
+def measure(database, days: int, calls: int, seed: int) -> dict:
+    rng = random.Random(seed)
+    times = [generator.FIRST_DAY + timedelta(days=rng.randrange(days), minutes=480 + 30 * rng.randrange(20))
+             for _ in range(calls)]
+    operations = {
+        "check_availability (court)": lambda start_time: database.check_availability(
+            start_time, start_time + timedelta(minutes=60), 1),
+        "check_availability (court, off grid)": lambda start_time: database.check_availability(
+            start_time + timedelta(minutes=15), start_time + timedelta(minutes=45), 1),
+        "get_free_slots (court, week)": lambda start_time: database.get_free_slots(
+            start_time, start_time + timedelta(days=6), 1),
+        "free_court (any)": lambda start_time: database.free_court(start_time, start_time + timedelta(minutes=60)),
+    }
+    results = {}
+    for operation, call in operations.items():
+        start = time.perf_counter()
+        for start_time in times:
+            call(start_time)
+        results[operation] = (time.perf_counter() - start) / calls * 1e6
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--backend", choices=["raw", "orm", "memory"], default="raw")
+    parser.add_argument("--reservations", type=int, default=20000, help="reservations of every court")
+    parser.add_argument("--calls", type=int, default=500)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rows = list(generator.generate(args.reservations, args.seed))
+    days = generator.days_covered(args.reservations, args.seed)
+    results = {}
+    with tempfile.TemporaryDirectory() as directory:
+        for courts in COURT_COUNTS:
+            database = open_backend(os.path.join(directory, f"{courts}.sqlite"), args.backend, cache_size=0)
+            for court in slots.COURT_NUMBERS[:courts]:
+                database.insert_many([row + (court,) for row in rows])
+            results[courts] = measure(database, days, args.calls, args.seed)
+            database.close_database()
+
+    print(f"{args.backend}: {args.reservations} reservations per court, mean of {args.calls} calls")
+    print(f"{'operation':<38}" + "".join(f"{f'{courts} courts (us)':>18}" for courts in COURT_COUNTS))
+    for operation in results[COURT_COUNTS[0]]:
+        print(f"{operation:<38}" + "".join(f"{results[courts][operation]:>18.1f}" for courts in COURT_COUNTS))
+
+
+if __name__ == "__main__":
+    main()
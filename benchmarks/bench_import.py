@@ -0,0 +1,59 @@
+"""
+Bulk import of a season of reservations from csv into both backends.
+
+    $ python -m benchmarks.bench_import [--reservations 30000]
+"""
+import argparse
+import csv
+import os
+import random
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from tennis_scheduler.reservation.database.database import Database
+from tennis_scheduler.reservation.database.database_orm import DatabaseORM
+from tennis_scheduler.reservation.importer import ReservationImporter
+
+FIRST_NAMES = ["Adam", "Jan", "Marek", "Szymon", "Piotr", "Anna", "Ewa", "Zofia", "Maria", "Jakub"]
+LAST_NAMES = ["Kowalski", "Nowak", "Lis", "Zając", "Wójcik", "Mazur", "Krawczyk", "Kaczmarek"]
+
+
+def write_season(filename: str, reservations: int, seed: int = 0) -> None:
+    """ back to back reservations from 8:00, some of them collide with each other on purpose """
+    rng = random.Random(seed)
+    day = datetime(2050, 1, 3, 8, 0)
+    start = day
+    with open(filename, "w", newline="", encoding="utf-8") as file:
+        writer = csv.writer(file)
+        writer.writerow(["name", "start_time", "end_time"])
+        for _ in range(reservations):
+            end = start + timedelta(minutes=30 * rng.randint(1, 2))
+            if end > day.replace(hour=18, minute=30):
+                day += timedelta(days=1)
+                start, end = day, day + timedelta(minutes=30 * rng.randint(1, 2))
+            name = f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}{rng.choice(['', 'a', 'ek'])}"
+            writer.writerow([name, start, end])
+            start = end if rng.random() > 0.05 else start
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--reservations", type=int, default=30000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        season = os.path.join(directory, "season.csv")
+        write_season(season, args.reservations)
+        for backend in (Database, DatabaseORM):
+            database = backend(os.path.join(directory, backend.__name__ + ".sqlite"))
+            start = time.perf_counter()
+            report = ReservationImporter(database).import_file(season)
+            elapsed = time.perf_counter() - start
+            database.close_database()
+            print(f"{backend.__name__:<12}{elapsed:>8.2f} s  accepted {report.accepted}, "
+                  f"rejected {len(report.rejected)}  ({args.reservations / elapsed:,.0f} rows/s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+"""
+Per-call overhead of DatabaseORM -> statements rebuilt on every call and the pool disposed after each query
+(old behaviour) against the prebuilt statements and the pool kept alive. The schedule cache is turned off.
+
+    $ python -m benchmarks.bench_orm_statements [--calls 2000]
+"""
+import argparse
+import os
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import select, and_, func
+
+from tennis_scheduler.reservation.database import schema
+from tennis_scheduler.reservation.database.database_orm import DatabaseORM, clients
+from . import generator
+
+
+class RebuiltStatements(object):
+    """ the queries of DatabaseORM the way they used to run """
+
+    def __init__(self, engine):
+        self.engine = engine
+
+    def check_availability(self, date_start: datetime, date_end: datetime) -> bool:
+        with self.engine.connect() as conn:
+            result = conn.execute(select(clients.c.id)
+                                  .where(and_(clients.c.start_time > date_start - schema.MAX_RESERVATION_LENGTH,
+                                              date_end > clients.c.start_time,
+                                              date_start < clients.c.end_time))
+                                  .limit(1)).fetchall()
+        self.engine.dispose()
+        return len(result) <= 0
+
+    def get_reservations(self, start_date: datetime, end_date: datetime) -> list:
+        with self.engine.connect() as conn:
+            result = conn.execute(select(clients.c.name, clients.c.start_time, clients.c.end_time)
+                                  .where(and_(clients.c.start_time >= start_date,
+                                              clients.c.start_time < end_date,
+                                              clients.c.end_time <= end_date))
+                                  .order_by(clients.c.start_time)).fetchall()
+        self.engine.dispose()
+        return [tuple(row) for row in result]
+
+    def check_too_many_reservations(self, name: str, date: datetime) -> bool:
+        week_start, week_end = slots.week_range(date)
+        with self.engine.connect() as conn:
+            reservations = conn.execute(select(func.count())
+                                        .select_from(clients)
+                                        .where(and_(clients.c.name == name,
+                                                    clients.c.start_time >= week_start,
+                                                    clients.c.start_time < week_end))).scalar()
+        self.engine.dispose()
+        return reservations <= 2
+
+
+def measure(database, calls: int, days: int) -> dict:
+    dates = [generator.FIRST_DAY + timedelta(days=i % days, hours=8 + i % 10) for i in range(calls)]
+    operations = {
+        "check_availability": lambda date: database.check_availability(date, date + timedelta(minutes=60)),
+        "get_reservations (day)": lambda date: database.get_reservations(date.replace(hour=0),
+                                                                         date.replace(hour=0) + timedelta(days=1)),
+        "check_too_many_reservations": lambda date: database.check_too_many_reservations("Jan Nowak", date),
+    }
+    results = {}
+    for operation, call in operations.items():
+        start = time.perf_counter()
+        for date in dates:
+            call(date)
+        results[operation] = (time.perf_counter() - start) / calls * 1e6
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--calls", type=int, default=2000)
+    parser.add_argument("--reservations", type=int, default=10000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        database = DatabaseORM(os.path.join(directory, "bench.sqlite"), cache_size=0)
+        database.insert_many(generator.generate(args.reservations))
+        days = generator.days_covered(args.reservations)
+        before = measure(RebuiltStatements(database.engine), args.calls, days)
+        after = measure(database, args.calls, days)
+        database.close_database()
+
+    print(f"{'operation':<30}{'rebuilt + dispose (us)':>24}{'prebuilt + pool (us)':>22}{'speedup':>10}")
+    for operation in before:
+        print(f"{operation:<30}{before[operation]:>24.1f}{after[operation]:>22.1f}"
+              f"{before[operation] / after[operation]:>9.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+"""
+Reads of the raw backend straight from the file against reads from its in-memory replica, while writer processes
+book into the same file the whole time -> latency of the availability, free slot and schedule lookups,
+plus what the replica costs: the copy at startup, a refresh and the replay after every write of its own.
+
+    $ python -m benchmarks.bench_replica [--reservations 100000] [--writers 2] [--calls 2000]
+"""
+import argparse
+import multiprocessing
+import os
+import random
+import statistics
+import tempfile
+import time
+from datetime import timedelta
+
+from benchmarks import generator
+from tennis_scheduler.reservation.database.database import Database
+
+
+def write(db_file: str, worker: int, days: int, stop) -> int:
+    """ book and cancel random times until stop is set, returns the number of writes """
+    database = Database(db_file, cache_size=0)
+    rng = random.Random(worker)
+    writes = 0
+    while not stop.is_set():
+        start_time = generator.FIRST_DAY + timedelta(days=rng.randrange(days), minutes=480 + 30 * rng.randrange(20))
+        if database.book_if_free(f"Writer {worker}", start_time, start_time + timedelta(minutes=30)) is not None:
+            database.delete(f"Writer {worker}", start_time)
+        writes += 2
+    database.close_database()
+    return writes
+
+
+def lookups(database: Database, days: int, calls: int) -> dict:
+    """ microseconds per call of every read the menu and the server make most """
+    rng = random.Random(0)
+    reads = {"check_availability": lambda day: database.check_availability(day + timedelta(hours=10),
+                                                                           day + timedelta(hours=11)),
+             "get_free_slots": lambda day: database.get_free_slots(day, day + timedelta(days=6)),
+             "get_reservations": lambda day: database.get_reservations(day, day + timedelta(days=7))}
+    timings = {}
+    for name, read in reads.items():
+        durations = []
+        for _ in range(calls):
+            day = generator.FIRST_DAY + timedelta(days=rng.randrange(days - 7))
+            start = time.perf_counter()
+            read(day)
+            durations.append((time.perf_counter() - start) * 1e6)
+        durations.sort()
+        timings[name] = (statistics.median(durations), durations[int(len(durations) * 0.99)])
+    return timings
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--reservations", type=int, default=100000)
+    parser.add_argument("--writers", type=int, default=2, help="processes writing the file during the reads")
+    parser.add_argument("--calls", type=int, default=2000, help="calls of every lookup")
+    args = parser.parse_args()
+
+    days = generator.days_covered(args.reservations)
+    with tempfile.TemporaryDirectory() as directory:
+        db_file = os.path.join(directory, "replica.sqlite")
+        seeded = Database(db_file, cache_size=0)
+        seeded.insert_many(generator.generate(args.reservations))
+        seeded.close_database()
+
+        start = time.perf_counter()
+        replica = Database(db_file, cache_size=0, replica=True)
+        opened = time.perf_counter() - start
+        start = time.perf_counter()
+        replica.refresh_replica()
+        refreshed = time.perf_counter() - start
+        file = Database(db_file, cache_size=0)
+
+        context = multiprocessing.get_context("spawn")
+        stop = context.Manager().Event()
+        with context.Pool(args.writers) as pool:
+            writers = [pool.apply_async(write, (db_file, worker, days, stop)) for worker in range(args.writers)]
+            # the writers are busy before the first read
+            time.sleep(1)
+            timings = {way: lookups(database, days, args.calls) for way, database in (("file", file),
+                                                                                      ("replica", replica))}
+            stop.set()
+            writes = sum(writer.get() for writer in writers)
+
+        # a write of its own is replayed into the replica before the call returns,
+        # what the writers wrote is copied first so only that replay is timed
+        replica.refresh_replica()
+        inserts = {}
+        for court, (way, database) in enumerate((("file", file), ("replica", replica)), 1):
+            start = time.perf_counter()
+            for i in range(200):
+                start_time = generator.FIRST_DAY + timedelta(days=days + 1 + i)
+                database.insert(way, start_time + timedelta(hours=8), start_time + timedelta(hours=9), court)
+            inserts[way] = (time.perf_counter() - start) / 200 * 1e6
+        assert replica.get_reservations(generator.FIRST_DAY, generator.FIRST_DAY + timedelta(days=days + 201)) == \
+               file.get_reservations(generator.FIRST_DAY, generator.FIRST_DAY + timedelta(days=days + 201))
+        file.close_database()
+        replica.close_database()
+
+    print(f"{args.reservations} reservations, {args.writers} writers made {writes} writes during the reads")
+    print(f"replica: copied at startup in {opened * 1e3:.0f} ms, refreshed in {refreshed * 1e3:.0f} ms")
+    print(f"{'lookup':<22}{'file p50 (us)':>15}{'replica p50 (us)':>18}{'file p99 (us)':>15}{'replica p99 (us)':>18}")
+    for name in timings["file"]:
+        (file_p50, file_p99), (replica_p50, replica_p99) = timings["file"][name], timings["replica"][name]
+        print(f"{name:<22}{file_p50:>15.0f}{replica_p50:>18.0f}{file_p99:>15.0f}{replica_p99:>18.0f}")
+    print(f"{'insert':<22}{inserts['file']:>15.0f}{inserts['replica']:>18.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+"""
+Result of a long get_reservations() range -> the list of (name, start_time, end_time, court) tuples it used to be
+against the columnar Reservations it is now, memory measured with tracemalloc and the time of grouping it by day.
+
+    $ python -m benchmarks.bench_schedule [--backend raw] [--reservations 100000]
+"""
+import argparse
+import os
+import tempfile
+import time
+import tracemalloc
+from datetime import timedelta
+
+from benchmarks import generator
+from tennis_scheduler.reservation.database.backend import open_backend
+
+
+def group_tuples(rows: list, start_date, days: int) -> int:
+    """ the day loop of the schedule printing before -> a date computed and compared for every row """
+    grouped, row = 0, 0
+    for i in range(days):
+        while row < len(rows) and rows[row][1].date() == start_date.date() + timedelta(days=i):
+            grouped += 1
+            row += 1
+    return grouped
+
+
+def group_columns(reservations) -> int:
+    return sum(len(reservations.day(i)) for i in range(reservations.days))
+
+
+def measure(read) -> tuple:
+    """ (result, peak MiB while reading, MiB kept by the result, seconds), timed apart as tracing slows strptime """
+    start = time.perf_counter()
+    read()
+    seconds = time.perf_counter() - start
+    tracemalloc.start()
+    result = read()
+    kept, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, peak / 2 ** 20, kept / 2 ** 20, seconds
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--backend", choices=["raw", "orm", "memory"], default="raw")
+    parser.add_argument("--reservations", type=int, default=100000)
+    args = parser.parse_args()
+
+    days = generator.days_covered(args.reservations)
+    start_date, end_date = generator.FIRST_DAY, generator.FIRST_DAY + timedelta(days=days)
+    with tempfile.TemporaryDirectory() as directory:
+        database = open_backend(os.path.join(directory, "schedule.sqlite"), args.backend, cache_size=0)
+        database.insert_many(generator.generate(args.reservations))
+        rows, *tuples = measure(lambda: [tuple(row) for row in database.iter_reservations(start_date, end_date)])
+        reservations, *columns = measure(lambda: database.get_reservations(start_date, end_date))
+        database.close_database()
+    assert reservations == rows
+
+    grouping = {}
+    for way, group in (("tuples", lambda: group_tuples(rows, start_date, days + 1)),
+                       ("columns", lambda: group_columns(reservations))):
+        start = time.perf_counter()
+        assert group() == len(rows)
+        grouping[way] = time.perf_counter() - start
+
+    print(f"{args.backend}: {len(rows)} reservations over {days} days")
+    print(f"{'result':<10}{'peak (MiB)':>12}{'kept (MiB)':>12}{'read (ms)':>12}{'by day (ms)':>14}")
+    for way, (peak, kept, seconds) in (("tuples", tuples), ("columns", columns)):
+        print(f"{way:<10}{peak:>12.1f}{kept:>12.1f}{seconds * 1e3:>12.0f}{grouping[way] * 1e3:>14.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+"""
+Booking a season of weekly reservations -> one book_if_free() per week against one book_series() call,
+on a file already holding synthetic reservations.
+
+    $ python -m benchmarks.bench_series [--backend raw] [--reservations 100000] [--weeks 52] [--series 50]
+"""
+import argparse
+import os
+import tempfile
+import time
+from datetime import timedelta
+
+from benchmarks import generator
+from tennis_scheduler.reservation.database.backend import open_backend
+
+
+def seasons(count: int, weeks: int) -> list:
+    """ count series of weeks weekly hours, every one at its own time of the week """
+    return [[(start_time + timedelta(weeks=week), start_time + timedelta(weeks=week, hours=1))
+             for week in range(weeks)]
+            for start_time in (generator.FIRST_DAY + timedelta(days=i % 7, minutes=480 + 30 * (i // 7 % 20))
+                               for i in range(count))]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--backend", choices=["raw", "orm", "memory"], default="raw")
+    parser.add_argument("--reservations", type=int, default=100000)
+    parser.add_argument("--weeks", type=int, default=52)
+    parser.add_argument("--series", type=int, default=50, help="series booked by every way")
+    args = parser.parse_args()
+
+    rows = list(generator.generate(args.reservations))
+    results = {}
+    with tempfile.TemporaryDirectory() as directory:
+        for way in ("book_if_free", "book_series"):
+            database = open_backend(os.path.join(directory, f"{way}.sqlite"), args.backend, cache_size=0)
+            database.insert_many(rows)
+            booked = 0
+            start = time.perf_counter()
+            for number, season in enumerate(seasons(args.series, args.weeks)):
+                name = f"Player {number}"
+                if way == "book_series":
+                    courts = [court for court, _, _ in database.book_series(name, season)]
+                else:
+                    courts = [database.book_if_free(name, start_time, end_time) for start_time, end_time in season]
+                booked += sum(court is not None for court in courts)
+            results[way] = (time.perf_counter() - start) / args.series * 1e3, booked
+            database.close_database()
+
+    print(f"{args.backend}: {args.reservations} reservations, {args.series} series of {args.weeks} weeks")
+    for way, (milliseconds, booked) in results.items():
+        print(f"{way:<14}{milliseconds:>10.2f} ms per series, {booked} reservations booked")
+    print(f"speedup {results['book_if_free'][0] / results['book_series'][0]:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+"""
+Closest free time search: the list of 30 minute slots used before against the day bitmask.
+
+    $ python -m benchmarks.bench_slots [--days 5000]
+"""
+import argparse
+import random
+import time
+from datetime import datetime, timedelta
+
+from tennis_scheduler.reservation import slots
+
+
+def list_search(day: datetime, reservations: list, book_time: int):
+    """ _get_base_available_times + _get_real_available_times + _get_final_times as they were """
+    available_times = []
+    start_time = day.replace(hour=8, minute=0)
+    while start_time < day.replace(hour=18, minute=30):
+        available_times.append([start_time, start_time + timedelta(minutes=30)])
+        start_time += timedelta(minutes=30)
+
+    available_times_copy = available_times.copy()
+    for start_time, end_time in reservations:
+        for j in range(len(available_times)):
+            if start_time <= available_times[j][0] < end_time:
+                if available_times[j] in available_times_copy:
+                    available_times_copy.remove(available_times[j])
+
+    final_times = []
+    for i in range(len(available_times_copy) - book_time // 30 + 1):
+        if available_times_copy[i][0] + timedelta(minutes=book_time) == \
+                available_times_copy[i + book_time // 30 - 1][1]:
+            final_times.append(available_times_copy[i][0])
+    if len(final_times) == 0:
+        return
+    return min(final_times, key=lambda x: abs(x - day))
+
+
+def bitmask_search(day: datetime, reservations: list, book_time: int):
+    final_slots = slots.run_starts(slots.days_free_mask(day, 1, reservations), book_time // 30)
+    if final_slots == 0:
+        return
+    target = (day.hour * 60 + day.minute - slots.DAY_START) / slots.SLOT_LENGTH
+    # the earlier slot wins a tie
+    closest = min(slots.iter_slots(final_slots), key=lambda index: abs(index - target))
+    return slots.slot_time(day, closest)
+
+
+def random_day(day: datetime, rng: random.Random) -> list:
+    reservations = []
+    start = day.replace(hour=8, minute=0)
+    while True:
+        start += timedelta(minutes=30 * rng.randint(0, 3))
+        end = start + timedelta(minutes=30 * rng.randint(1, 3))
+        if end > day.replace(hour=19, minute=30):
+            return reservations
+        reservations.append((start, end))
+        start = end
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--days", type=int, default=5000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    cases = []
+    for i in range(args.days):
+        day = datetime(2050, 1, 1, 8 + rng.randint(0, 10), rng.choice([0, 30])) + timedelta(days=i)
+        cases.append((day, random_day(day, rng), rng.choice([30, 60, 90])))
+
+    results = {}
+    for name, search in (("list", list_search), ("bitmask", bitmask_search)):
+        start = time.perf_counter()
+        results[name] = [search(*case) for case in cases]
+        print(f"{name:<10}{(time.perf_counter() - start) / len(cases) * 1e6:>10.1f} us per search")
+    assert results["list"] == results["bitmask"], "both searches must find the same times"
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,52 @@
+"""
+Cold start of the CLI -> a fresh interpreter runs an empty batch against an existing database and exits,
+once for every backend. The import of SQLAlchemy alone is measured too, it is the part the raw and memory
+backends don't pay for anymore.
+
+    $ python -m benchmarks.bench_startup [--runs 10]
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+from tennis_scheduler.reservation.database.backend import BACKENDS
+
+PROGRAM = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "tennis_scheduler")
+
+
+def measure(command: list, runs: int) -> float:
+    """ median wall time of the command in milliseconds """
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run(command, input=b"", stdout=subprocess.DEVNULL, check=True)
+        timings.append((time.perf_counter() - start) * 1e3)
+    return statistics.median(timings)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=10)
+    args = parser.parse_args()
+
+    results = {"python -c pass": measure([sys.executable, "-c", "pass"], args.runs),
+               "import sqlalchemy": measure([sys.executable, "-c", "import sqlalchemy"], args.runs)}
+    with tempfile.TemporaryDirectory() as directory:
+        db_file = os.path.join(directory, "startup.sqlite")
+        for backend in BACKENDS:
+            command = [sys.executable, PROGRAM, "--backend", backend, "--database", db_file, "--batch", "-"]
+            # the first run creates the file, only starts with an up to date schema are measured
+            subprocess.run(command, input=b"", stdout=subprocess.DEVNULL, check=True)
+            results[f"tennis_scheduler --backend {backend}"] = measure(command, args.runs)
+
+    print(f"median of {args.runs} runs")
+    for name, milliseconds in results.items():
+        print(f"{name:<36}{milliseconds:>10.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
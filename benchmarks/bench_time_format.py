@@ -0,0 +1,88 @@
+"""
+Read cost of the raw sqlite3 backend with times stored as text and as integer epoch minutes.
+The cache is turned off, so every read fetches and decodes its rows again.
+
+    $ python -m benchmarks.bench_time_format [--weeks 52] [--repeat 5]
+"""
+import argparse
+import os
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from tennis_scheduler.reservation.database.database import Database
+from tennis_scheduler.reservation.database.time_format import TextTimes, EpochTimes
+
+FIRST_DAY = datetime(2050, 1, 3)
+
+
+def reservations(weeks: int) -> list:
+    """ every half-hour slot from 8:00 till 18:30 booked, 21 rows a day """
+    return [("Adam Kowalski", FIRST_DAY + timedelta(days=day, minutes=480 + 30 * slot),
+             FIRST_DAY + timedelta(days=day, minutes=510 + 30 * slot))
+            for day in range(weeks * 7) for slot in range(21)]
+
+
+def measure(database: Database, weeks: int, repeat: int) -> dict:
+    calls = {
+        "get_reservations (week)": lambda: [database.get_reservations(FIRST_DAY + timedelta(weeks=week),
+                                                                      FIRST_DAY + timedelta(weeks=week + 1))
+                                            for week in range(weeks)],
+        "get_reserved_times_range (week)": lambda: [database.get_reserved_times_range(
+            FIRST_DAY + timedelta(weeks=week), FIRST_DAY + timedelta(weeks=week, days=6)) for week in range(weeks)],
+        "iter_reservations (all)": lambda: list(database.iter_reservations(FIRST_DAY,
+                                                                           FIRST_DAY + timedelta(weeks=weeks))),
+    }
+    results = {}
+    for operation, call in calls.items():
+        best = None
+        for _ in range(repeat):
+            start = time.perf_counter()
+            call()
+            elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+        results[operation] = best * 1e3
+    return results
+
+
+def decode_cost(rows: int) -> dict:
+    """ decoding alone, per row """
+    text = [str(FIRST_DAY + timedelta(minutes=30 * i)) for i in range(rows)]
+    epoch = [EpochTimes.encode(FIRST_DAY + timedelta(minutes=30 * i)) for i in range(rows)]
+    results = {}
+    for name, decode, values in (("text", TextTimes.decode, text), ("epoch", EpochTimes.decode, epoch)):
+        start = time.perf_counter()
+        for value in values:
+            decode(value)
+        results[name] = (time.perf_counter() - start) / rows * 1e6
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--weeks", type=int, default=52)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    rows = reservations(args.weeks)
+    results = {}
+    with tempfile.TemporaryDirectory() as directory:
+        for time_format in ("text", "epoch"):
+            database = Database(os.path.join(directory, f"{time_format}.sqlite"), cache_size=0,
+                                time_format=time_format)
+            database.insert_many(rows)
+            results[time_format] = measure(database, args.weeks, args.repeat)
+            database.close_database()
+
+    print(f"{len(rows)} reservations, best of {args.repeat}")
+    print(f"{'operation':<34}{'text (ms)':>12}{'epoch (ms)':>12}{'speedup':>10}")
+    for operation in results["text"]:
+        text, epoch = results["text"][operation], results["epoch"][operation]
+        print(f"{operation:<34}{text:>12.1f}{epoch:>12.1f}{text / epoch:>9.1f}x")
+    decode = decode_cost(len(rows))
+    print(f"{'decode one time (us)':<34}{decode['text']:>12.2f}{decode['epoch']:>12.2f}"
+          f"{decode['text'] / decode['epoch']:>9.1f}x")
+
+
+if __name__ == "__main__":
+    main()
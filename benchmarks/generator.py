@@ -0,0 +1,45 @@
+"""
+Synthetic reservations for benchmarks -> valid, non-overlapping and sorted by start_time,
+the same seed always gives the same rows.
+"""
+import random
+from datetime import datetime, timedelta
+
+FIRST_DAY = datetime(2050, 1, 3)
+
+FIRST_NAMES = ["Adam", "Jan", "Marek", "Szymon", "Piotr", "Anna", "Ewa", "Zofia", "Maria", "Jakub"]
+LAST_NAMES = ["Kowalski", "Nowak", "Lis", "Zając", "Wójcik", "Mazur", "Krawczyk", "Kaczmarek"]
+
+# half-hour slots from 8:00 till 18:30
+SLOTS_PER_DAY = 21
+
+
+def names(count: int, seed: int = 0) -> list:
+    rng = random.Random(seed)
+    return [f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}{rng.choice(['', 'a'])}"
+            for _ in range(count)]
+
+
+def generate(count: int, seed: int = 0, first_day: datetime = FIRST_DAY, players: int = 500):
+    """ count reservations of 30-90 minutes from first_day on, about ten a day with random gaps between them """
+    rng = random.Random(seed)
+    pool = names(players, seed)
+    day = first_day
+    slot = 0
+    for _ in range(count):
+        slot += rng.choice([0, 0, 0, 1, 2])
+        length = rng.randint(1, 3)
+        if slot + length > SLOTS_PER_DAY:
+            day += timedelta(days=1)
+            slot = 0
+        start_time = day + timedelta(minutes=480 + 30 * slot)
+        yield rng.choice(pool), start_time, start_time + timedelta(minutes=30 * length)
+        slot += length
+
+
+def days_covered(count: int, seed: int = 0, first_day: datetime = FIRST_DAY) -> int:
+    """ number of days generate() spreads count reservations over """
+    last = first_day
+    for _, start_time, _ in generate(count, seed, first_day):
+        last = start_time
+    return (last - first_day).days + 1
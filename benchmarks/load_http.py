@@ -0,0 +1,110 @@
+"""
+Load generator for the HTTP server -> requests per second and p50/p99 latency.
+The server runs in this process against a temporary SQLite file, clients keep their
+connections alive and pipeline several requests at a time.
+
+    $ python -m benchmarks.load_http [--connections 16] [--pipeline 4] [--seconds 5] [--workers 4]
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import statistics
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta
+from urllib.parse import urlencode
+
+from tennis_scheduler.reservation.reservation_validator import Validator
+from tennis_scheduler.reservation.server import ReservationServer
+
+FIRST_DAY = datetime(2050, 1, 3)
+
+
+def make_request(rng: random.Random) -> bytes:
+    day = FIRST_DAY + timedelta(days=rng.randint(0, 60))
+    date = (day + timedelta(hours=rng.randint(8, 17), minutes=rng.choice([0, 30]))).strftime("%d.%m.%Y %H:%M")
+    kind = rng.random()
+    if kind < 0.2:
+        body = json.dumps({"name": f"Player {rng.choice('ABCDEFGHIJKLMNOPRSTUWZ')}{rng.choice(['ski', 'ak', 'ek'])}",
+                           "date": date, "duration": rng.choice([30, 60, 90]), "accept_closest": True}).encode()
+        return (b"POST /reservations HTTP/1.1\r\nHost: bench\r\nContent-Type: application/json\r\n"
+                b"Content-Length: " + str(len(body)).encode() + b"\r\n\r\n" + body)
+    if kind < 0.6:
+        query = urlencode({"start": day.strftime("%d.%m.%Y"), "end": (day + timedelta(days=6)).strftime("%d.%m.%Y")})
+        return f"GET /schedule?{query} HTTP/1.1\r\nHost: bench\r\n\r\n".encode()
+    query = urlencode({"date": date, "duration": rng.choice([30, 60, 90]), "count": 3})
+    return f"GET /closest?{query} HTTP/1.1\r\nHost: bench\r\n\r\n".encode()
+
+
+async def read_response(reader: asyncio.StreamReader) -> int:
+    status = int((await reader.readline()).split()[1])
+    length = 0
+    while True:
+        line = await reader.readline()
+        if line == b"\r\n":
+            break
+        if line.lower().startswith(b"content-length:"):
+            length = int(line.split(b":")[1])
+    await reader.readexactly(length)
+    return status
+
+
+async def client(host: str, port: int, pipeline: int, deadline: float, seed: int, latencies: list,
+                 statuses: dict) -> None:
+    rng = random.Random(seed)
+    reader, writer = await asyncio.open_connection(host, port)
+    while time.perf_counter() < deadline:
+        sent = time.perf_counter()
+        writer.write(b"".join(make_request(rng) for _ in range(pipeline)))
+        await writer.drain()
+        for _ in range(pipeline):
+            status = await read_response(reader)
+            latencies.append(time.perf_counter() - sent)
+            statuses[status] = statuses.get(status, 0) + 1
+    writer.close()
+
+
+async def load(host: str, port: int, connections: int, pipeline: int, seconds: float) -> tuple:
+    latencies, statuses = [], {}
+    deadline = time.perf_counter() + seconds
+    start = time.perf_counter()
+    await asyncio.gather(*(client(host, port, pipeline, deadline, seed, latencies, statuses)
+                           for seed in range(connections)))
+    return time.perf_counter() - start, latencies, statuses
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--connections", type=int, default=16)
+    parser.add_argument("--pipeline", type=int, default=4)
+    parser.add_argument("--seconds", type=float, default=5)
+    parser.add_argument("--workers", type=int, default=4)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        validator = Validator(os.path.join(directory, "load.sqlite"))
+        server = ReservationServer(validator, args.workers)
+        loop = asyncio.new_event_loop()
+        host, port = loop.run_until_complete(server.start("127.0.0.1", 0))
+        thread = threading.Thread(target=loop.run_forever, daemon=True)
+        thread.start()
+
+        elapsed, latencies, statuses = asyncio.run(load(host, port, args.connections, args.pipeline, args.seconds))
+
+        asyncio.run_coroutine_threadsafe(server.close(), loop).result()
+        loop.call_soon_threadsafe(loop.stop)
+        thread.join()
+        validator._database.close_database()
+
+    latencies.sort()
+    print(f"requests      {len(latencies)} in {elapsed:.1f} s -> {len(latencies) / elapsed:,.0f} req/s")
+    print(f"latency p50   {statistics.median(latencies) * 1000:.2f} ms")
+    print(f"latency p99   {latencies[int(len(latencies) * 0.99) - 1] * 1000:.2f} ms")
+    print(f"statuses      {dict(sorted(statuses.items()))}")
+
+
+if __name__ == "__main__":
+    main()
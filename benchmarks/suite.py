@@ -0,0 +1,219 @@
+"""
+Benchmark suite of both database backends -> every public method and the Validator paths built on them,
+timed on files seeded with 10k, 100k and 1M synthetic reservations. Results are written to JSON,
+--compare reports operations that got slower than a previous run.
+
+    $ python -m benchmarks.suite [--sizes 10000 100000 1000000] [--backends raw raw_epoch raw_replica orm memory]
+                                 [--calls 200] [--output results.json] [--compare baseline.json] [--threshold 1.25]
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+from itertools import islice
+
+import sqlalchemy
+
+from tennis_scheduler.reservation import export
+from tennis_scheduler.reservation.database.database import Database
+from tennis_scheduler.reservation.database.database_orm import DatabaseORM
+from tennis_scheduler.reservation.database.memory import MemoryDatabase
+from tennis_scheduler.reservation.reservation_validator import Validator
+from tennis_scheduler.reservation.tools import headless
+from . import generator
+
+BACKENDS = {"raw": Database,
+            "raw_epoch": lambda db, cache_size: Database(db, cache_size, time_format="epoch"),
+            "raw_replica": lambda db, cache_size: Database(db, cache_size, replica=True),
+            "orm": DatabaseORM,
+            "memory": MemoryDatabase}
+SIZES = [10_000, 100_000, 1_000_000]
+SEED_BATCH = 50_000
+
+
+class BenchValidator(Validator):
+    """ Validator on an already opened backend """
+
+    def __init__(self, database):
+        self._database = database
+
+
+def seed(database, size: int, seed: int) -> float:
+    """ insert size reservations in batches, returns the seconds it took """
+    rows = generator.generate(size, seed)
+    start = time.perf_counter()
+    while True:
+        batch = list(islice(rows, SEED_BATCH))
+        if not batch:
+            break
+        database.insert_many(batch)
+    return time.perf_counter() - start
+
+
+def operations(database, validator: Validator, days: int, directory: str, rng: random.Random) -> dict:
+    """ operation -> (function of one call argument, argument generator) """
+    def seeded_time():
+        return generator.FIRST_DAY + timedelta(days=rng.randrange(days), minutes=480 + 30 * rng.randrange(19))
+
+    # the Validator doesn't look past 31.12.2100, larger files reach further than that
+    bookable_days = min(days, (datetime(2100, 12, 24) - generator.FIRST_DAY).days)
+
+    def bookable_time():
+        return generator.FIRST_DAY + timedelta(days=rng.randrange(bookable_days),
+                                               minutes=480 + 30 * rng.randrange(19))
+
+    # writes go to days after the seeded ones, so every call books a free time and the data stays the same size
+    free_days = [generator.FIRST_DAY + timedelta(days=days + i) for i in range(1000)]
+    written = []
+
+    def free_time():
+        start_time = free_days[len(written) % len(free_days)] + timedelta(minutes=480 + 30 * (len(written) // 1000))
+        written.append(start_time)
+        return start_time
+
+    def insert(start_time):
+        database.insert("Adam Kowalski", start_time, start_time + timedelta(minutes=30))
+
+    def insert_many(start_time):
+        database.insert_many([("Adam Kowalski", start_time + timedelta(days=1000 * i), start_time
+                               + timedelta(days=1000 * i, minutes=30)) for i in range(10)])
+
+    def export_week(save):
+        def call(start_time):
+            start_date = start_time.replace(hour=0, minute=0)
+            end_date = start_date + timedelta(days=7)
+            reservations = database.iter_reservations(start_date, end_date)
+            if save is export.save_to_json:
+                save(os.path.join(directory, "export"), reservations, start_date, end_date)
+            else:
+                save(os.path.join(directory, "export"), reservations)
+        return call
+
+    return {
+        "insert": (insert, free_time),
+        "book_if_free": (lambda start_time: database.book_if_free("Jan Nowak", start_time,
+                                                                  start_time + timedelta(minutes=30)), free_time),
+        "insert_many (10 rows)": (insert_many, free_time),
+        "check_availability": (lambda start_time: database.check_availability(start_time,
+                                                                              start_time + timedelta(minutes=60)),
+                               seeded_time),
+        "get_reservations (week)": (lambda start_time: database.get_reservations(start_time,
+                                                                                 start_time + timedelta(days=7)),
+                                    seeded_time),
+        "iter_reservations (month)": (lambda start_time: sum(1 for _ in database.iter_reservations(
+            start_time, start_time + timedelta(days=31))), seeded_time),
+        "check_too_many_reservations": (lambda start_time: database.check_too_many_reservations("Jan Nowak",
+                                                                                               start_time),
+                                        seeded_time),
+        "get_reserved_times": (database.get_reserved_times, seeded_time),
+        "get_reserved_times_range (week)": (lambda start_time: database.get_reserved_times_range(
+            start_time, start_time + timedelta(days=6)), seeded_time),
+        "get_user_reserved_times": (lambda start_time: database.get_user_reserved_times("Jan Nowak", start_time),
+                                    seeded_time),
+        "delete": (lambda start_time: database.delete("Adam Kowalski", start_time),
+                   lambda: written[rng.randrange(len(written))]),
+        "_check_closest_reservation": (lambda start_time: validator._check_closest_reservation(start_time, 60),
+                                       bookable_time),
+        "_check_next_available_times": (lambda start_time: validator._check_next_available_times(start_time, 90),
+                                        bookable_time),
+        "export csv (week)": (export_week(export.save_to_csv), seeded_time),
+        "export json (week)": (export_week(export.save_to_json), seeded_time),
+        "export ndjson (week)": (export_week(export.save_to_ndjson), seeded_time),
+    }
+
+
+def measure(call, argument, calls: int) -> dict:
+    arguments = [argument() for _ in range(calls)]
+    timings = []
+    for value in arguments:
+        start = time.perf_counter_ns()
+        call(value)
+        timings.append((time.perf_counter_ns() - start) / 1e3)
+    timings.sort()
+    return {"calls": calls,
+            "mean_us": statistics.fmean(timings),
+            "median_us": statistics.median(timings),
+            "min_us": timings[0],
+            "p95_us": timings[min(len(timings) - 1, int(len(timings) * 0.95))]}
+
+
+def run(backend: str, size: int, calls: int, seed_value: int, cache_size: int, directory: str) -> list:
+    database = BACKENDS[backend](os.path.join(directory, f"{backend}_{size}.sqlite"), cache_size=cache_size)
+    results = [{"backend": backend, "size": size, "operation": "seed", "calls": 1,
+                "mean_us": seed(database, size, seed_value) * 1e6}]
+    days = generator.days_covered(size, seed_value)
+    rng = random.Random(seed_value)
+    # the Validator paths print why a time is taken
+    with headless():
+        for operation, (call, argument) in operations(database, BenchValidator(database), days, directory,
+                                                      rng).items():
+            results.append({"backend": backend, "size": size, "operation": operation,
+                            **measure(call, argument, calls)})
+    database.close_database()
+    return results
+
+
+def compare(results: list, baseline_file: str, threshold: float) -> list:
+    """ (backend, size, operation, baseline median, median) of operations slower than threshold times the baseline """
+    with open(baseline_file, encoding="utf-8") as file:
+        baseline = {(row["backend"], row["size"], row["operation"]): row for row in json.load(file)["results"]}
+    slower = []
+    for row in results:
+        key = (row["backend"], row["size"], row["operation"])
+        if key in baseline and row["operation"] != "seed":
+            before, after = baseline[key]["median_us"], row["median_us"]
+            if after > before * threshold:
+                slower.append((*key, before, after))
+    return slower
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=SIZES)
+    parser.add_argument("--backends", nargs="+", choices=BACKENDS, default=["raw", "orm"])
+    parser.add_argument("--calls", type=int, default=200, help="timed calls of every operation")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--cache-size", type=int, default=0, help="days cached by the backends, 0 -> no cache")
+    parser.add_argument("--output", default="benchmark_results.json")
+    parser.add_argument("--compare", help="results of an earlier run")
+    parser.add_argument("--threshold", type=float, default=1.25, help="slowdown of the median reported by --compare")
+    args = parser.parse_args()
+
+    results = []
+    with tempfile.TemporaryDirectory() as directory:
+        for size in args.sizes:
+            for backend in args.backends:
+                rows = run(backend, size, args.calls, args.seed, args.cache_size, directory)
+                results.extend(rows)
+                for row in rows:
+                    median = row.get("median_us", row["mean_us"])
+                    print(f"{backend:<10}{size:>9}  {row['operation']:<34}{median:>14.1f} us")
+
+    with open(args.output, "w", encoding="utf-8") as file:
+        json.dump({"environment": {"python": platform.python_version(),
+                                   "sqlite": sqlite3.sqlite_version,
+                                   "sqlalchemy": sqlalchemy.__version__,
+                                   "platform": platform.platform(),
+                                   "date": datetime.now().isoformat(timespec="seconds")},
+                   "settings": {"sizes": args.sizes, "backends": args.backends, "calls": args.calls,
+                                "seed": args.seed, "cache_size": args.cache_size},
+                   "results": results}, file, indent=2)
+    print(f"Results saved to {args.output}")
+
+    if args.compare:
+        slower = compare(results, args.compare, args.threshold)
+        for backend, size, operation, before, after in slower:
+            print(f"slower: {backend} {size} {operation} {before:.1f} us -> {after:.1f} us")
+        return 1 if slower else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,9 +1,32 @@
-from reservation.reservation_handler import ReservationHandler
+import argparse
+import atexit
+import sys
+
+from reservation.reservation_handler import ReservationHandler, MAIN_DB
+from reservation.database.backend import BACKENDS, backend_name
+from reservation.batch import CommandRunner
 from reservation import tools
+from reservation import metrics
 
 
 def main():
-    reservation_handler = ReservationHandler()
+    args = parse_args()
+    options = {"replica": True, "refresh_interval": args.replica_refresh} if args.replica else {}
+    reservation_handler = ReservationHandler(args.database, args.backend, **options)
+    if args.metrics is not None:
+        metrics.enable()
+        # also runs when the menu exits with option 5
+        atexit.register(metrics.dump, args.metrics, reservation_handler._database)
+    if args.batch is not None:
+        run_batch(reservation_handler, args.batch, args.output)
+        return
+    if args.serve is not None:
+        # asyncio is imported only when serving
+        from reservation import server
+        host, _, port = args.serve.rpartition(":")
+        server.serve(reservation_handler, host or "127.0.0.1", int(port), args.workers)
+        reservation_handler._database.close_database()
+        return
 
     while True:
         ask_user()
@@ -22,15 +45,58 @@ def main():
         input("Press enter to continue...")
 
 
+def parse_args():
+    parser = argparse.ArgumentParser(prog="tennis_scheduler")
+    parser.add_argument("--database", default=MAIN_DB, help="path to the sqlite database")
+    parser.add_argument("--backend", choices=BACKENDS,
+                        help="storage backend, defaults to $TENNIS_SCHEDULER_BACKEND or orm "
+                             "(memory keeps reservations until exit only)")
+    parser.add_argument("--batch", metavar="FILE",
+                        help="run JSONL commands from FILE ('-' for stdin) without prompts and exit")
+    parser.add_argument("--output", metavar="FILE", default="-",
+                        help="where to write JSONL results of --batch ('-' for stdout)")
+    parser.add_argument("--serve", metavar="[HOST:]PORT",
+                        help="serve reservations over HTTP instead of the menu")
+    parser.add_argument("--workers", type=int, default=4,
+                        help="threads running database work of --serve")
+    parser.add_argument("--metrics", metavar="FILE",
+                        help="measure database calls and checks, save them to FILE as JSON on exit")
+    parser.add_argument("--replica", action="store_true",
+                        help="serve reads from an in-memory copy of the database (raw backend only)")
+    parser.add_argument("--replica-refresh", metavar="SECONDS", type=float,
+                        help="copy the database into the replica again every SECONDS, for writes of other processes")
+    args = parser.parse_args()
+    if args.replica and backend_name(args.backend) != "raw":
+        parser.error("--replica needs the raw backend")
+    if args.replica_refresh is not None and not args.replica:
+        parser.error("--replica-refresh needs --replica")
+    return args
+
+
+def run_batch(reservation_handler: ReservationHandler, batch: str, output: str):
+    commands = sys.stdin if batch == "-" else open(batch, encoding="utf-8")
+    results = sys.stdout if output == "-" else open(output, "w", encoding="utf-8")
+    try:
+        CommandRunner(reservation_handler).run(commands, results)
+    finally:
+        for file in (commands, results):
+            if file not in (sys.stdin, sys.stdout):
+                file.close()
+        reservation_handler._database.close_database()
+
+
 def ask_user():
     tools.terminal_clear()
 
-    print("What do you want to do? {1, 2, 3, 4, 5}")
+    print("What do you want to do? {1, 2, 3, 4, 5, 6, 7, 8}")
     print("1. Make a reservation")
     print("2. Cancel a reservation")
     print("3. Print schedule")
     print("4. Save schedule to file")
     print("5. Exit")
+    print("6. Import reservations from file")
+    print("7. Make a weekly reservation")
+    print("8. Save changes since the last save to file")
 
 
 if __name__ == "__main__":
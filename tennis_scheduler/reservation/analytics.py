@@ -0,0 +1,168 @@
+"""
+Court utilization report of a season -> fill rate per hour of the week, peak slots, top users and cancellation rate,
+computed with NumPy over the columns of get_reservations() (see schedule.Reservations), NumPy is only needed here.
+
+    $ python -m tennis_scheduler.reservation.analytics tennis_scheduler.sqlite --start 2050-01-01 --end 2050-12-31
+"""
+import argparse
+import calendar
+import csv
+import json
+import sys
+from datetime import datetime, timedelta
+
+import numpy as np
+
+from . import slots
+from .database.backend import BACKENDS, open_backend
+from .database.schema import ADD, CANCEL
+from .schedule import MINUTES_PER_DAY
+
+REPORT_FORMATS = ["csv", "json"]
+TOP = 10
+
+# first slot of every hour the courts are open -> 8:00 is slots 0 and 1, 18:00 only slot 20
+HOUR_STARTS = np.arange(0, slots.SLOTS_PER_DAY, 60 // slots.SLOT_LENGTH)
+SLOTS_PER_HOUR = np.diff(np.append(HOUR_STARTS, slots.SLOTS_PER_DAY))
+
+
+def claimed_cells(starts, ends) -> tuple:
+    """
+    (row, day, slot) of every half-hour cell claimed by reservations starting and ending at the given minutes
+    from midnight of the first day, the same cells the slot grid triggers claim (see schema._claimed_cells())
+    """
+    day = starts // MINUTES_PER_DAY
+    first = (starts % MINUTES_PER_DAY - slots.DAY_START + slots.SLOT_LENGTH - 1) // slots.SLOT_LENGTH
+    last = np.where(ends // MINUTES_PER_DAY > day, slots.SLOTS_PER_DAY,
+                    (ends % MINUTES_PER_DAY - slots.DAY_START + slots.SLOT_LENGTH - 1) // slots.SLOT_LENGTH)
+    first = np.clip(first, 0, slots.SLOTS_PER_DAY)
+    lengths = np.clip(last, first, slots.SLOTS_PER_DAY) - first
+    rows = np.repeat(np.arange(len(starts)), lengths)
+    # position of every cell inside its reservation -> 0, 1, .. lengths - 1
+    within = np.arange(len(rows)) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+    return rows, day[rows], first[rows] + within
+
+
+def report(database, start_date: datetime, end_date: datetime, top: int = TOP) -> dict:
+    """ statistics of the reservations starting from start_date till end_date (exclusive), both at midnight """
+    days = (end_date - start_date).days
+    reservations = database.get_reservations(start_date, end_date)
+    # the columns are int32 arrays already, NumPy reads them without a copy
+    starts = np.frombuffer(reservations.starts, dtype=np.intc).astype(np.int64)
+    ends = np.frombuffer(reservations.ends, dtype=np.intc).astype(np.int64)
+
+    _, cell_days, cell_slots = claimed_cells(starts, ends)
+    weekdays = (start_date.weekday() + cell_days) % 7
+    booked = np.bincount(weekdays * slots.SLOTS_PER_DAY + cell_slots,
+                         minlength=7 * slots.SLOTS_PER_DAY).reshape(7, slots.SLOTS_PER_DAY)
+    # every court of every day of the range can be booked once per slot
+    days_per_weekday = np.bincount((start_date.weekday() + np.arange(days)) % 7, minlength=7)
+    capacity = np.repeat(days_per_weekday[:, np.newaxis] * slots.COURTS, slots.SLOTS_PER_DAY, axis=1)
+    fill = np.divide(booked, capacity, out=np.zeros(booked.shape), where=capacity > 0)
+
+    hour_booked = np.add.reduceat(booked, HOUR_STARTS, axis=1)
+    hour_capacity = days_per_weekday[:, np.newaxis] * slots.COURTS * SLOTS_PER_HOUR
+    hour_fill = np.divide(hour_booked, hour_capacity, out=np.zeros(hour_booked.shape), where=hour_capacity > 0)
+
+    # the busiest slots of the week, ties keep the week order
+    peaks = np.argsort(-fill, axis=None, kind="stable")[:top]
+
+    codes = {}
+    users = np.fromiter((codes.setdefault(name, len(codes)) for name in reservations.names), dtype=np.intp,
+                        count=len(reservations))
+    counts = np.bincount(users, minlength=len(codes))
+    played = np.bincount(users, weights=ends - starts, minlength=len(codes))
+    names = list(codes)
+    # most hours first, then most reservations, then the earliest reservation
+    ranking = np.lexsort((np.arange(len(codes)), -counts, -played))[:top]
+
+    changes = database.count_changes(start_date, end_date)
+    added, cancelled = changes[ADD], changes[CANCEL]
+
+    total_capacity = int(capacity.sum())
+    return {"start": start_date.strftime("%Y-%m-%d"),
+            "end": (end_date - timedelta(days=1)).strftime("%Y-%m-%d"),
+            "days": days,
+            "courts": slots.COURTS,
+            "reservations": len(reservations),
+            "hours_booked": float((ends - starts).sum()) / 60,
+            "fill_rate": float(booked.sum()) / total_capacity if total_capacity else 0.0,
+            "hours_of_week": [{"weekday": calendar.day_name[weekday],
+                               "hour": f"{(slots.DAY_START + int(first) * slots.SLOT_LENGTH) // 60:02d}:00",
+                               "booked_slots": int(hour_booked[weekday, hour]),
+                               "capacity": int(hour_capacity[weekday, hour]),
+                               "fill_rate": float(hour_fill[weekday, hour])}
+                              for weekday in range(7) for hour, first in enumerate(HOUR_STARTS)],
+            "peak_slots": [{"weekday": calendar.day_name[weekday],
+                            "time": slots.slot_time(datetime.min, int(slot)).strftime("%H:%M"),
+                            "booked_slots": int(booked[weekday, slot]),
+                            "capacity": int(capacity[weekday, slot]),
+                            "fill_rate": float(fill[weekday, slot])}
+                           for weekday, slot in zip(*np.unravel_index(peaks, fill.shape))],
+            "top_users": [{"name": names[user], "reservations": int(counts[user]), "hours": float(played[user]) / 60}
+                          for user in ranking],
+            "cancellations": {"added": added, "cancelled": cancelled,
+                              "rate": cancelled / added if added else 0.0}}
+
+
+def save_report(filename: str, statistics: dict, extension: str = "json") -> list:
+    """
+    json -> the whole report in FILENAME.json, csv -> one table per file:
+    FILENAME_summary.csv, FILENAME_hours.csv, FILENAME_peaks.csv and FILENAME_users.csv,
+    returns the names of the files written
+    """
+    if extension == "json":
+        with open(filename + ".json", "w", encoding="utf-8") as file:
+            json.dump(statistics, file, indent=2)
+        return [filename + ".json"]
+
+    cancellations = statistics["cancellations"]
+    summary = [(key, value) for key, value in statistics.items() if not isinstance(value, (list, dict))] + \
+              [("cancellations_" + key, value) for key, value in cancellations.items()]
+    tables = {"summary": (["metric", "value"], summary),
+              "hours": (["weekday", "hour", "booked_slots", "capacity", "fill_rate"],
+                        [list(row.values()) for row in statistics["hours_of_week"]]),
+              "peaks": (["weekday", "time", "booked_slots", "capacity", "fill_rate"],
+                        [list(row.values()) for row in statistics["peak_slots"]]),
+              "users": (["name", "reservations", "hours"], [list(row.values()) for row in statistics["top_users"]])}
+    written = []
+    for table, (header, rows) in tables.items():
+        with open(f"{filename}_{table}.csv", "w", newline="", encoding="utf-8") as file:
+            writer = csv.writer(file)
+            writer.writerow(header)
+            writer.writerows(rows)
+        written.append(f"{filename}_{table}.csv")
+    return written
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m tennis_scheduler.reservation.analytics",
+                                     description="Court utilization report of a date range.")
+    parser.add_argument("database", help="path to the sqlite database")
+    parser.add_argument("--start", type=datetime.fromisoformat, required=True, help="first day, YYYY-MM-DD")
+    parser.add_argument("--end", type=datetime.fromisoformat, required=True, help="last day, YYYY-MM-DD")
+    parser.add_argument("--format", choices=REPORT_FORMATS, default="json")
+    parser.add_argument("--output", default="report", help="file name without the extension")
+    parser.add_argument("--top", type=int, default=TOP, help="peak slots and users listed")
+    parser.add_argument("--backend", choices=list(BACKENDS), help="storage backend, the default one if not given")
+    args = parser.parse_args(argv)
+
+    start_date = datetime.combine(args.start.date(), datetime.min.time())
+    end_date = datetime.combine(args.end.date(), datetime.min.time()) + timedelta(days=1)
+    if end_date <= start_date:
+        print("Start date must be before end date.")
+        return 1
+    database = open_backend(args.database, args.backend)
+    try:
+        statistics = report(database, start_date, end_date, args.top)
+    finally:
+        database.close_database()
+    for filename in save_report(args.output, statistics, args.format):
+        print(f"Saved {filename}")
+    print(f"{statistics['reservations']} reservations, fill rate {statistics['fill_rate']:.1%}, "
+          f"cancellation rate {statistics['cancellations']['rate']:.1%}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,228 @@
+import json
+from datetime import datetime, timedelta
+
+from . import export, metrics
+from .reservation_validator import Validator, BOOKING_OPTIONS
+from .tools import headless, take_message
+
+COMMANDS = ["reserve", "series", "cancel", "schedule", "export", "changes", "closest", "report", "metrics"]
+
+# dates in commands and results use the same formats as the interactive prompts
+DATETIME_FORMAT = "%d.%m.%Y %H:%M"
+
+
+class CommandError(Exception):
+    pass
+
+
+def _reservation(name: str, start_time: datetime, end_time: datetime, court: int) -> dict:
+    return {"name": name,
+            "start_time": start_time.strftime(DATETIME_FORMAT),
+            "end_time": end_time.strftime(DATETIME_FORMAT),
+            "court": court}
+
+
+class CommandRunner(object):
+    """
+    runs reserve/cancel/schedule/export commands without prompts, e.g.
+
+    {"command": "reserve", "name": "John Smith", "date": "10.07.2050 15:30", "duration": 60, "accept_closest": true}
+    {"command": "reserve", "name": "John Smith", "date": "10.07.2050 15:30", "duration": 60, "court": 3}
+    {"command": "series", "name": "John Smith", "date": "10.07.2050 15:30", "duration": 60, "repeat": "weekly",
+     "until": "25.09.2050", "fallback": true}
+    {"command": "cancel", "name": "John Smith", "date": "10.07.2050 15:30"}
+    {"command": "schedule", "start": "10.07.2050", "end": "14.07.2050"}
+    {"command": "export", "start": "10.07.2050", "end": "14.07.2050", "format": "csv", "filename": "july"}
+    {"command": "changes", "format": "csv", "filename": "sync"}
+    {"command": "closest", "date": "10.07.2050 15:30", "duration": 60, "count": 3}
+    {"command": "report", "start": "01.01.2050", "end": "31.12.2050", "format": "json", "filename": "season"}
+    {"command": "metrics"}
+
+    every command is checked by the same Validator methods as the interactive menu,
+    what they would print becomes the "message" of an error result,
+    without "court" reserve and closest look at every court and reserve books the first free one
+    """
+
+    def __init__(self, validator: Validator):
+        self._validator = validator
+
+    def run(self, lines, output) -> None:
+        """ one JSON command per line in, one JSON result per line out """
+        for line in lines:
+            if not line.strip():
+                continue
+            try:
+                command = json.loads(line)
+            except ValueError:
+                command = None
+            output.write(json.dumps(self.execute(command)) + "\n")
+        output.flush()
+
+    def execute(self, command) -> dict:
+        if not isinstance(command, dict) or command.get("command") not in COMMANDS:
+            result = {"status": "error", "message": f"Invalid command. Please provide one of {COMMANDS}."}
+        else:
+            with headless() as messages:
+                try:
+                    result = getattr(self, "_" + command["command"])(command)
+                except CommandError as e:
+                    result = {"status": "error", "message": str(e) or take_message(messages)}
+                except Exception as e:
+                    # e.g. a value of an unexpected type or a database error, the next commands still run
+                    result = {"status": "error", "message": f"Command failed -> {type(e).__name__}: {e}"}
+        if isinstance(command, dict) and "id" in command:
+            result["id"] = command["id"]
+        return result
+
+    @staticmethod
+    def _check(value):
+        """ result of a Validator check, None means the check failed and printed why """
+        if value is None:
+            raise CommandError
+        return value
+
+    @staticmethod
+    def _duration(command: dict) -> int:
+        """ booking option of the minutes in "duration", see BOOKING_OPTIONS """
+        duration = command.get("duration")
+        option = BOOKING_OPTIONS.get(duration) if isinstance(duration, int) else None
+        if option is None:
+            raise CommandError("Invalid duration. Please provide 30, 60 or 90 minutes.")
+        return option
+
+    def _court(self, command: dict):
+        """ court of the command, None when any court will do """
+        if command.get("court") is None:
+            return
+        return self._check(self._validator._invalid_court_format(command["court"]))
+
+    def _reserve(self, command: dict) -> dict:
+        name = self._check(self._validator._invalid_name_regex(str(command.get("name", ""))))
+        date = self._check(self._validator._invalid_date_format(str(command.get("date", "")), "reservation"))
+        book = self._check(self._validator._invalid_booking_format(self._duration(command), date))
+        court = self._court(command)
+        self._check(self._validator._check_reservation_conditions(name, date))
+
+        if self._validator._check_availability(date, date + timedelta(minutes=book), court) is None:
+            # the closest time may be on another court
+            closest = self._validator._check_closest_reservation(date, book)
+            if closest is None:
+                closest = self._check(self._validator._check_next_available_times(date, book, count=1))[0]
+            court, closest_time = closest
+            if not command.get("accept_closest"):
+                return {"status": "unavailable", "closest": closest_time.strftime(DATETIME_FORMAT), "court": court}
+            # time from another day may fall into another week
+            self._check(self._validator._check_too_many_reservations(name, closest_time))
+            date = closest_time
+
+        court = self._validator._database.book_if_free(name, date, date + timedelta(minutes=book), court)
+        if court is None:
+            return {"status": "unavailable", "message": "The time has just been booked by someone else."}
+        return {"status": "ok", "reservation": _reservation(name, date, date + timedelta(minutes=book), court)}
+
+    def _series(self, command: dict) -> dict:
+        name = self._check(self._validator._invalid_name_regex(str(command.get("name", ""))))
+        date = self._check(self._validator._invalid_date_format(str(command.get("date", "")), "reservation"))
+        book = self._check(self._validator._invalid_booking_format(self._duration(command), date))
+        repeat = self._check(self._validator._invalid_repeat_format(command.get("repeat", "weekly")))
+        end_date = self._check(self._validator._invalid_date_format(str(command.get("until", "")), "series_end"))
+        court = self._court(command)
+        self._check(self._validator._check_series_conditions(date, end_date))
+
+        results = self._validator._book_series(name, date, book, repeat, end_date, court,
+                                               bool(command.get("fallback")))
+        reservations = [_reservation(name, time, time + timedelta(minutes=book), booked_court)
+                        for _, booked_court, time, _ in results if booked_court is not None]
+        return {"status": "ok" if reservations else "unavailable",
+                "reservations": reservations,
+                "not_booked": [{"date": series_date.strftime(DATETIME_FORMAT), "reason": reason}
+                               for series_date, booked_court, _, reason in results if booked_court is None]}
+
+    def _cancel(self, command: dict) -> dict:
+        name = self._check(self._validator._invalid_name_regex(str(command.get("name", ""))))
+        date = self._check(self._validator._invalid_date_format(str(command.get("date", "")), "cancellation"))
+        court = self._court(command)
+        date = self._check(self._validator._check_cancellation_conditions(name, date))
+        self._validator._database.delete(name, date, court)
+        return {"status": "ok"}
+
+    def _dates(self, command: dict, operation: str) -> tuple:
+        start_date = self._check(self._validator._invalid_date_format(str(command.get("start", "")),
+                                                                      "printing_start"))
+        end_date = self._check(self._validator._invalid_date_format(str(command.get("end", "")), "printing_end"))
+        self._check(self._validator._check_data_range(start_date, end_date, operation))
+        return start_date, end_date
+
+    def _schedule(self, command: dict) -> dict:
+        start_date, end_date = self._dates(command, "printing")
+        return {"status": "ok",
+                "reservations": [_reservation(*reservation) for reservation in
+                                 self._validator._database.iter_reservations(start_date, end_date)]}
+
+    def _export(self, command: dict) -> dict:
+        start_date, end_date = self._dates(command, "saving")
+        extension = self._check(self._validator._invalid_extension_format(str(command.get("format", ""))))
+        filename = self._check(self._validator._invalid_filename_format(str(command.get("filename", ""))))
+
+        reservations = self._validator._database.iter_reservations(start_date, end_date)
+        compress = extension.endswith(".gz")
+        extension = extension.split(".")[0]
+        if extension == "csv":
+            export.save_to_csv(filename, reservations, compress)
+        elif extension == "ndjson":
+            export.save_to_ndjson(filename, reservations, compress)
+        elif command.get("empty_days", True):
+            export.save_to_json(filename, reservations, start_date, end_date, compress)
+        else:
+            export.save_to_json_no_empty(filename, reservations, compress)
+        return {"status": "ok", "file": f"{filename}.{extension}" + (".gz" if compress else "")}
+
+    def _changes(self, command: dict) -> dict:
+        """ adds and cancellations since the previous "changes" command with the same filename """
+        extension = self._check(self._validator._invalid_extension_format(str(command.get("format", "")),
+                                                                          export.CHANGE_FORMATS))
+        filename = self._check(self._validator._invalid_filename_format(str(command.get("filename", ""))))
+        compress = extension.endswith(".gz")
+        extension = extension.split(".")[0]
+        written, watermark = export.save_changes_since_watermark(self._validator._database, filename, extension,
+                                                                 compress)
+        return {"status": "ok", "file": f"{filename}.{extension}" + (".gz" if compress else ""),
+                "changes": written, "watermark": watermark}
+
+    def _closest(self, command: dict) -> dict:
+        date = self._check(self._validator._invalid_date_format(str(command.get("date", "")), "reservation"))
+        book = self._check(self._validator._invalid_booking_format(self._duration(command), date))
+        self._check(self._validator._check_time_range(date))
+        self._check(self._validator._check_if_not_in_past(date))
+        court = self._court(command)
+        count = command.get("count", 1)
+        if not isinstance(count, int) or not 0 < count <= 20:
+            raise CommandError("Invalid count. Please provide a number from 1 to 20.")
+        times = self._check(self._validator._check_next_available_times(date, book, count=count, court=court))
+        return {"status": "ok",
+                "times": [time.strftime(DATETIME_FORMAT) for _, time in times],
+                "courts": [court for court, _ in times]}
+
+    def _report(self, command: dict) -> dict:
+        """ utilization report of the days from start till end, see analytics.report() """
+        try:
+            # NumPy is only needed by the report, the other commands run without it
+            from . import analytics
+        except ImportError:
+            raise CommandError("The report needs NumPy, install it with pip install numpy.")
+        start_date, end_date = self._dates(command, "saving")
+        extension = self._check(self._validator._invalid_extension_format(str(command.get("format", "")),
+                                                                          analytics.REPORT_FORMATS))
+        if extension.endswith(".gz"):
+            raise CommandError(f"Invalid extension -> {extension}. Reports are not compressed.")
+        filename = self._check(self._validator._invalid_filename_format(str(command.get("filename", ""))))
+        top = command.get("top", analytics.TOP)
+        if not isinstance(top, int) or not 0 < top <= 100:
+            raise CommandError("Invalid top. Please provide a number from 1 to 100.")
+        statistics = analytics.report(self._validator._database, start_date, end_date + timedelta(days=1), top)
+        return {"status": "ok", "files": analytics.save_report(filename, statistics, extension),
+                "reservations": statistics["reservations"], "fill_rate": statistics["fill_rate"],
+                "cancellation_rate": statistics["cancellations"]["rate"]}
+
+    def _metrics(self, command: dict) -> dict:
+        return {"status": "ok", "metrics": metrics.snapshot(self._validator._database)}
@@ -0,0 +1,44 @@
+"""
+Move past reservations out of the clients table into yearly archive tables of the same file.
+
+    $ python -m tennis_scheduler.reservation.database.archive reservations.sqlite --before 2024-01-01
+"""
+import argparse
+import os
+import sqlite3
+import sys
+from datetime import datetime
+
+from . import schema
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m tennis_scheduler.reservation.database.archive",
+                                     description="Archive the reservations starting before a date.")
+    parser.add_argument("database", help="path to the sqlite database")
+    parser.add_argument("--before", type=datetime.fromisoformat,
+                        help="archive reservations starting before this date, the start of this year by default")
+    parser.add_argument("--batch-size", type=int, default=schema.ARCHIVE_BATCH_SIZE,
+                        help="reservations moved per transaction")
+    args = parser.parse_args(argv)
+
+    if not os.path.exists(args.database):
+        print(f"{args.database} doesn't exist.")
+        return 1
+    before = args.before or datetime(datetime.now().year, 1, 1)
+    conn = sqlite3.connect(args.database, timeout=schema.BUSY_TIMEOUT)
+    try:
+        schema.migrate(conn)
+        moved = schema.archive_reservations(conn, before, args.batch_size)
+        for year, count in sorted(moved.items()):
+            print(f"Archived {count} reservations into {schema.archive_table(year)}.")
+        hot = conn.execute("SELECT COUNT(*) FROM clients").fetchone()[0]
+        print(f"{args.database}: {sum(moved.values())} reservations archived before {before:%Y-%m-%d %H:%M}, "
+              f"{hot} left in clients.")
+    finally:
+        conn.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
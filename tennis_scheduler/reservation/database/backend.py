@@ -0,0 +1,82 @@
+import importlib
+import os
+from datetime import datetime
+from typing import Iterable, Iterator, Protocol, runtime_checkable
+
+from ..schedule import Reservations
+
+# name -> (module of this package, class), modules are imported only when their backend is opened
+BACKENDS = {"raw": ("database", "Database"),
+            "orm": ("database_orm", "DatabaseORM"),
+            "memory": ("memory", "MemoryDatabase")}
+
+DEFAULT_BACKEND = "orm"
+
+# picks the backend when none is given explicitly, e.g. TENNIS_SCHEDULER_BACKEND=memory
+BACKEND_VARIABLE = "TENNIS_SCHEDULER_BACKEND"
+
+
+@runtime_checkable
+class StorageBackend(Protocol):
+    """
+    what the Validator, the importer, the batch runner and the server need from a storage backend,
+    reservations are (name, start_time, end_time, court) rows, court None in a call means any court,
+    get_reservations() returns them in columns (see schedule.Reservations)
+    """
+
+    def insert(self, name: str, start_time: datetime, end_time: datetime, court: int = 1) -> None: ...
+
+    def insert_many(self, reservations: Iterable[tuple]) -> None: ...
+
+    def book_if_free(self, name: str, start_time: datetime, end_time: datetime, court: int = None): ...
+
+    def book_series(self, name: str, reservations: Iterable[tuple], court: int = None, week_limit: int = None,
+                    fallback_from: datetime = None) -> list: ...
+
+    def book_many(self, reservations: Iterable[tuple]) -> list: ...
+
+    def delete(self, name: str, date: datetime, court: int = None) -> None: ...
+
+    def check_availability(self, date_start: datetime, date_end: datetime, court: int = None) -> bool: ...
+
+    def free_court(self, date_start: datetime, date_end: datetime, court: int = None): ...
+
+    def get_reservations(self, start_date: datetime, end_date: datetime) -> Reservations: ...
+
+    def iter_reservations(self, start_date: datetime, end_date: datetime, chunk_size: int = 1000) -> Iterator: ...
+
+    def iter_changes(self, after: int = 0, chunk_size: int = 1000) -> Iterator: ...
+
+    def count_changes(self, start_date: datetime, end_date: datetime) -> dict: ...
+
+    def check_too_many_reservations(self, name: str, date: datetime) -> bool: ...
+
+    def get_reserved_times(self, start_date: datetime) -> list: ...
+
+    def get_reserved_times_range(self, start_date: datetime, end_date: datetime) -> list: ...
+
+    def get_user_reserved_times(self, name: str, date: datetime) -> datetime: ...
+
+    def get_free_slots(self, start_date: datetime, end_date: datetime, court: int = None) -> int: ...
+
+    def cache_stats(self) -> dict: ...
+
+    def close_database(self) -> None: ...
+
+
+def backend_name(name: str = None) -> str:
+    """ name, $TENNIS_SCHEDULER_BACKEND, or DEFAULT_BACKEND """
+    return name or os.environ.get(BACKEND_VARIABLE) or DEFAULT_BACKEND
+
+
+def backend_class(name: str = None) -> type:
+    """ class of the backend called name, of $TENNIS_SCHEDULER_BACKEND, or of DEFAULT_BACKEND """
+    name = backend_name(name)
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown storage backend -> {name}, use one of {list(BACKENDS)}.")
+    module, cls = BACKENDS[name]
+    return getattr(importlib.import_module("." + module, __package__), cls)
+
+
+def open_backend(database_name: str, name: str = None, **options) -> StorageBackend:
+    return backend_class(name)(database_name, **options)
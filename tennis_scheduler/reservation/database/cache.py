@@ -0,0 +1,94 @@
+import threading
+from collections import OrderedDict
+from datetime import date, datetime, timedelta
+
+DEFAULT_CACHE_SIZE = 64
+
+
+class ScheduleCache(object):
+    """
+    read-through LRU cache of parsed reservations -> day: [(name, start_time, end_time), ...] sorted by start_time,
+    the backend invalidates the days it writes, version() returns a value that changes whenever another connection
+    writes the database -> checked before the cache is served and everything is dropped when it differs,
+    day_of(row) is the day a loaded row belongs to, by default the date of its start_time
+    """
+
+    def __init__(self, size: int = DEFAULT_CACHE_SIZE, version=None, day_of=None):
+        self.size = size
+        self.hits = 0
+        self.misses = 0
+        self.__days = OrderedDict()
+        self.__lock = threading.Lock()
+        # bumped by every invalidation, rows loaded before it may be stale and are not cached
+        self.__generation = 0
+        self.__version_of = version
+        self.__version = None
+        self.__day_of = day_of or (lambda row: row[1].date())
+
+    def read(self, first_day: date, last_day: date, load) -> list:
+        """
+        reservations starting from first_day till last_day, load(first_day, last_day) reads the missing days
+        from the database, ranges longer than the cache go straight to load()
+        """
+        days = [first_day + timedelta(days=i) for i in range((last_day - first_day).days + 1)]
+        if len(days) > self.size:
+            return load(first_day, last_day)
+
+        version = self.__version_of() if self.__version_of is not None else None
+        with self.__lock:
+            if version != self.__version:
+                # written by someone else since the cached days were read
+                self.__generation += 1
+                self.__days.clear()
+                self.__version = version
+            cached = {}
+            for day in days:
+                if day in self.__days:
+                    self.__days.move_to_end(day)
+                    cached[day] = self.__days[day]
+            self.hits += len(cached)
+            self.misses += len(days) - len(cached)
+            generation = self.__generation
+
+        if len(cached) < len(days):
+            missing = [day for day in days if day not in cached]
+            loaded = {day: [] for day in missing}
+            for row in load(missing[0], missing[-1]):
+                day = self.__day_of(row)
+                if day in loaded:
+                    loaded[day].append(row)
+            with self.__lock:
+                if generation == self.__generation:
+                    for day, rows in loaded.items():
+                        self.__days[day] = rows
+                        self.__days.move_to_end(day)
+                    while len(self.__days) > self.size:
+                        self.__days.popitem(last=False)
+            cached.update(loaded)
+        return [row for day in days for row in cached[day]]
+
+    def advance(self, before, after) -> None:
+        """
+        a write of the backend itself moved the version from before to after, the days it touched are invalidated
+        on their own -> the rest stays cached unless someone else wrote in between
+        """
+        with self.__lock:
+            if self.__version == before:
+                self.__version = after
+
+    def invalidate(self, *days) -> None:
+        with self.__lock:
+            self.__generation += 1
+            for day in days:
+                self.__days.pop(day.date() if isinstance(day, datetime) else day, None)
+
+    def clear(self) -> None:
+        with self.__lock:
+            self.__generation += 1
+            self.__days.clear()
+
+    def stats(self) -> dict:
+        with self.__lock:
+            requests = self.hits + self.misses
+            return {"size": self.size, "days": len(self.__days), "hits": self.hits, "misses": self.misses,
+                    "hit_rate": self.hits / requests if requests else 0.0}
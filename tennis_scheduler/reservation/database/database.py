@@ -1,133 +1,467 @@
+import heapq
 import sqlite3
+import threading
+from contextlib import contextmanager
+from itertools import chain
 from sqlite3 import Error
-from datetime import datetime, timedelta
+from datetime import date, datetime, timedelta
+
+from . import replica as replicas, schema
+from .. import slots
+from ..schedule import Reservations, MINUTES_PER_DAY
+from .cache import ScheduleCache, DEFAULT_CACHE_SIZE
+from .time_format import CODECS, TEXT, EPOCH, EPOCH_START, MINUTE
+
+# the cache holds (name, start minute, end minute, court) rows in minutes since EPOCH_START for both time formats
+EPOCH_ORDINAL = EPOCH_START.toordinal()
+
+
+def _cached_day(row) -> date:
+    return date.fromordinal(EPOCH_ORDINAL + row[1] // MINUTES_PER_DAY)
+
+
+def _minutes_after(time: datetime) -> int:
+    """ epoch minute of time, rounded up when it falls inside a minute """
+    return -((EPOCH_START - time) // MINUTE)
 
 
 class Database(object):
-    def __init__(self, db):
+    def __init__(self, db, cache_size: int = DEFAULT_CACHE_SIZE, time_format: str = None, replica: bool = False,
+                 refresh_interval: float = None):
+        """
+        time_format -> "text" or "epoch" for a new file, an existing file keeps the format it was written in,
+        replica -> reads are served from an in-memory copy of the file (see replica.py),
+        refresh_interval -> seconds between copies of the file into the replica, None copies it at startup only
+        """
         self.__db_file = db
-        self.__initialize()
+        self.__conn = None
+        self.__replica = None
+        self.__times = CODECS[TEXT]
+        self.__cache = ScheduleCache(cache_size, self.__data_version, _cached_day)
+        # one connection is shared by every thread, the lock serializes statements and transactions,
+        # the replica connection is used under the same lock
+        self.__lock = threading.RLock()
+        self.__refresher = None
+        self.__closed = threading.Event()
+        self.__initialize(time_format)
+        if replica and self.__conn:
+            self.__replica = replicas.copy(self.__conn)
+            if refresh_interval:
+                self.__refresher = threading.Thread(target=self.__refresh_every, args=(refresh_interval,),
+                                                    name="replica-refresh", daemon=True)
+                self.__refresher.start()
 
-    def __initialize(self):
+    def __initialize(self, time_format: str = None):
         """ create a database connection to a SQLite database """
-        conn = None
         try:
-            conn = sqlite3.connect(self.__db_file)
+            # isolation_level=None -> sqlite3 doesn't open transactions on its own,
+            # they are scoped explicitly with transaction()
+            self.__conn = sqlite3.connect(self.__db_file, check_same_thread=False, isolation_level=None,
+                                          timeout=schema.BUSY_TIMEOUT)
         except Error as e:
             print(e)
         finally:
-            if conn:
-                c = conn.cursor()
-                # by default table will have a key based on the rowid value
-                c.execute('''CREATE TABLE IF NOT EXISTS clients (name TEXT, start_time DATE, end_time DATE)''')
-                conn.close()
-
-    def insert(self, name: str, start_time: datetime, end_time: datetime) -> None:
-        conn = None
-        try:
-            conn = sqlite3.connect(self.__db_file)
-        except Error as e:
-            print(e)
-        finally:
-            if conn:
-                c = conn.cursor()
-                c.execute("INSERT INTO clients VALUES (?, ?, ?)", (name, start_time, end_time))
-                conn.commit()
-                conn.close()
-
-    def delete(self, name: str, date: datetime) -> None:
-        conn = None
+            if self.__conn:
+                # creates the table and indexes, or migrates a legacy file in place
+                schema.enable_wal(self.__conn)
+                schema.migrate(self.__conn)
+                self.__times = CODECS[self.__check_time_format(time_format)]
+
+    def __check_time_format(self, time_format: str) -> str:
+        current = schema.get_time_format(self.__conn)
+        if time_format is None or time_format == current:
+            return current
+        if self.__conn.execute("SELECT 1 FROM clients LIMIT 1").fetchone() is None:
+            schema.convert_time_format(self.__conn, time_format)
+            return time_format
+        raise ValueError(f"{self.__db_file} stores {current} times, convert it with "
+                         f"python -m tennis_scheduler.reservation.database.migrate {self.__db_file} "
+                         f"--time-format {time_format}")
+
+    @property
+    def time_format(self) -> str:
+        return self.__times.name
+
+    def refresh_replica(self) -> None:
+        """
+        copy the file into a new replica, for changes of other processes the change log doesn't replay,
+        the copy is made on a connection of its own so reads go on from the old replica meanwhile
+        """
+        if self.__replica is None:
+            return
+        source = sqlite3.connect(self.__db_file, timeout=schema.BUSY_TIMEOUT)
         try:
-            conn = sqlite3.connect(self.__db_file)
-        except Error as e:
-            print(e)
+            fresh = replicas.copy(source)
         finally:
-            if conn:
-                c = conn.cursor()
-                c.execute("DELETE FROM clients WHERE name == ? AND start_time == ?", (name, date))
-                conn.commit()
-                conn.close()
-
-    def check_availability(self, date_start: datetime, date_end: datetime) -> bool:
-        conn = None
+            source.close()
+        with self.__lock:
+            if self.__replica is None:
+                fresh.close()
+                return
+            stale, self.__replica = self.__replica, fresh
+            # writes of this process committed after the copy was taken are replayed on top of it
+            self.__sync_replica()
+            self.__cache.clear()
+        stale.close()
+
+    def __refresh_every(self, interval: float) -> None:
+        while not self.__closed.wait(interval):
+            try:
+                self.refresh_replica()
+            except Error as e:
+                # e.g. the file is locked for longer than the busy timeout, the next round tries again
+                print(e)
+
+    def __sync_replica(self) -> None:
+        """ replay what was logged in the file since the last sync, called under the lock after every commit """
+        if self.__replica is None:
+            return
         try:
-            conn = sqlite3.connect(self.__db_file)
-        except Error as e:
-            print(e)
-        finally:
-            if conn:
-                cur = conn.cursor()
-                # dates overlap when => (StartA < EndB) and (EndA > StartB)
-                cur.execute("SELECT * FROM clients WHERE ? < end_time AND ? > start_time", (date_start, date_end,))
+            changed = replicas.replay_changes(self.__conn, self.__replica)
+        except Error:
+            # the replica differs from the file in a way the log can't fix -> copied again from this connection
+            self.__replica.close()
+            self.__replica = replicas.copy(self.__conn)
+            self.__cache.clear()
+            return
+        # days changed by other processes since the last sync, the days of this process are invalidated anyway
+        self.__cache.invalidate(*{self.__times.decode(start_time) for start_time in changed})
+
+    def __data_version(self) -> int:
+        """
+        changes with every commit of another connection to the file, commits of this one invalidate their days,
+        the replica only changes when it is synced or copied again and both clear the cache
+        """
+        with self.__lock:
+            if self.__replica is not None:
+                return 0
+            return self.__conn.execute("PRAGMA data_version").fetchone()[0]
+
+    @contextmanager
+    def transaction(self, mode: str = "DEFERRED"):
+        """ run statements in one transaction, nested calls join the outer transaction """
+        with self.__lock:
+            if self.__conn.in_transaction:
+                yield self.__conn.cursor()
+                return
+            self.__conn.execute(f"BEGIN {mode}")
+            try:
+                yield self.__conn.cursor()
+            except BaseException:
+                self.__conn.execute("ROLLBACK")
+                # days read inside the transaction may have been cached with rows that are gone now
+                self.__cache.clear()
+                raise
+            self.__conn.execute("COMMIT")
+            self.__sync_replica()
+
+    @contextmanager
+    def __cursor(self):
+        """ cursor for reads -> of the replica if there is one, of the file inside a transaction """
+        with self.__lock:
+            if self.__replica is None or self.__conn.in_transaction:
+                yield self.__conn.cursor()
+            else:
+                yield self.__replica.cursor()
+
+    def insert(self, name: str, start_time: datetime, end_time: datetime, court: int = 1) -> None:
+        with self.transaction() as cur:
+            cur.execute("INSERT INTO clients (name, start_time, end_time, court) VALUES (?, ?, ?, ?)",
+                        self.__row(name, start_time, end_time, court))
+        self.__cache.invalidate(start_time)
+
+    def insert_many(self, reservations) -> None:
+        """ insert (name, start_time, end_time) or (name, start_time, end_time, court) rows in a single transaction """
+        reservations = list(reservations)
+        with self.transaction() as cur:
+            cur.executemany("INSERT INTO clients (name, start_time, end_time, court) VALUES (?, ?, ?, ?)",
+                            [self.__row(*reservation) for reservation in reservations])
+        self.__cache.invalidate(*{reservation[1].date() for reservation in reservations})
+
+    def __row(self, name: str, start_time: datetime, end_time: datetime, court: int = 1) -> tuple:
+        encode = self.__times.encode
+        return name, encode(start_time), encode(end_time), court
+
+    def delete(self, name: str, date: datetime, court: int = None) -> None:
+        """ court None -> the reservation of name starting at date on any court """
+        with self.transaction() as cur:
+            if court is None:
+                cur.execute("DELETE FROM clients WHERE name == ? AND start_time == ?",
+                            (name, self.__times.encode(date)))
+            else:
+                cur.execute("DELETE FROM clients WHERE name == ? AND start_time == ? AND court == ?",
+                            (name, self.__times.encode(date), court))
+        self.__cache.invalidate(date)
+
+    def check_availability(self, date_start: datetime, date_end: datetime, court: int = None) -> bool:
+        """ court None -> is any court free """
+        with self.__cursor() as cur:
+            return self.__free_court(cur, date_start, date_end, court) is not None
+
+    def free_court(self, date_start: datetime, date_end: datetime, court: int = None):
+        with self.__cursor() as cur:
+            return self.__free_court(cur, date_start, date_end, court)
+
+    def __free_court(self, cur: sqlite3.Cursor, date_start: datetime, date_end: datetime, court: int = None):
+        """ court if it's free, the first free court when court is None, otherwise None """
+        courts = slots.COURT_NUMBERS if court is None else (court,)
+        marks = ", ".join("?" * len(courts))
+        cells = slots.grid_cells(date_start, date_end)
+        if cells is not None:
+            # a time on the half-hour grid is free when none of its cells is claimed -> primary key lookup per court
+            cur.execute(f"SELECT DISTINCT court FROM slots WHERE court IN ({marks}) AND day = ? "
+                        f"AND slot_index >= ? AND slot_index < ?", (*courts, *cells))
+        else:
+            # dates overlap when => (StartA < EndB) and (EndA > StartB)
+            # lower bound on start_time lets the (court, start_time, end_time) index limit the scan
+            cur.execute(f"SELECT DISTINCT court FROM clients WHERE court IN ({marks}) "
+                        f"AND start_time > ? AND ? < end_time AND ? > start_time",
+                        (*courts, self.__times.encode(date_start - schema.MAX_RESERVATION_LENGTH),
+                         self.__times.encode(date_start), self.__times.encode(date_end)))
+        taken = {row[0] for row in cur.fetchall()}
+        return next((free for free in courts if free not in taken), None)
+
+    def book_if_free(self, name: str, start_time: datetime, end_time: datetime, court: int = None):
+        """
+        insert the reservation on court, or on the first free court when court is None,
+        returns the court booked or None when the time is taken,
+        BEGIN IMMEDIATE holds the write lock from the check till the insert so no other process can book in between
+        """
+        with self.transaction("IMMEDIATE") as cur:
+            court = self.__free_court(cur, start_time, end_time, court)
+            if court is None:
+                return
+            cur.execute("INSERT INTO clients (name, start_time, end_time, court) VALUES (?, ?, ?, ?)",
+                        self.__row(name, start_time, end_time, court))
+        self.__cache.invalidate(start_time)
+        return court
+
+    def book_series(self, name: str, reservations, court: int = None, week_limit: int = None,
+                    fallback_from: datetime = None) -> list:
+        """
+        insert every (start_time, end_time) of reservations that is free, on court or on the first free court,
+        returns (court, start_time, reason) of every reservation, see slots.claim_series() for week_limit and
+        fallback_from, the reservations of name in the weeks and the claimed cells of all the days are read with
+        one query each and the free ones inserted in the same transaction
+        """
+        reservations = list(reservations)
+        courts = slots.COURT_NUMBERS if court is None else (court,)
+        days = sorted({slots.day_number(start_time) for start_time, _ in reservations})
+        with self.transaction("IMMEDIATE") as cur:
+            name_times = []
+            if week_limit is not None and reservations:
+                # one range of the (name, start_time) index from the first week to the last one
+                first_week, _ = slots.week_range(min(start_time for start_time, _ in reservations))
+                _, after_last_week = slots.week_range(max(start_time for start_time, _ in reservations))
+                cur.execute("SELECT start_time FROM clients WHERE name == ? AND start_time >= ? AND start_time < ?",
+                            (name, self.__times.encode(first_week), self.__times.encode(after_last_week)))
+                name_times = [self.__times.decode(row[0]) for row in cur.fetchall()]
+            cur.execute(f"SELECT court, day, slot_index FROM slots WHERE court IN ({', '.join('?' * len(courts))}) "
+                        f"AND day IN ({', '.join('?' * len(days))})", (*courts, *days))
+            booked = slots.claim_series(slots.claimed_by_day(cur.fetchall()), reservations, courts, name_times,
+                                        week_limit, fallback_from)
+            cur.executemany("INSERT INTO clients (name, start_time, end_time, court) VALUES (?, ?, ?, ?)",
+                            [self.__row(name, booked_start, booked_start + (end_time - start_time), booked_court)
+                             for (start_time, end_time), (booked_court, booked_start, _) in zip(reservations, booked)
+                             if booked_court is not None])
+        self.__cache.invalidate(*{start_time.date() for start_time, _ in reservations})
+        return booked
+
+    def book_many(self, reservations) -> list:
+        """
+        insert every (name, start_time, end_time, court) of reservations that is free, court None -> the first free
+        court, returns the court booked for every reservation, None for the taken ones,
+        like book_series() the claimed cells are read and the free ones inserted in one IMMEDIATE transaction
+        """
+        reservations = list(reservations)
+        if not reservations:
+            return []
+        days = [slots.day_number(reservation[1]) for reservation in reservations]
+        with self.transaction("IMMEDIATE") as cur:
+            # one primary key range per court, all of them in one statement
+            cur.execute(f"SELECT court, day, slot_index FROM slots WHERE court IN ({', '.join('?' * slots.COURTS)}) "
+                        f"AND day >= ? AND day <= ?", (*slots.COURT_NUMBERS, min(days), max(days)))
+            claimed = slots.claimed_by_day(cur.fetchall())
+            booked = [slots.claim_courts(claimed, [(start_time, end_time)],
+                                         slots.COURT_NUMBERS if court is None else (court,))[0]
+                      for _, start_time, end_time, court in reservations]
+            cur.executemany("INSERT INTO clients (name, start_time, end_time, court) VALUES (?, ?, ?, ?)",
+                            [self.__row(name, start_time, end_time, booked_court)
+                             for (name, start_time, end_time, _), booked_court in zip(reservations, booked)
+                             if booked_court is not None])
+        self.__cache.invalidate(*{reservation[1].date() for reservation in reservations})
+        return booked
+
+    def __load_days(self, first_day: date, last_day: date) -> list:
+        # epoch files hand their integer minutes straight through, sqlite computes them for text files
+        first = datetime.combine(first_day, datetime.min.time())
+        after_last = datetime.combine(last_day, datetime.min.time()) + timedelta(days=1)
+        minutes = self.__times.minutes
+        with self.__cursor() as cur:
+            tables = ["clients"] + schema.archive_tables_for(cur.connection, first, after_last)
+            rows = []
+            for table in tables:
+                cur.execute(f"SELECT name, {minutes('start_time')}, {minutes('end_time')}, court FROM {table} "
+                            f"WHERE start_time >= ? AND start_time < ? "
+                            f"ORDER BY start_time ASC, court ASC, end_time ASC",
+                            (self.__times.encode(first), self.__times.encode(after_last)))
+                rows.append(cur.fetchall())
+        if len(rows) > 1:
+            # archived days -> both tables are in the same order
+            return list(heapq.merge(*rows, key=lambda row: (row[1], row[3], row[2])))
+        return rows[0]
+
+    def get_reservations(self, start_date: datetime, end_date: datetime) -> Reservations:
+        if end_date < start_date:
+            return Reservations(start_date.date(), 0)
+        days = (end_date.date() - start_date.date()).days + 1
+        if days > self.__cache.size:
+            return self.__load_minutes(start_date, end_date, days)
+        # stored times are whole minutes -> the datetime bounds become integer ones
+        first, before, last_end = _minutes_after(start_date), _minutes_after(end_date), CODECS[EPOCH].encode(end_date)
+        origin = CODECS[EPOCH].encode(datetime.combine(start_date.date(), datetime.min.time()))
+        cached = self.__cache.read(start_date.date(), end_date.date(), self.__load_days)
+        rows = ((name_, start_ - origin, end_ - origin, court_) for name_, start_, end_, court_ in cached
+                if first <= start_ < before and end_ <= last_end)
+        return Reservations.from_minutes(rows, start_date.date(), days)
+
+    def __load_minutes(self, start_date: datetime, end_date: datetime, days: int) -> Reservations:
+        """
+        longer than the cache -> sqlite computes the minutes from the first day and the rows go straight
+        into the columns, no time is parsed into a datetime and no list of the whole range is built
+        """
+        encode, minutes = self.__times.encode, self.__times.minutes
+        origin = CODECS[EPOCH].encode(datetime.combine(start_date.date(), datetime.min.time()))
+        with self.__cursor() as cur:
+            tables = schema.archive_tables_for(cur.connection, start_date, end_date) + ["clients"]
+            cursors = [cur.connection.execute(f"SELECT name, {minutes('start_time')} - ?, {minutes('end_time')} - ?, "
+                                           f"court FROM {table} WHERE start_time >= ? AND start_time < ? "
+                                           f"AND end_time <= ? ORDER BY start_time ASC, court ASC, end_time ASC",
+                                           (origin, origin, encode(start_date), encode(end_date), encode(end_date)))
+                       for table in tables]
+            rows = cursors[0] if len(cursors) == 1 else heapq.merge(*cursors, key=lambda row: (row[1], row[3],
+                                                                                                row[2]))
+            return Reservations.from_minutes(rows, start_date.date(), days)
+
+    def iter_reservations(self, start_date: datetime, end_date: datetime, chunk_size: int = 1000):
+        """ same rows as get_reservations(), read chunk by chunk so memory doesn't grow with the range """
+        yield from self.__iter_range(start_date, end_date, chunk_size)
+
+    def __iter_range(self, start_date: datetime, end_date: datetime, chunk_size: int):
+        with self.__cursor() as cur:
+            tables = schema.archive_tables_for(cur.connection, start_date, end_date)
+        if not tables:
+            yield from self.__iter_table("clients", start_date, end_date, chunk_size)
+            return
+        # every archive table holds one year, read one after the other they are in order,
+        # rows booked into the past after archiving may still be in clients -> merged as they stream
+        archived = chain.from_iterable(self.__iter_table(table, start_date, end_date, chunk_size) for table in tables)
+        yield from heapq.merge(archived, self.__iter_table("clients", start_date, end_date, chunk_size),
+                               key=lambda row: (row[1], row[3], row[2]))
+
+    def __iter_table(self, table: str, start_date: datetime, end_date: datetime, chunk_size: int):
+        # keyset pagination in the order of the (start_time, court, end_time) index, the lock is held
+        # only for one chunk and no cursor stays open between chunks, courts are numbered from 1
+        encode, decode = self.__times.encode, self.__times.decode
+        last = (encode(start_date), 0, encode(start_date), 0)
+        while True:
+            with self.__cursor() as cur:
+                cur.execute(f"SELECT start_time, court, end_time, id, name FROM {table} "
+                            f"WHERE (start_time, court, end_time, id) > (?, ?, ?, ?) "
+                            f"AND start_time < ? AND end_time <= ? "
+                            f"ORDER BY start_time ASC, court ASC, end_time ASC, id ASC LIMIT ?",
+                            (*last, encode(end_date), encode(end_date), chunk_size))
                 rows = cur.fetchall()
-                conn.close()
-                return len(rows) <= 0
+            for start_date_, court_, end_date_, _, name_ in rows:
+                yield name_, decode(start_date_), decode(end_date_), court_
+            if len(rows) < chunk_size:
+                return
+            last = rows[-1][:4]
 
-    def get_reservations(self, start_date: datetime, end_date: datetime) -> list:
-        conn = None
-        try:
-            conn = sqlite3.connect(self.__db_file)
-        except Error as e:
-            print(e)
-        finally:
-            if conn:
-                cur = conn.cursor()
-                cur.execute("SELECT name, start_time, end_time FROM clients "
-                            "WHERE start_time >= ? AND end_time <= ? ORDER BY start_time ASC", (start_date, end_date,))
-                rows = [(name_, (datetime.strptime(start_date_, '%Y-%m-%d %H:%M:%S')),
-                         (datetime.strptime(end_date_, '%Y-%m-%d %H:%M:%S')))
-                        for name_, start_date_, end_date_ in cur.fetchall()]
-                conn.close()
-                return rows
+    def iter_changes(self, after: int = 0, chunk_size: int = 1000):
+        """
+        (seq, operation, name, start_time, end_time, court) of every add and cancellation logged after seq after,
+        in seq order, read chunk by chunk from the primary key -> the cost follows the number of changes only
+        """
+        decode = self.__times.decode
+        while True:
+            with self.__cursor() as cur:
+                cur.execute("SELECT seq, operation, name, start_time, end_time, court FROM changes "
+                            "WHERE seq > ? ORDER BY seq ASC LIMIT ?", (after, chunk_size))
+                rows = cur.fetchall()
+            for seq_, operation_, name_, start_date_, end_date_, court_ in rows:
+                yield seq_, operation_, name_, decode(start_date_), decode(end_date_), court_
+            if len(rows) < chunk_size:
+                return
+            after = rows[-1][0]
+
+    def count_changes(self, start_date: datetime, end_date: datetime) -> dict:
+        """ operation -> number of adds and cancellations logged for reservations starting in [start_date, end_date) """
+        with self.__cursor() as cur:
+            cur.execute("SELECT operation, COUNT(*) FROM changes WHERE start_time >= ? AND start_time < ? "
+                        "GROUP BY operation", (self.__times.encode(start_date), self.__times.encode(end_date)))
+            counts = dict(cur.fetchall())
+        return {schema.ADD: counts.get(schema.ADD, 0), schema.CANCEL: counts.get(schema.CANCEL, 0)}
 
     def check_too_many_reservations(self, name: str, date: datetime) -> bool:
-        conn = None
-        try:
-            conn = sqlite3.connect(self.__db_file)
-        except Error as e:
-            print(e)
-        finally:
-            if conn:
-                cur = conn.cursor()
-                cur.execute("SELECT end_time FROM clients WHERE name == ?", (name,))
-                rows = [row for row in cur.fetchall() if
-                        datetime.strptime(row[0], "%Y-%m-%d %H:%M:%S").isocalendar()[1] == date.isocalendar()[1]]
-                conn.close()
-                return len(rows) <= 2
+        # only the rows of the given ISO week are counted, using the (name, start_time) index
+        week_start, week_end = slots.week_range(date)
+        with self.__cursor() as cur:
+            cur.execute("SELECT COUNT(*) FROM clients WHERE name == ? AND start_time >= ? AND start_time < ?",
+                        (name, self.__times.encode(week_start), self.__times.encode(week_end)))
+            reservations = cur.fetchone()[0]
+        return reservations <= slots.WEEK_LIMIT
 
     def get_reserved_times(self, start_date: datetime) -> list:
-        conn = None
-        try:
-            conn = sqlite3.connect(self.__db_file)
-        except Error as e:
-            print(e)
-        finally:
-            if conn:
-                cur = conn.cursor()
-                cur.execute("SELECT start_time, end_time FROM clients WHERE date(end_time) == date(?)", (start_date,))
+        return self.get_reserved_times_range(start_date, start_date)
 
-                rows = [((datetime.strptime(start_date, '%Y-%m-%d %H:%M:%S')),
-                         (datetime.strptime(end_date, '%Y-%m-%d %H:%M:%S')))
-                        for start_date, end_date in cur.fetchall()
-                        if datetime.strptime(start_date, '%Y-%m-%d %H:%M:%S') >= datetime.now() + timedelta(hours=1)]
+    def get_reserved_times_range(self, start_date: datetime, end_date: datetime) -> list:
+        """ (start_time, end_time) of bookable reservations for every day from start_date till end_date """
+        bookable = _minutes_after(datetime.now() + timedelta(hours=1))
+        rows = self.__cache.read(start_date.date(), end_date.date(), self.__load_days)
+        decode = CODECS[EPOCH].decode
+        return [(decode(start_), decode(end_)) for _, start_, end_, _ in rows if start_ >= bookable]
 
-                conn.close()
-                return rows
+    def get_free_slots(self, start_date: datetime, end_date: datetime, court: int = None) -> int:
+        """
+        free slots of every day from start_date till end_date as a packed mask of the court, see slots.days_free_mask(),
+        or of every court when court is None, see slots.courts_free_mask()
+        """
+        days = (end_date.date() - start_date.date()).days + 1
+        first_day, last_day = slots.day_number(start_date), slots.day_number(end_date)
+        with self.__cursor() as cur:
+            if court is not None:
+                cur.execute("SELECT day, slot_index FROM slots WHERE court = ? AND day >= ? AND day <= ?",
+                            (court, first_day, last_day))
+                return slots.claimed_free_mask(start_date, days, cur.fetchall())
+            # one primary key range per court, all of them in one statement
+            cur.execute(f"SELECT court, day, slot_index FROM slots WHERE court IN ({', '.join('?' * slots.COURTS)}) "
+                        f"AND day >= ? AND day <= ?", (*slots.COURT_NUMBERS, first_day, last_day))
+            cells = cur.fetchall()
+        return slots.courts_free_mask(start_date, days, cells)
 
-    def get_user_reserved_times(self, name: str, date: datetime) -> datetime:
-        conn = None
-        try:
-            conn = sqlite3.connect(self.__db_file)
-        except Error as e:
-            print(e)
-        finally:
-            if conn:
-                cur = conn.cursor()
-                cur.execute("SELECT start_time FROM clients WHERE start_time == ? AND name = ?", (date, name))
-                reserved_date = cur.fetchall()
-                if len(reserved_date) > 0:
-                    reserved_date = datetime.strptime(reserved_date[0][0], '%Y-%m-%d %H:%M:%S')
-                conn.close()
-                return reserved_date
+    def cache_stats(self) -> dict:
+        return self.__cache.stats()
 
+    def get_user_reserved_times(self, name: str, date: datetime) -> datetime:
+        with self.__cursor() as cur:
+            cur.execute("SELECT start_time FROM clients WHERE start_time == ? AND name = ?",
+                        (self.__times.encode(date), name))
+            reserved_date = cur.fetchall()
+        if len(reserved_date) > 0:
+            reserved_date = self.__times.decode(reserved_date[0][0])
+        return reserved_date
 
+    def close_database(self) -> None:
+        self.__closed.set()
+        if self.__refresher is not None:
+            # outside the lock, a refresh in progress needs it to finish
+            self.__refresher.join()
+            self.__refresher = None
+        with self.__lock:
+            if self.__replica:
+                self.__replica.close()
+                self.__replica = None
+            if self.__conn:
+                self.__conn.close()
+                self.__conn = None
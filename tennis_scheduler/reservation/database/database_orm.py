@@ -1,87 +1,486 @@
-from sqlalchemy import create_engine, insert, cast, Date, select, Table, Column, String, MetaData, DateTime, exc, and_
-from datetime import datetime, timedelta
+from sqlalchemy import create_engine, insert, select, Table, Column, Integer, String, MetaData, Index, exc, \
+    and_, func, bindparam, cast
+from sqlalchemy.dialects.sqlite import DATETIME
+from sqlalchemy.pool import QueuePool
+import heapq
+import sqlite3
+import threading
+from contextlib import contextmanager
+from itertools import chain
+from datetime import date, datetime, timedelta
+
+from . import replica, schema
+from .. import slots as slot_grid
+from ..schedule import Reservations
+from .cache import ScheduleCache, DEFAULT_CACHE_SIZE
+from .time_format import TEXT, EPOCH_START, MINUTE
+
+# connections kept open by the pool, the threaded HTTP server checks out one per worker
+POOL_SIZE = 4
+POOL_OVERFLOW = 4
+
+# 'YYYY-MM-DD HH:MM:SS' like the raw backend writes and reads them (see time_format.TextTimes), the default
+# DateTime adds '.000000' and the two backends would neither parse nor match each other's rows
+TIME = DATETIME(truncate_microseconds=True)
+
+metadata = MetaData()
+clients = Table('clients', metadata,
+                Column('id', Integer, primary_key=True),
+                Column('name', String),
+                Column('start_time', TIME),
+                Column('end_time', TIME),
+                Column('court', Integer, nullable=False, default=1),
+                Index('idx_clients_start_court', 'start_time', 'court', 'end_time'),
+                Index('idx_clients_court_start', 'court', 'start_time', 'end_time'),
+                Index('idx_clients_name_start', 'name', 'start_time')
+                )
+
+# cells claimed by the reservations, kept up to date by triggers (see schema.py)
+slots = Table('slots', metadata,
+              Column('court', Integer, primary_key=True),
+              Column('day', Integer, primary_key=True),
+              Column('slot_index', Integer, primary_key=True),
+              Column('reservation_id', Integer))
+
+# appended to by triggers on clients (see schema.py), read only
+changes = Table('changes', metadata,
+                Column('seq', Integer, primary_key=True),
+                Column('operation', String),
+                Column('reservation_id', Integer),
+                Column('name', String),
+                Column('start_time', TIME),
+                Column('end_time', TIME),
+                Column('court', Integer),
+                Index('idx_changes_start_operation', 'start_time', 'operation'))
+
+# yearly archive tables (see schema.archive_reservations()), described when a read first reaches one
+archive_metadata = MetaData()
+_archive_selects = {}
+
+
+def _minutes(column):
+    """ minutes from bindparam origin (minutes since the epoch), sqlite reads the text as UTC """
+    return cast(func.strftime('%s', column), Integer) // 60 - bindparam("origin")
+
+
+def _select_minutes(table):
+    """ rows of a range as (name, start minute, end minute, court) counted from origin, for Reservations """
+    return (select(table.c.name, _minutes(table.c.start_time), _minutes(table.c.end_time), table.c.court)
+            .where(and_(table.c.start_time >= bindparam("start_date"),
+                        table.c.start_time < bindparam("end_date"),
+                        table.c.end_time <= bindparam("end_date")))
+            .order_by(table.c.start_time, table.c.court, table.c.end_time))
+
+
+def _archive_select(table_name: str):
+    """
+    SELECT_DAYS, SELECT_RANGE and SELECT_RANGE_MINUTES of an archive table,
+    built once per table like the statements below
+    """
+    if table_name not in _archive_selects:
+        table = Table(table_name, archive_metadata,
+                      Column('id', Integer, primary_key=True),
+                      Column('name', String),
+                      Column('start_time', TIME),
+                      Column('end_time', TIME),
+                      Column('court', Integer))
+        columns = (table.c.name, table.c.start_time, table.c.end_time, table.c.court)
+        order = (table.c.start_time, table.c.court, table.c.end_time)
+        _archive_selects[table_name] = (
+            select(*columns).where(and_(table.c.start_time >= bindparam("first_day"),
+                                        table.c.start_time < bindparam("after_last_day"))).order_by(*order),
+            select(*columns).where(and_(table.c.start_time >= bindparam("start_date"),
+                                        table.c.start_time < bindparam("end_date"),
+                                        table.c.end_time <= bindparam("end_date"))).order_by(*order),
+            _select_minutes(table))
+    return _archive_selects[table_name]
+
+
+def _by_start_court(row) -> tuple:
+    return row[1], row[3], row[2]
+
+
+# statements are built once, SQLAlchemy then finds them in its compiled cache on every call
+INSERT_RESERVATION = insert(clients)
+
+DELETE_RESERVATION = clients.delete().where(and_(clients.c.name == bindparam("name"),
+                                                 clients.c.start_time == bindparam("date")))
+
+DELETE_COURT_RESERVATION = DELETE_RESERVATION.where(clients.c.court == bindparam("court"))
+
+# dates overlap when => (StartA < EndB) and (EndA > StartB),
+# lower bound on start_time lets the (court, start_time, end_time) index limit the scan
+SELECT_OVERLAPPING = (select(clients.c.court).distinct()
+                      .where(and_(clients.c.court.in_(bindparam("courts", expanding=True)),
+                                  clients.c.start_time > bindparam("lower_bound"),
+                                  clients.c.start_time < bindparam("date_end"),
+                                  clients.c.end_time > bindparam("date_start"))))
+
+SELECT_CLAIMED_CELL = (select(slots.c.court).distinct()
+                       .where(and_(slots.c.court.in_(bindparam("courts", expanding=True)),
+                                   slots.c.day == bindparam("day"),
+                                   slots.c.slot_index >= bindparam("first"),
+                                   slots.c.slot_index < bindparam("last"))))
+
+SELECT_CLAIMED_CELLS = (select(slots.c.day, slots.c.slot_index)
+                        .where(and_(slots.c.court == bindparam("court"),
+                                    slots.c.day >= bindparam("first_day"),
+                                    slots.c.day <= bindparam("last_day"))))
+
+# one primary key range per court, all of them in one statement
+SELECT_COURTS_CLAIMED_CELLS = (select(slots.c.court, slots.c.day, slots.c.slot_index)
+                               .where(and_(slots.c.court.in_(slot_grid.COURT_NUMBERS),
+                                           slots.c.day >= bindparam("first_day"),
+                                           slots.c.day <= bindparam("last_day"))))
+
+# the claimed cells of a series of days, one primary key lookup per court and day
+SELECT_SERIES_CELLS = (select(slots.c.court, slots.c.day, slots.c.slot_index)
+                       .where(and_(slots.c.court.in_(bindparam("courts", expanding=True)),
+                                   slots.c.day.in_(bindparam("days", expanding=True)))))
+
+SELECT_DAYS = (select(clients.c.name, clients.c.start_time, clients.c.end_time, clients.c.court)
+               .where(and_(clients.c.start_time >= bindparam("first_day"),
+                           clients.c.start_time < bindparam("after_last_day")))
+               .order_by(clients.c.start_time, clients.c.court, clients.c.end_time))
+
+SELECT_RANGE = (select(clients.c.name, clients.c.start_time, clients.c.end_time, clients.c.court)
+                .where(and_(clients.c.start_time >= bindparam("start_date"),
+                            clients.c.start_time < bindparam("end_date"),
+                            clients.c.end_time <= bindparam("end_date")))
+                .order_by(clients.c.start_time, clients.c.court, clients.c.end_time))
+
+SELECT_RANGE_MINUTES = _select_minutes(clients)
+
+SELECT_CHANGES = (select(changes.c.seq, changes.c.operation, changes.c.name, changes.c.start_time,
+                         changes.c.end_time, changes.c.court)
+                  .where(changes.c.seq > bindparam("after"))
+                  .order_by(changes.c.seq))
+
+COUNT_CHANGES = (select(changes.c.operation, func.count())
+                 .where(and_(changes.c.start_time >= bindparam("start_date"),
+                             changes.c.start_time < bindparam("end_date")))
+                 .group_by(changes.c.operation))
+
+COUNT_WEEK = (select(func.count())
+              .select_from(clients)
+              .where(and_(clients.c.name == bindparam("name"),
+                          clients.c.start_time >= bindparam("week_start"),
+                          clients.c.start_time < bindparam("week_end"))))
+
+LAST_SEQ = select(func.coalesce(func.max(changes.c.seq), 0))
+
+SELECT_NAME_TIMES = select(clients.c.start_time).where(and_(clients.c.name == bindparam("name"),
+                                                            clients.c.start_time >= bindparam("week_start"),
+                                                            clients.c.start_time < bindparam("week_end")))
+
+SELECT_USER_TIME = select(clients.c.start_time).where(and_(clients.c.start_time == bindparam("date"),
+                                                           clients.c.name == bindparam("name")))
 
 
 class DatabaseORM(object):
-    def __init__(self, db):
+    def __init__(self, db, cache_size: int = DEFAULT_CACHE_SIZE):
         self.__db_file = db
         self.engine = None
+        self.__cache = ScheduleCache(cache_size, self.__last_seq)
+        # the version of the cache is read before every cached read -> on a connection of its own, outside the pool
+        self.__version_conn = None
+        self.__version_lock = threading.Lock()
         self.__initialize()
 
     def __initialize(self) -> None:
         try:
-            self.engine = create_engine('sqlite:///' + self.__db_file)
+            # the pool lives as long as the object, close_database() disposes it
+            self.engine = create_engine('sqlite:///' + self.__db_file, poolclass=QueuePool,
+                                        pool_size=POOL_SIZE, max_overflow=POOL_OVERFLOW,
+                                        connect_args={"timeout": schema.BUSY_TIMEOUT, "check_same_thread": False})
         except exc.SQLAlchemyError as e:
             print(e)
         finally:
             if self.engine is None:
                 return
-            metadata = MetaData()
-            self.clients = Table('clients', metadata,
-                                 Column('name', String),
-                                 Column('start_time', DateTime),
-                                 Column('end_time', DateTime)
-                                 )
-            metadata.create_all(self.engine)
-            self.engine.dispose()
-
-    def insert(self, name: str, start_time: datetime, end_time: datetime) -> None:
-        with self.engine.connect() as conn:
-            conn.execute(insert(self.clients)
-            .values(
-                name=name,
-                start_time=start_time,
-                end_time=end_time))
-            conn.commit()
+            # schema and migrations are shared with the raw sqlite backend, for an up to date file
+            # this is a few pragmas and one select instead of create_all() reflecting the tables
+            conn = self.engine.raw_connection()
+            try:
+                schema.enable_wal(conn.driver_connection)
+                schema.migrate(conn.driver_connection)
+                time_format = schema.get_time_format(conn.driver_connection)
+            finally:
+                conn.close()
+            # DateTime columns can't read integer minutes, epoch files are served by the raw backend only
+            if time_format != TEXT:
+                raise ValueError(f"{self.__db_file} stores {time_format} times, open it with Database instead.")
+            self.clients = clients
 
-    def delete(self, name: str, date: datetime) -> None:
+    def __last_seq(self) -> int:
+        """
+        the pooled connections each count PRAGMA data_version on their own -> the last change logged is the same
+        for all of them, writes of this object move it too and tell the cache so in __write()
+        """
+        with self.__version_lock:
+            if self.__version_conn is None:
+                self.__version_conn = sqlite3.connect(self.__db_file, check_same_thread=False,
+                                                      timeout=schema.BUSY_TIMEOUT)
+            return replica.last_seq(self.__version_conn)
+
+    @contextmanager
+    def __write(self):
+        """
+        connection in an IMMEDIATE transaction committed at the end, the seqs logged by it are read under the write
+        lock, so the cache keeps the days the write didn't touch
+        """
         with self.engine.connect() as conn:
-            conn.execute(self.clients.delete()
-                         .where(and_(self.clients.c.name == name,
-                                     self.clients.c.start_time == date)))
+            # pysqlite would only begin a deferred transaction at the first insert or delete
+            conn.exec_driver_sql("BEGIN IMMEDIATE")
+            before = conn.execute(LAST_SEQ).scalar()
+            yield conn
+            after = conn.execute(LAST_SEQ).scalar()
             conn.commit()
+        self.__cache.advance(before, after)
+
+    def insert(self, name: str, start_time: datetime, end_time: datetime, court: int = 1) -> None:
+        with self.__write() as conn:
+            conn.execute(INSERT_RESERVATION, {"name": name, "start_time": start_time, "end_time": end_time,
+                                              "court": court})
+        self.__cache.invalidate(start_time)
+
+    def insert_many(self, reservations) -> None:
+        """ insert (name, start_time, end_time) or (name, start_time, end_time, court) rows in a single transaction """
+        rows = [{"name": reservation[0], "start_time": reservation[1], "end_time": reservation[2],
+                 "court": reservation[3] if len(reservation) > 3 else 1}
+                for reservation in reservations]
+        if not rows:
+            return
+        with self.__write() as conn:
+            conn.execute(INSERT_RESERVATION, rows)
+        self.__cache.invalidate(*{row["start_time"].date() for row in rows})
+
+    def delete(self, name: str, date: datetime, court: int = None) -> None:
+        """ court None -> the reservation of name starting at date on any court """
+        with self.__write() as conn:
+            if court is None:
+                conn.execute(DELETE_RESERVATION, {"name": name, "date": date})
+            else:
+                conn.execute(DELETE_COURT_RESERVATION, {"name": name, "date": date, "court": court})
+        self.__cache.invalidate(date)
 
-    def check_availability(self, date_start: datetime, date_end: datetime) -> bool:
+    def check_availability(self, date_start: datetime, date_end: datetime, court: int = None) -> bool:
+        """ court None -> is any court free """
         with self.engine.connect() as conn:
-            result = conn.execute(select(self.clients)
-                                  .where(and_(date_end > self.clients.c.start_time,
-                                              date_start < self.clients.c.end_time))).fetchall()
-        return len(result) <= 0
+            return self.__free_court(conn, date_start, date_end, court) is not None
 
-    def get_reservations(self, start_date: datetime, end_date: datetime) -> list:
+    def free_court(self, date_start: datetime, date_end: datetime, court: int = None):
         with self.engine.connect() as conn:
-            result = conn.execute(select(self.clients)
-                                  .where(and_(self.clients.c.start_time >= start_date,
-                                              self.clients.c.end_time <= end_date))
-                                  .order_by(self.clients.c.start_time)).fetchall()
-        self.engine.dispose()
-        return result
+            return self.__free_court(conn, date_start, date_end, court)
 
     @staticmethod
-    def __is_the_same_day(date_one: datetime, date_two: datetime) -> bool:
-        return date_one.isocalendar()[1] == date_two.isocalendar()[1]
+    def __free_court(conn, date_start: datetime, date_end: datetime, court: int = None):
+        """ court if it's free, the first free court when court is None, otherwise None """
+        courts = slot_grid.COURT_NUMBERS if court is None else (court,)
+        cells = slot_grid.grid_cells(date_start, date_end)
+        if cells is not None:
+            # a time on the half-hour grid is free when none of its cells is claimed -> primary key lookup per court
+            day, first, last = cells
+            taken = conn.execute(SELECT_CLAIMED_CELL, {"courts": courts, "day": day, "first": first,
+                                                       "last": last}).scalars().all()
+        else:
+            taken = conn.execute(SELECT_OVERLAPPING, {"courts": courts,
+                                                      "lower_bound": date_start - schema.MAX_RESERVATION_LENGTH,
+                                                      "date_start": date_start,
+                                                      "date_end": date_end}).scalars().all()
+        return next((free for free in courts if free not in taken), None)
+
+    def book_if_free(self, name: str, start_time: datetime, end_time: datetime, court: int = None):
+        """
+        insert the reservation on court, or on the first free court when court is None,
+        returns the court booked or None when the time is taken,
+        BEGIN IMMEDIATE holds the write lock from the check till the insert so no other process can book in between
+        """
+        with self.__write() as conn:
+            court = self.__free_court(conn, start_time, end_time, court)
+            if court is not None:
+                conn.execute(INSERT_RESERVATION, {"name": name, "start_time": start_time, "end_time": end_time,
+                                                  "court": court})
+        if court is not None:
+            self.__cache.invalidate(start_time)
+        return court
+
+    def book_series(self, name: str, reservations, court: int = None, week_limit: int = None,
+                    fallback_from: datetime = None) -> list:
+        """
+        insert every (start_time, end_time) of reservations that is free, on court or on the first free court,
+        returns (court, start_time, reason) of every reservation, see slots.claim_series() for week_limit and
+        fallback_from, the reservations of name in the weeks and the claimed cells of all the days are read with
+        one query each and the free ones inserted in the same transaction
+        """
+        reservations = list(reservations)
+        courts = slot_grid.COURT_NUMBERS if court is None else (court,)
+        days = sorted({slot_grid.day_number(start_time) for start_time, _ in reservations})
+        with self.__write() as conn:
+            name_times = []
+            if week_limit is not None and reservations:
+                # one range of the (name, start_time) index from the first week to the last one
+                first_week, _ = slot_grid.week_range(min(start_time for start_time, _ in reservations))
+                _, after_last_week = slot_grid.week_range(max(start_time for start_time, _ in reservations))
+                name_times = conn.execute(SELECT_NAME_TIMES, {"name": name, "week_start": first_week,
+                                                              "week_end": after_last_week}).scalars().all()
+            cells = conn.execute(SELECT_SERIES_CELLS, {"courts": courts, "days": days}).fetchall()
+            booked = slot_grid.claim_series(slot_grid.claimed_by_day(cells), reservations, courts, name_times,
+                                            week_limit, fallback_from)
+            rows = [{"name": name, "start_time": booked_start, "end_time": booked_start + (end_time - start_time),
+                     "court": booked_court}
+                    for (start_time, end_time), (booked_court, booked_start, _) in zip(reservations, booked)
+                    if booked_court is not None]
+            if rows:
+                conn.execute(INSERT_RESERVATION, rows)
+        self.__cache.invalidate(*{start_time.date() for start_time, _ in reservations})
+        return booked
+
+    def book_many(self, reservations) -> list:
+        """
+        insert every (name, start_time, end_time, court) of reservations that is free, court None -> the first free
+        court, returns the court booked for every reservation, None for the taken ones,
+        like book_series() the claimed cells are read and the free ones inserted in one IMMEDIATE transaction
+        """
+        reservations = list(reservations)
+        if not reservations:
+            return []
+        days = [slot_grid.day_number(reservation[1]) for reservation in reservations]
+        with self.__write() as conn:
+            cells = conn.execute(SELECT_COURTS_CLAIMED_CELLS, {"first_day": min(days), "last_day": max(days)}).fetchall()
+            claimed = slot_grid.claimed_by_day(cells)
+            booked = [slot_grid.claim_courts(claimed, [(start_time, end_time)],
+                                             slot_grid.COURT_NUMBERS if court is None else (court,))[0]
+                      for _, start_time, end_time, court in reservations]
+            rows = [{"name": name, "start_time": start_time, "end_time": end_time, "court": booked_court}
+                    for (name, start_time, end_time, _), booked_court in zip(reservations, booked)
+                    if booked_court is not None]
+            if rows:
+                conn.execute(INSERT_RESERVATION, rows)
+        self.__cache.invalidate(*{reservation[1].date() for reservation in reservations})
+        return booked
+
+    def __load_days(self, first_day: date, last_day: date) -> list:
+        parameters = {"first_day": datetime.combine(first_day, datetime.min.time()),
+                      "after_last_day": datetime.combine(last_day, datetime.min.time()) + timedelta(days=1)}
+        with self.engine.connect() as conn:
+            result = conn.execute(SELECT_DAYS, parameters).fetchall()
+            tables = schema.archive_tables_for(conn.connection.driver_connection, parameters["first_day"],
+                                               parameters["after_last_day"])
+            if tables:
+                result = list(heapq.merge(result, *(conn.execute(_archive_select(table)[0], parameters).fetchall()
+                                                    for table in tables), key=_by_start_court))
+        return [tuple(row) for row in result]
+
+    def get_reservations(self, start_date: datetime, end_date: datetime) -> Reservations:
+        if end_date < start_date:
+            return Reservations(start_date.date(), 0)
+        days = (end_date.date() - start_date.date()).days + 1
+        if days > self.__cache.size:
+            return self.__load_minutes(start_date, end_date, days)
+        rows = (row for row in self.__cache.read(start_date.date(), end_date.date(), self.__load_days)
+                if start_date <= row[1] < end_date and row[2] <= end_date)
+        return Reservations.from_rows(rows, start_date.date(), days)
+
+    def __load_minutes(self, start_date: datetime, end_date: datetime, days: int) -> Reservations:
+        """
+        longer than the cache -> sqlite computes the minutes from the first day and the rows go straight
+        into the columns, no DateTime is processed and no list of the whole range is built
+        """
+        parameters = {"start_date": start_date, "end_date": end_date,
+                      "origin": (datetime.combine(start_date.date(), datetime.min.time()) - EPOCH_START) // MINUTE}
+        with self.engine.connect() as conn:
+            tables = schema.archive_tables_for(conn.connection.driver_connection, start_date, end_date)
+            results = [conn.execute(statement, parameters)
+                       for statement in [_archive_select(table)[2] for table in tables] + [SELECT_RANGE_MINUTES]]
+            rows = results[0] if len(results) == 1 else heapq.merge(*results, key=lambda row: (row[1], row[3],
+                                                                                                row[2]))
+            return Reservations.from_minutes(rows, start_date.date(), days)
+
+    def iter_reservations(self, start_date: datetime, end_date: datetime, chunk_size: int = 1000):
+        """ same rows as get_reservations(), read chunk by chunk so memory doesn't grow with the range """
+        yield from self.__iter_range(start_date, end_date, chunk_size)
+
+    def __iter_range(self, start_date: datetime, end_date: datetime, chunk_size: int):
+        parameters = {"start_date": start_date, "end_date": end_date}
+        with self.engine.connect() as conn:
+            tables = schema.archive_tables_for(conn.connection.driver_connection, start_date, end_date)
+            if not tables:
+                result = conn.execution_options(yield_per=chunk_size).execute(SELECT_RANGE, parameters)
+                for rows in result.partitions():
+                    yield from rows
+                return
+        # every archive table holds one year, read one after the other they are in order,
+        # rows booked into the past after archiving may still be in clients -> merged as they stream
+        archived = chain.from_iterable(self.__iter_statement(_archive_select(table)[1], parameters, chunk_size)
+                                       for table in tables)
+        yield from heapq.merge(archived, self.__iter_statement(SELECT_RANGE, parameters, chunk_size),
+                               key=_by_start_court)
+
+    def __iter_statement(self, statement, parameters: dict, chunk_size: int):
+        with self.engine.connect() as conn:
+            result = conn.execution_options(yield_per=chunk_size).execute(statement, parameters)
+            for rows in result.partitions():
+                yield from rows
+
+    def iter_changes(self, after: int = 0, chunk_size: int = 1000):
+        """
+        (seq, operation, name, start_time, end_time, court) of every add and cancellation logged after seq after,
+        in seq order, read chunk by chunk from the primary key -> the cost follows the number of changes only
+        """
+        with self.engine.connect() as conn:
+            result = conn.execution_options(yield_per=chunk_size).execute(SELECT_CHANGES, {"after": after})
+            for rows in result.partitions():
+                yield from rows
+
+    def count_changes(self, start_date: datetime, end_date: datetime) -> dict:
+        """ operation -> number of adds and cancellations logged for reservations starting in [start_date, end_date) """
+        with self.engine.connect() as conn:
+            counts = dict(conn.execute(COUNT_CHANGES, {"start_date": start_date, "end_date": end_date}).fetchall())
+        return {schema.ADD: counts.get(schema.ADD, 0), schema.CANCEL: counts.get(schema.CANCEL, 0)}
 
     def check_too_many_reservations(self, name: str, date: datetime) -> bool:
+        # only the rows of the given ISO week are counted, using the (name, start_time) index
+        week_start, week_end = slot_grid.week_range(date)
         with self.engine.connect() as conn:
-            result = conn.execute(select(self.clients.c.end_time)
-                                  .where(and_(self.clients.c.name == name)))
-            rows = [row for row in result.fetchall() if
-                    self.__is_the_same_day(row[0], date)]
-        return len(rows) <= 2
+            reservations = conn.execute(COUNT_WEEK, {"name": name, "week_start": week_start,
+                                                     "week_end": week_end}).scalar()
+        return reservations <= slot_grid.WEEK_LIMIT
 
     def get_reserved_times(self, start_date: datetime) -> list:
+        return self.get_reserved_times_range(start_date, start_date)
+
+    def get_reserved_times_range(self, start_date: datetime, end_date: datetime) -> list:
+        """ (start_time, end_time) of bookable reservations for every day from start_date till end_date """
+        bookable = datetime.now() + timedelta(hours=1)
+        rows = self.__cache.read(start_date.date(), end_date.date(), self.__load_days)
+        return [(start_time, end_time) for _, start_time, end_time, _ in rows if start_time >= bookable]
+
+    def get_free_slots(self, start_date: datetime, end_date: datetime, court: int = None) -> int:
+        """
+        free slots of every day from start_date till end_date as a packed mask of the court, see slots.days_free_mask(),
+        or of every court when court is None, see slots.courts_free_mask()
+        """
+        days = (end_date.date() - start_date.date()).days + 1
+        parameters = {"first_day": slot_grid.day_number(start_date), "last_day": slot_grid.day_number(end_date)}
         with self.engine.connect() as conn:
-            result = conn.execute(select(self.clients.c.start_time, self.clients.c.end_time)
-                                  .where(cast(self.clients.c.end_time, Date) == cast(start_date, Date))
-                                  .where(self.clients.c.start_time >= datetime.now() + timedelta(hours=1))).fetchall()
-        return result
+            if court is not None:
+                cells = conn.execute(SELECT_CLAIMED_CELLS, {"court": court, **parameters}).fetchall()
+                return slot_grid.claimed_free_mask(start_date, days, cells)
+            cells = conn.execute(SELECT_COURTS_CLAIMED_CELLS, parameters).fetchall()
+        return slot_grid.courts_free_mask(start_date, days, cells)
+
+    def cache_stats(self) -> dict:
+        return self.__cache.stats()
 
     def get_user_reserved_times(self, name: str, date: datetime) -> datetime:
         with self.engine.connect() as conn:
-            result = conn.execute(select(self.clients.c.start_time)
-                                  .where(and_(self.clients.c.start_time == date, self.clients.c.name == name)))
-            reserved_date = result.fetchall()
+            reserved_date = conn.execute(SELECT_USER_TIME, {"date": date, "name": name}).fetchall()
         return reserved_date[0][0] if len(reserved_date) > 0 else reserved_date
 
     def close_database(self) -> None:
         self.engine.dispose()
+        with self.__version_lock:
+            if self.__version_conn is not None:
+                self.__version_conn.close()
+                self.__version_conn = None
@@ -0,0 +1,230 @@
+import threading
+from bisect import bisect_left, bisect_right, insort
+from datetime import datetime, timedelta
+
+from . import schema
+from .. import slots
+from ..schedule import Reservations
+
+
+class _Court(object):
+    """ reservations of one court in parallel lists sorted by start_time """
+    __slots__ = ("starts", "ends", "names")
+
+    def __init__(self):
+        self.starts = []
+        self.ends = []
+        self.names = []
+
+
+class MemoryDatabase(object):
+    """
+    reservations kept in memory only, every court in its own parallel lists sorted by start_time and searched
+    with bisect, nothing is written to disk -> for simulations and tests, db is only kept as a label
+    """
+
+    def __init__(self, db: str = None, cache_size: int = 0):
+        self.__db_file = db
+        # court -> _Court, a lookup of one court never touches the reservations of the others
+        self.__courts = {}
+        # name -> sorted start times, for the weekly limit and cancellations
+        self.__by_name = {}
+        # (seq, operation, name, start_time, end_time, court) of every add and cancellation, seq n at index n - 1
+        self.__changes = []
+        self.__lock = threading.RLock()
+
+    def insert(self, name: str, start_time: datetime, end_time: datetime, court: int = 1) -> None:
+        with self.__lock:
+            schedule = self.__courts.setdefault(court, _Court())
+            # after the rows starting at the same time -> same order as the sqlite backends
+            i = bisect_right(schedule.starts, start_time)
+            schedule.starts.insert(i, start_time)
+            schedule.ends.insert(i, end_time)
+            schedule.names.insert(i, name)
+            insort(self.__by_name.setdefault(name, []), start_time)
+            self.__changes.append((len(self.__changes) + 1, schema.ADD, name, start_time, end_time, court))
+
+    def insert_many(self, reservations) -> None:
+        """ insert (name, start_time, end_time) or (name, start_time, end_time, court) rows at once """
+        with self.__lock:
+            for reservation in reservations:
+                self.insert(*reservation)
+
+    def delete(self, name: str, date: datetime, court: int = None) -> None:
+        """ court None -> the reservation of name starting at date on any court """
+        with self.__lock:
+            deleted = 0
+            for number in (self.__courts if court is None else [court]):
+                schedule = self.__courts.get(number)
+                if schedule is None:
+                    continue
+                i = bisect_left(schedule.starts, date)
+                while i < len(schedule.starts) and schedule.starts[i] == date:
+                    if schedule.names[i] == name:
+                        self.__changes.append((len(self.__changes) + 1, schema.CANCEL, name, date, schedule.ends[i],
+                                               number))
+                        del schedule.starts[i], schedule.ends[i], schedule.names[i]
+                        deleted += 1
+                    else:
+                        i += 1
+            starts = self.__by_name.get(name, [])
+            i = bisect_left(starts, date)
+            del starts[i:i + deleted]
+
+    def __overlaps(self, court: int, date_start: datetime, date_end: datetime) -> bool:
+        schedule = self.__courts.get(court)
+        if schedule is None:
+            return False
+        # only reservations starting less than a day before date_start can reach it
+        first = bisect_right(schedule.starts, date_start - schema.MAX_RESERVATION_LENGTH)
+        last = bisect_left(schedule.starts, date_end)
+        return any(end_time > date_start for end_time in schedule.ends[first:last])
+
+    def free_court(self, date_start: datetime, date_end: datetime, court: int = None):
+        """ court if it's free, the first free court when court is None, otherwise None """
+        courts = slots.COURT_NUMBERS if court is None else (court,)
+        with self.__lock:
+            return next((free for free in courts if not self.__overlaps(free, date_start, date_end)), None)
+
+    def check_availability(self, date_start: datetime, date_end: datetime, court: int = None) -> bool:
+        """ court None -> is any court free """
+        return self.free_court(date_start, date_end, court) is not None
+
+    def book_if_free(self, name: str, start_time: datetime, end_time: datetime, court: int = None):
+        """
+        insert the reservation on court, or on the first free court when court is None,
+        returns the court booked or None when the time is taken
+        """
+        with self.__lock:
+            court = self.free_court(start_time, end_time, court)
+            if court is not None:
+                self.insert(name, start_time, end_time, court)
+            return court
+
+    def book_series(self, name: str, reservations, court: int = None, week_limit: int = None,
+                    fallback_from: datetime = None) -> list:
+        """
+        insert every (start_time, end_time) of reservations that is free, on court or on the first free court,
+        returns (court, start_time, reason) of every reservation, see slots.claim_series() for week_limit and
+        fallback_from
+        """
+        reservations = list(reservations)
+        courts = slots.COURT_NUMBERS if court is None else (court,)
+        with self.__lock:
+            # the slots taken on the days of the series, like the slot grid of the sqlite backends
+            claimed = {}
+            days = {datetime.combine(start_time.date(), datetime.min.time()) for start_time, _ in reservations}
+            for number in courts:
+                schedule = self.__courts.get(number)
+                if schedule is None:
+                    continue
+                for first in days:
+                    i, j = bisect_left(schedule.starts, first), bisect_left(schedule.starts, first + timedelta(days=1))
+                    for start_time, end_time in zip(schedule.starts[i:j], schedule.ends[i:j]):
+                        last = slots.SLOTS_PER_DAY if end_time.date() > first.date() else slots.slot_index(end_time)
+                        key = (number, slots.day_number(first))
+                        claimed[key] = claimed.get(key, 0) | slots.range_mask(slots.slot_index(start_time), last)
+            booked = slots.claim_series(claimed, reservations, courts, self.__by_name.get(name, []), week_limit,
+                                        fallback_from)
+            for (start_time, end_time), (booked_court, booked_start, _) in zip(reservations, booked):
+                if booked_court is not None:
+                    self.insert(name, booked_start, booked_start + (end_time - start_time), booked_court)
+            return booked
+
+    def book_many(self, reservations) -> list:
+        """
+        insert every (name, start_time, end_time, court) of reservations that is free, court None -> the first free
+        court, returns the court booked for every reservation, None for the taken ones
+        """
+        with self.__lock:
+            return [self.book_if_free(name, start_time, end_time, court)
+                    for name, start_time, end_time, court in reservations]
+
+    def __rows(self, first: datetime, last: datetime, court: int = None) -> list:
+        """
+        (name, start_time, end_time, court) of reservations starting from first till last (exclusive),
+        in the order of the sqlite backends -> start_time, court, end_time
+        """
+        rows = []
+        with self.__lock:
+            for number, schedule in self.__courts.items():
+                if court is not None and number != court:
+                    continue
+                i, j = bisect_left(schedule.starts, first), bisect_left(schedule.starts, last)
+                rows.extend(zip(schedule.names[i:j], schedule.starts[i:j], schedule.ends[i:j], [number] * (j - i)))
+        rows.sort(key=lambda row: (row[1], row[3], row[2]))
+        return rows
+
+    def get_reservations(self, start_date: datetime, end_date: datetime) -> Reservations:
+        if end_date < start_date:
+            return Reservations(start_date.date(), 0)
+        return Reservations.from_rows((row for row in self.__rows(start_date, end_date) if row[2] <= end_date),
+                                      start_date.date(), (end_date.date() - start_date.date()).days + 1)
+
+    def iter_reservations(self, start_date: datetime, end_date: datetime, chunk_size: int = 1000):
+        """ same rows as get_reservations(), the range is copied at the first row so writes don't disturb it """
+        if end_date < start_date:
+            return
+        yield from (row for row in self.__rows(start_date, end_date) if row[2] <= end_date)
+
+    def iter_changes(self, after: int = 0, chunk_size: int = 1000):
+        """ (seq, operation, name, start_time, end_time, court) of every add and cancellation logged after seq after """
+        with self.__lock:
+            changes = self.__changes[max(after, 0):]
+        yield from changes
+
+    def count_changes(self, start_date: datetime, end_date: datetime) -> dict:
+        """ operation -> number of adds and cancellations logged for reservations starting in [start_date, end_date) """
+        counts = {schema.ADD: 0, schema.CANCEL: 0}
+        with self.__lock:
+            for _, operation, _, start_time, _, _ in self.__changes:
+                if start_date <= start_time < end_date:
+                    counts[operation] += 1
+        return counts
+
+    def check_too_many_reservations(self, name: str, date: datetime) -> bool:
+        week_start, week_end = slots.week_range(date)
+        with self.__lock:
+            starts = self.__by_name.get(name, [])
+            reservations = bisect_left(starts, week_end) - bisect_left(starts, week_start)
+        return reservations <= slots.WEEK_LIMIT
+
+    def get_reserved_times(self, start_date: datetime) -> list:
+        return self.get_reserved_times_range(start_date, start_date)
+
+    def get_reserved_times_range(self, start_date: datetime, end_date: datetime) -> list:
+        """ (start_time, end_time) of bookable reservations for every day from start_date till end_date """
+        bookable = datetime.now() + timedelta(hours=1)
+        first_day = datetime.combine(start_date.date(), datetime.min.time())
+        last_day = datetime.combine(end_date.date(), datetime.min.time()) + timedelta(days=1)
+        return [(start_time, end_time) for _, start_time, end_time, _ in self.__rows(max(first_day, bookable),
+                                                                                    last_day)]
+
+    def get_free_slots(self, start_date: datetime, end_date: datetime, court: int = None) -> int:
+        """
+        free slots of every day from start_date till end_date as a packed mask of the court, see slots.days_free_mask(),
+        or of every court when court is None, see slots.courts_free_mask()
+        """
+        first_day = datetime.combine(start_date.date(), datetime.min.time())
+        last_day = datetime.combine(end_date.date(), datetime.min.time()) + timedelta(days=1)
+        days = (last_day - first_day).days
+        courts = slots.COURT_NUMBERS if court is None else (court,)
+        mask = 0
+        for position, number in enumerate(courts):
+            reservations = [(start_time, end_time) for _, start_time, end_time, _ in self.__rows(first_day, last_day,
+                                                                                                 number)]
+            mask |= slots.days_free_mask(first_day, days, reservations) << (position * days * slots.DAY_STRIDE)
+        return mask
+
+    def cache_stats(self) -> dict:
+        # every read is served from memory, there is nothing to cache
+        return {"size": 0, "days": 0, "hits": 0, "misses": 0, "hit_rate": 0.0}
+
+    def get_user_reserved_times(self, name: str, date: datetime) -> datetime:
+        with self.__lock:
+            starts = self.__by_name.get(name, [])
+            i = bisect_left(starts, date)
+            return date if i < len(starts) and starts[i] == date else []
+
+    def close_database(self) -> None:
+        pass
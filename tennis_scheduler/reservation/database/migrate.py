@@ -0,0 +1,43 @@
+"""
+Migrate a reservation database to the current schema and optionally convert how times are stored.
+
+    $ python -m tennis_scheduler.reservation.database.migrate reservations.sqlite --time-format epoch
+"""
+import argparse
+import os
+import sqlite3
+import sys
+
+from . import schema
+from .time_format import TIME_FORMATS
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m tennis_scheduler.reservation.database.migrate",
+                                     description="Migrate a reservation database in place.")
+    parser.add_argument("database", help="path to the sqlite database")
+    parser.add_argument("--time-format", choices=TIME_FORMATS,
+                        help="store start_time/end_time as text or as integer minutes since the epoch")
+    args = parser.parse_args(argv)
+
+    if not os.path.exists(args.database):
+        print(f"{args.database} doesn't exist.")
+        return 1
+    conn = sqlite3.connect(args.database)
+    try:
+        version = schema.get_schema_version(conn)
+        schema.migrate(conn)
+        if version < schema.SCHEMA_VERSION:
+            print(f"Migrated schema from version {version} to {schema.SCHEMA_VERSION}.")
+        if args.time_format is not None:
+            rows = schema.convert_time_format(conn, args.time_format)
+            print(f"Converted {rows} reservations to {args.time_format} times.")
+        print(f"{args.database}: schema version {schema.get_schema_version(conn)}, "
+              f"{schema.get_time_format(conn)} times.")
+    finally:
+        conn.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,49 @@
+import sqlite3
+
+from . import schema
+
+# read replica -> the whole file copied into a :memory: database with the backup API, reads are served from memory
+# and don't wait for writers on the file, writes still go to the file and are replayed here from the change log,
+# what the log doesn't record (archiving, time format conversion) is picked up when the file is copied again
+
+
+def copy(source: sqlite3.Connection) -> sqlite3.Connection:
+    """ new in-memory copy of the database of source, with the same tables, indexes and triggers """
+    replica = sqlite3.connect(":memory:", check_same_thread=False, isolation_level=None)
+    source.backup(replica)
+    return replica
+
+
+def last_seq(conn: sqlite3.Connection) -> int:
+    return conn.execute("SELECT COALESCE(MAX(seq), 0) FROM changes").fetchone()[0]
+
+
+def replay_changes(source: sqlite3.Connection, replica: sqlite3.Connection) -> list:
+    """
+    apply the changes logged in source after the last one of replica, in seq order and in one transaction,
+    returns the start times (as stored) of the reservations added or cancelled,
+    raises sqlite3.Error when replica no longer matches source and has to be copied again
+    """
+    after = last_seq(replica)
+    changes = source.execute("SELECT seq, operation, reservation_id, name, start_time, end_time, court FROM changes "
+                             "WHERE seq > ? ORDER BY seq ASC", (after,)).fetchall()
+    if not changes:
+        return []
+    replica.execute("BEGIN")
+    try:
+        for _, operation, reservation_id, name, start_time, end_time, court in changes:
+            if operation == schema.ADD:
+                # the same id as in source, the triggers claim the cells like they did there
+                replica.execute("INSERT INTO clients (id, name, start_time, end_time, court) VALUES (?, ?, ?, ?, ?)",
+                                (reservation_id, name, start_time, end_time, court))
+            elif replica.execute("DELETE FROM clients WHERE id = ?", (reservation_id,)).rowcount == 0:
+                raise sqlite3.IntegrityError(f"cancelled reservation {reservation_id} is not in the replica")
+        # the triggers logged the replayed rows under seqs of their own -> replaced by the rows of source
+        replica.execute("DELETE FROM changes WHERE seq > ?", (after,))
+        replica.executemany("INSERT INTO changes (seq, operation, reservation_id, name, start_time, end_time, court) "
+                            "VALUES (?, ?, ?, ?, ?, ?, ?)", changes)
+    except sqlite3.Error:
+        replica.execute("ROLLBACK")
+        raise
+    replica.execute("COMMIT")
+    return [change[4] for change in changes]
@@ -0,0 +1,355 @@
+import sqlite3
+from datetime import datetime, timedelta
+
+from .time_format import CODECS, TEXT, EPOCH, TIME_FORMATS
+from .. import slots
+
+# version of the schema stored in "PRAGMA user_version"
+# version 0 is the legacy table -> clients (name, start_time, end_time) without any key
+SCHEMA_VERSION = 8
+
+# reservations never span more than one day, so every overlap query
+# can be bounded from below and use the (start_time, end_time) index
+MAX_RESERVATION_LENGTH = timedelta(days=1)
+
+# seconds a connection waits for the write lock held by another process before "database is locked"
+BUSY_TIMEOUT = 5.0
+
+CLIENTS_TABLE = '''CREATE TABLE IF NOT EXISTS clients (
+                       id INTEGER PRIMARY KEY,
+                       name TEXT,
+                       start_time DATE,
+                       end_time DATE,
+                       court INTEGER NOT NULL DEFAULT 1)'''
+
+SETTINGS_TABLE = '''CREATE TABLE IF NOT EXISTS settings (
+                        key TEXT PRIMARY KEY,
+                        value TEXT)'''
+
+# slot grid -> every reservation also claims its half-hour cells (see slots.py), the primary key
+# makes a second claim of the same cell fail, so overlapping reservations can't be stored at all
+SLOTS_TABLE = '''CREATE TABLE IF NOT EXISTS slots (
+                     court INTEGER NOT NULL DEFAULT 1,
+                     day INTEGER NOT NULL,
+                     slot_index INTEGER NOT NULL,
+                     reservation_id INTEGER NOT NULL,
+                     PRIMARY KEY (court, day, slot_index)) WITHOUT ROWID'''
+
+# change log -> every insert and delete of a reservation appends a row, written by triggers so nothing can skip it,
+# AUTOINCREMENT never reuses a seq and sqlite has one writer at a time, so seqs are committed in order
+CHANGES_TABLE = '''CREATE TABLE IF NOT EXISTS changes (
+                       seq INTEGER PRIMARY KEY AUTOINCREMENT,
+                       operation TEXT NOT NULL,
+                       reservation_id INTEGER NOT NULL,
+                       name TEXT,
+                       start_time DATE,
+                       end_time DATE,
+                       court INTEGER)'''
+
+# count_changes() -> the changes of a range are counted per operation from the index alone, the log rows aren't read
+CHANGES_INDEX = '''CREATE INDEX IF NOT EXISTS idx_changes_start_operation ON changes (start_time, operation)'''
+
+# operation of a change
+ADD = "add"
+CANCEL = "cancel"
+
+# archive -> reservations starting before a cutoff are moved out of clients into one table per year in the same file,
+# the tables are created when a year is first archived, "archived_before" in settings is the latest cutoff
+ARCHIVE_PREFIX = "clients_archive_"
+ARCHIVE_TABLE = '''CREATE TABLE IF NOT EXISTS {table} (
+                       id INTEGER PRIMARY KEY,
+                       name TEXT,
+                       start_time DATE,
+                       end_time DATE,
+                       court INTEGER NOT NULL DEFAULT 1)'''
+ARCHIVE_INDEX = '''CREATE INDEX IF NOT EXISTS idx_{table}_start_court ON {table} (start_time, court, end_time)'''
+ARCHIVE_BATCH_SIZE = 1000
+
+# 0..20, triggers can't use recursive CTEs to enumerate the cells of a reservation
+SLOT_NUMBERS_TABLE = '''CREATE TABLE IF NOT EXISTS slot_numbers (n INTEGER PRIMARY KEY)'''
+
+# (start_time, court, end_time) -> schedules of all courts in (start_time, court) order,
+# (court, start_time, end_time) -> one court is looked up without touching the rows of the others
+CLIENTS_INDEXES = ('''CREATE INDEX IF NOT EXISTS idx_clients_start_court ON clients (start_time, court, end_time)''',
+                   '''CREATE INDEX IF NOT EXISTS idx_clients_court_start ON clients (court, start_time, end_time)''',
+                   '''CREATE INDEX IF NOT EXISTS idx_clients_name_start ON clients (name, start_time)''')
+
+
+def get_schema_version(conn: sqlite3.Connection) -> int:
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+
+def enable_wal(conn: sqlite3.Connection) -> None:
+    """ readers and the writer don't block each other in WAL mode, the mode is kept in the file """
+    conn.execute("PRAGMA journal_mode=WAL")
+
+
+def get_time_format(conn: sqlite3.Connection) -> str:
+    row = conn.execute("SELECT value FROM settings WHERE key = 'time_format'").fetchone()
+    return row[0] if row else TEXT
+
+
+def convert_time_format(conn: sqlite3.Connection, time_format: str) -> int:
+    """ rewrite every row to the given time format in one transaction, returns the number of rows converted """
+    if time_format not in TIME_FORMATS:
+        raise ValueError(f"Unknown time format -> {time_format}, use one of {TIME_FORMATS}.")
+    conn.commit()
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        current = get_time_format(conn)
+        if current == time_format:
+            conn.commit()
+            return 0
+        if time_format == EPOCH:
+            # strftime('%s') reads the text as UTC, so no timezone shift gets in
+            cur = conn.execute("UPDATE clients SET "
+                               "start_time = CAST(strftime('%s', start_time) AS INTEGER) / 60, "
+                               "end_time = CAST(strftime('%s', end_time) AS INTEGER) / 60")
+            conn.execute("UPDATE changes SET "
+                         "start_time = CAST(strftime('%s', start_time) AS INTEGER) / 60, "
+                         "end_time = CAST(strftime('%s', end_time) AS INTEGER) / 60")
+        else:
+            cur = conn.execute("UPDATE clients SET "
+                               "start_time = datetime(start_time * 60, 'unixepoch'), "
+                               "end_time = datetime(end_time * 60, 'unixepoch')")
+            conn.execute("UPDATE changes SET "
+                         "start_time = datetime(start_time * 60, 'unixepoch'), "
+                         "end_time = datetime(end_time * 60, 'unixepoch')")
+        for table in get_archive_tables(conn):
+            if time_format == EPOCH:
+                conn.execute(f"UPDATE {table} SET "
+                             f"start_time = CAST(strftime('%s', start_time) AS INTEGER) / 60, "
+                             f"end_time = CAST(strftime('%s', end_time) AS INTEGER) / 60")
+            else:
+                conn.execute(f"UPDATE {table} SET "
+                             f"start_time = datetime(start_time * 60, 'unixepoch'), "
+                             f"end_time = datetime(end_time * 60, 'unixepoch')")
+        conn.execute("INSERT OR REPLACE INTO settings (key, value) VALUES ('time_format', ?)", (time_format,))
+        # the cells stay the same, only the triggers read the times differently
+        _create_slot_triggers(conn, time_format, "court")
+    except sqlite3.Error:
+        conn.rollback()
+        raise
+    conn.commit()
+    return cur.rowcount
+
+
+def archive_table(year: int) -> str:
+    return f"{ARCHIVE_PREFIX}{year:d}"
+
+
+def get_archive_tables(conn: sqlite3.Connection) -> list:
+    """ names of the archive tables in year order """
+    return sorted(row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table' AND name LIKE ?",
+                                                 (ARCHIVE_PREFIX + "%",)))
+
+
+def get_archived_before(conn: sqlite3.Connection):
+    """ every reservation starting before this datetime is in the archive tables, None if nothing was archived """
+    row = conn.execute("SELECT value FROM settings WHERE key = 'archived_before'").fetchone()
+    return datetime.fromisoformat(row[0]) if row else None
+
+
+def archive_tables_for(conn: sqlite3.Connection, start_date: datetime, end_date: datetime) -> list:
+    """
+    archive tables that can hold reservations starting in [start_date, end_date),
+    a range after the cutoff costs one settings lookup and reads clients only
+    """
+    archived_before = get_archived_before(conn)
+    if archived_before is None or start_date >= archived_before or end_date <= start_date:
+        return []
+    last = min(end_date - timedelta(microseconds=1), archived_before)
+    years = {archive_table(year) for year in range(start_date.year, last.year + 1)}
+    return [table for table in get_archive_tables(conn) if table in years]
+
+
+def archive_reservations(conn: sqlite3.Connection, before: datetime, batch_size: int = ARCHIVE_BATCH_SIZE) -> dict:
+    """
+    move the reservations starting before the cutoff to the archive table of their year,
+    batch_size rows per transaction so the write lock is only held for a moment at a time,
+    returns {year: number of reservations moved}
+    """
+    times = CODECS[get_time_format(conn)]
+    cutoff = times.encode(before)
+    moved = {}
+    conn.commit()
+    while True:
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            archived_before = get_archived_before(conn)
+            if archived_before is None or archived_before < before:
+                conn.execute("INSERT OR REPLACE INTO settings (key, value) VALUES ('archived_before', ?)",
+                             (before.isoformat(sep=" "),))
+            first = conn.execute("SELECT start_time FROM clients WHERE start_time < ? "
+                                 "ORDER BY start_time LIMIT 1", (cutoff,)).fetchone()
+            if first is None:
+                conn.commit()
+                return moved
+            # one year per batch, the first row is the earliest one left so the batch starts in its year
+            year = times.decode(first[0]).year
+            bound = times.encode(min(before, datetime(year + 1, 1, 1)))
+            table = archive_table(year)
+            conn.execute(ARCHIVE_TABLE.format(table=table))
+            conn.execute(ARCHIVE_INDEX.format(table=table))
+            batch = ("SELECT id FROM clients WHERE start_time < ? "
+                     "ORDER BY start_time, court, end_time, id LIMIT ?")
+            last_seq = conn.execute("SELECT COALESCE(MAX(seq), 0) FROM changes").fetchone()[0]
+            cur = conn.execute(f"INSERT INTO {table} (id, name, start_time, end_time, court) "
+                               f"SELECT id, name, start_time, end_time, court FROM clients "
+                               f"WHERE id IN ({batch})", (bound, batch_size))
+            count = cur.rowcount
+            # the delete triggers release the cells and log cancellations, archived reservations weren't
+            # cancelled -> the log rows of this batch are dropped before anyone can read them
+            conn.execute(f"DELETE FROM clients WHERE id IN ({batch})", (bound, batch_size))
+            conn.execute("DELETE FROM changes WHERE seq > ?", (last_seq,))
+        except sqlite3.Error:
+            conn.rollback()
+            raise
+        conn.commit()
+        moved[year] = moved.get(year, 0) + count
+
+
+def migrate(conn: sqlite3.Connection) -> None:
+    """ bring the database to SCHEMA_VERSION, every step runs in its own transaction """
+    if get_schema_version(conn) >= SCHEMA_VERSION:
+        return
+    conn.commit()
+    while True:
+        # the version is read again under the write lock, another process may have migrated meanwhile
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            version = get_schema_version(conn)
+            if version >= SCHEMA_VERSION:
+                conn.commit()
+                return
+            MIGRATIONS[version](conn)
+            # pragma can't take parameters, version is always an int
+            conn.execute(f"PRAGMA user_version = {version + 1:d}")
+        except sqlite3.Error:
+            conn.rollback()
+            raise
+        conn.commit()
+
+
+def _migrate_to_1(conn: sqlite3.Connection) -> None:
+    columns = [row[1] for row in conn.execute("PRAGMA table_info(clients)")]
+    if columns and "id" not in columns:
+        # legacy table, rows are copied in rowid order so the new ids keep insertion order
+        conn.execute("ALTER TABLE clients RENAME TO clients_legacy")
+        conn.execute(CLIENTS_TABLE)
+        conn.execute("INSERT INTO clients (name, start_time, end_time) "
+                     "SELECT name, start_time, end_time FROM clients_legacy ORDER BY rowid")
+        conn.execute("DROP TABLE clients_legacy")
+    else:
+        conn.execute(CLIENTS_TABLE)
+    # indexes of version 1, _migrate_to_4 replaces the first one
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_clients_start_end ON clients (start_time, end_time)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_clients_name_start ON clients (name, start_time)")
+
+
+def _migrate_to_2(conn: sqlite3.Connection) -> None:
+    # existing files keep their text times, convert_time_format() switches them to epoch minutes
+    conn.execute(SETTINGS_TABLE)
+    conn.execute("INSERT OR IGNORE INTO settings (key, value) VALUES ('time_format', ?)", (TEXT,))
+
+
+def _slot_expressions(time_format: str, column: str) -> tuple:
+    """ SQL of (day number since the epoch, minutes since midnight) of a time column """
+    if time_format == EPOCH:
+        return f"({column} / 1440)", f"({column} % 1440)"
+    return (f"CAST(julianday(date({column})) - 2440587.5 AS INTEGER)",
+            f"(CAST(strftime('%H', {column}) AS INTEGER) * 60 + CAST(strftime('%M', {column}) AS INTEGER))")
+
+
+def _claimed_cells(time_format: str, row: str) -> tuple:
+    """ SQL of (day, first cell, cell after the last one) of a reservation row, like slots.slot_index() """
+    start_day, start_minute = _slot_expressions(time_format, f"{row}.start_time")
+    end_day, end_minute = _slot_expressions(time_format, f"{row}.end_time")
+    first = f"(({start_minute} - {slots.DAY_START} + {slots.SLOT_LENGTH - 1}) / {slots.SLOT_LENGTH})"
+    last = (f"(CASE WHEN {end_day} > {start_day} THEN {slots.SLOTS_PER_DAY} "
+            f"ELSE ({end_minute} - {slots.DAY_START} + {slots.SLOT_LENGTH - 1}) / {slots.SLOT_LENGTH} END)")
+    return start_day, first, last
+
+
+def _create_slot_triggers(conn: sqlite3.Connection, time_format: str, court: str = None) -> None:
+    """ court -> column of clients holding the court, None for the single court files before version 4 """
+    court_of = (lambda row: f"{row}.{court}") if court else (lambda row: "1")
+    day, first, last = _claimed_cells(time_format, "NEW")
+    conn.execute("DROP TRIGGER IF EXISTS clients_claim_slots")
+    conn.execute(f"""CREATE TRIGGER clients_claim_slots AFTER INSERT ON clients BEGIN
+                         INSERT INTO slots (court, day, slot_index, reservation_id)
+                         SELECT {court_of("NEW")}, {day}, n, NEW.id FROM slot_numbers WHERE n >= {first} AND n < {last};
+                     END""")
+    day, _, _ = _claimed_cells(time_format, "OLD")
+    conn.execute("DROP TRIGGER IF EXISTS clients_release_slots")
+    conn.execute(f"""CREATE TRIGGER clients_release_slots AFTER DELETE ON clients BEGIN
+                         DELETE FROM slots WHERE court = {court_of("OLD")} AND day = {day} AND reservation_id = OLD.id;
+                     END""")
+
+
+def _migrate_to_3(conn: sqlite3.Connection) -> None:
+    time_format = get_time_format(conn)
+    conn.execute(SLOT_NUMBERS_TABLE)
+    conn.executemany("INSERT OR IGNORE INTO slot_numbers (n) VALUES (?)", [(n,) for n in range(slots.SLOTS_PER_DAY)])
+    conn.execute(SLOTS_TABLE)
+    # overlapping rows of an older file can't all claim their cells, the earliest inserted one keeps them
+    day, first, last = _claimed_cells(time_format, "clients")
+    conn.execute(f"INSERT OR IGNORE INTO slots (court, day, slot_index, reservation_id) "
+                 f"SELECT 1, {day}, n, clients.id FROM clients JOIN slot_numbers ON n >= {first} AND n < {last} "
+                 f"ORDER BY clients.id")
+    _create_slot_triggers(conn, time_format)
+
+
+def _migrate_to_4(conn: sqlite3.Connection) -> None:
+    # every reservation made so far was on the only court -> court 1, its cells are already claimed for court 1
+    columns = [row[1] for row in conn.execute("PRAGMA table_info(clients)")]
+    if "court" not in columns:
+        conn.execute("ALTER TABLE clients ADD COLUMN court INTEGER NOT NULL DEFAULT 1")
+    conn.execute("DROP INDEX IF EXISTS idx_clients_start_end")
+    for index in CLIENTS_INDEXES:
+        conn.execute(index)
+    _create_slot_triggers(conn, get_time_format(conn), "court")
+
+
+def _migrate_to_5(conn: sqlite3.Connection) -> None:
+    conn.execute(CHANGES_TABLE)
+    # reservations made before the log count as added, so an export from seq 0 has the whole schedule
+    conn.execute(f"INSERT INTO changes (operation, reservation_id, name, start_time, end_time, court) "
+                 f"SELECT '{ADD}', id, name, start_time, end_time, court FROM clients ORDER BY id")
+    # times are copied as they are stored, convert_time_format() rewrites them with the reservations
+    for trigger, event, operation, row in (("clients_log_add", "INSERT", ADD, "NEW"),
+                                           ("clients_log_cancel", "DELETE", CANCEL, "OLD")):
+        conn.execute(f"""CREATE TRIGGER IF NOT EXISTS {trigger} AFTER {event} ON clients BEGIN
+                             INSERT INTO changes (operation, reservation_id, name, start_time, end_time, court)
+                             VALUES ('{operation}', {row}.id, {row}.name, {row}.start_time, {row}.end_time,
+                                     {row}.court);
+                         END""")
+
+
+def _migrate_to_6(conn: sqlite3.Connection) -> None:
+    # the ORM stored text times as 'YYYY-MM-DD HH:MM:SS.000000' -> cut to what the raw backend writes, updates don't
+    # fire the triggers and the cells stay the same
+    if get_time_format(conn) != TEXT:
+        return
+    for table in ["clients", "changes"] + get_archive_tables(conn):
+        conn.execute(f"UPDATE {table} SET start_time = substr(start_time, 1, 19), end_time = substr(end_time, 1, 19) "
+                     f"WHERE length(start_time) > 19 OR length(end_time) > 19")
+
+
+def _migrate_to_7(conn: sqlite3.Connection) -> None:
+    conn.execute(CHANGES_INDEX)
+
+
+def _migrate_to_8(conn: sqlite3.Connection) -> None:
+    # files of version 2 to 7 have a day column that was never read, the slot grid keeps the day numbers ->
+    # dropped where sqlite can, older libraries (before 3.35) keep the column and nothing writes it anymore
+    if sqlite3.sqlite_version_info < (3, 35, 0):
+        return
+    for table in ["clients"] + get_archive_tables(conn):
+        if "day" in [row[1] for row in conn.execute(f"PRAGMA table_info({table})")]:
+            conn.execute(f"ALTER TABLE {table} DROP COLUMN day")
+
+
+# MIGRATIONS[n] moves the database from version n to n + 1
+MIGRATIONS = [_migrate_to_1, _migrate_to_2, _migrate_to_3, _migrate_to_4, _migrate_to_5, _migrate_to_6,
+              _migrate_to_7, _migrate_to_8]
@@ -0,0 +1,48 @@
+from datetime import datetime, timedelta
+
+# how start_time/end_time are stored in the clients table, recorded in the settings table
+TEXT = "text"
+EPOCH = "epoch"
+TIME_FORMATS = [TEXT, EPOCH]
+
+EPOCH_START = datetime(1970, 1, 1)
+MINUTE = timedelta(minutes=1)
+
+
+class TextTimes(object):
+    """ 'YYYY-MM-DD HH:MM:SS' strings, every row read has to go through strptime """
+    name = TEXT
+
+    @staticmethod
+    def encode(time: datetime):
+        # sqlite3 adapts datetime to the same text on its own
+        return time
+
+    @staticmethod
+    def decode(value) -> datetime:
+        return datetime.strptime(value, '%Y-%m-%d %H:%M:%S')
+
+    @staticmethod
+    def minutes(column: str) -> str:
+        """ SQL of the minutes since the epoch of a time column, strftime('%s') reads the text as UTC like encode() """
+        return f"(CAST(strftime('%s', {column}) AS INTEGER) / 60)"
+
+
+class EpochTimes(object):
+    """ integer minutes since 1970-01-01 00:00 (naive local time) """
+    name = EPOCH
+
+    @staticmethod
+    def encode(time: datetime) -> int:
+        return (time - EPOCH_START) // MINUTE
+
+    @staticmethod
+    def decode(value: int) -> datetime:
+        return EPOCH_START + timedelta(minutes=value)
+
+    @staticmethod
+    def minutes(column: str) -> str:
+        return column
+
+
+CODECS = {TEXT: TextTimes, EPOCH: EpochTimes}
@@ -0,0 +1,157 @@
+import csv
+import gzip
+import json
+import os
+from datetime import datetime, timedelta
+
+# every writer takes reservations as an iterable of (name, start_time, end_time, court) sorted by start_time
+# and writes them one by one, so a cursor can be passed in and memory stays flat for any range
+EXPORT_FORMATS = ["csv", "json", "ndjson"]
+
+# changes are written one per line, the json days format has no place for cancellations
+CHANGE_FORMATS = ["csv", "ndjson"]
+CHANGE_FIELDS = ["seq", "operation", "name", "start_time", "end_time", "court"]
+
+
+def _open(filename: str, compress: bool):
+    if compress:
+        return gzip.open(filename + ".gz", "wt", newline="", encoding="utf-8")
+    return open(filename, "w", newline="", encoding="utf-8")
+
+
+def save_to_csv(filename: str, reservations, compress: bool = False) -> None:
+    with _open(filename + ".csv", compress) as file:
+        writer = csv.writer(file)
+        writer.writerow(["name", "start_time", "end_time", "court"])
+        for reservation in reservations:
+            writer.writerow([reservation[0], reservation[1], reservation[2], reservation[3]])
+
+
+def save_to_ndjson(filename: str, reservations, compress: bool = False) -> None:
+    # one object per line, same format as the jsonl import
+    with _open(filename + ".ndjson", compress) as file:
+        for reservation in reservations:
+            file.write(json.dumps({"name": reservation[0],
+                                   "start_time": reservation[1].strftime("%Y-%m-%d %H:%M:%S"),
+                                   "end_time": reservation[2].strftime("%Y-%m-%d %H:%M:%S"),
+                                   "court": reservation[3]}) + "\n")
+
+
+class _JsonDaysWriter(object):
+    """ writes {"DD.MM": [{name, start_time, end_time, court}, ...], ...} exactly like json.dump(..., indent=2) """
+
+    def __init__(self, file):
+        self.__file = file
+        self.__days = 0
+        self.__day_reservations = 0
+
+    def day(self, date: datetime) -> None:
+        self.__end_day()
+        self.__file.write(("{\n" if self.__days == 0 else ",\n") + f"  {json.dumps(date.strftime('%d.%m'))}: [")
+        self.__days += 1
+
+    def reservation(self, name: str, start_time: datetime, end_time: datetime, court: int) -> None:
+        entry = json.dumps({"name": name,
+                            "start_time": start_time.strftime("%H:%M"),
+                            "end_time": end_time.strftime("%H:%M"),
+                            "court": court}, indent=2)
+        # entries are nested two levels deep -> 4 more spaces on every line
+        self.__file.write(("\n" if self.__day_reservations == 0 else ",\n") + "    " + entry.replace("\n", "\n    "))
+        self.__day_reservations += 1
+
+    def close(self) -> None:
+        self.__end_day()
+        self.__file.write("{}" if self.__days == 0 else "\n}")
+
+    def __end_day(self) -> None:
+        if self.__day_reservations > 0:
+            self.__file.write("\n  ]")
+        elif self.__days > 0:
+            self.__file.write("]")
+        self.__day_reservations = 0
+
+
+def save_to_json(filename: str, reservations, start_date: datetime, end_date: datetime,
+                 compress: bool = False) -> None:
+    """ every day from start_date till end_date, days without reservations have an empty list """
+    days = (end_date - start_date).days + 1
+    with _open(filename + ".json", compress) as file:
+        writer = _JsonDaysWriter(file)
+        # index of the last day already written
+        current = -1
+        for name, start_time, end_time, court in reservations:
+            day = (start_time.date() - start_date.date()).days
+            if day >= days:
+                break
+            if day < current or day < 0:
+                continue
+            for i in range(current + 1, day + 1):
+                writer.day(start_date + timedelta(days=i))
+            current = day
+            writer.reservation(name, start_time, end_time, court)
+        for i in range(current + 1, days):
+            writer.day(start_date + timedelta(days=i))
+        writer.close()
+
+
+def save_to_json_no_empty(filename: str, reservations, compress: bool = False) -> None:
+    with _open(filename + ".json", compress) as file:
+        writer = _JsonDaysWriter(file)
+        last_date = None
+        for name, start_time, end_time, court in reservations:
+            if start_time.date() != last_date:
+                writer.day(start_time)
+                last_date = start_time.date()
+            writer.reservation(name, start_time, end_time, court)
+        writer.close()
+
+
+def save_changes(filename: str, changes, extension: str = "csv", compress: bool = False) -> tuple:
+    """
+    changes -> (seq, operation, name, start_time, end_time, court) in seq order, see iter_changes() of the backends,
+    returns (changes written, seq of the last one or None)
+    """
+    written, last = 0, None
+    with _open(f"{filename}.{extension}", compress) as file:
+        writer = csv.writer(file) if extension == "csv" else None
+        if writer is not None:
+            writer.writerow(CHANGE_FIELDS)
+        for seq, operation, name, start_time, end_time, court in changes:
+            if writer is not None:
+                writer.writerow([seq, operation, name, start_time, end_time, court])
+            else:
+                file.write(json.dumps({"seq": seq, "operation": operation, "name": name,
+                                       "start_time": start_time.strftime("%Y-%m-%d %H:%M:%S"),
+                                       "end_time": end_time.strftime("%Y-%m-%d %H:%M:%S"),
+                                       "court": court}) + "\n")
+            written, last = written + 1, seq
+    return written, last
+
+
+def read_watermark(filename: str) -> int:
+    """ seq of the last change exported to filename, 0 before the first export """
+    try:
+        with open(filename + ".watermark", encoding="utf-8") as file:
+            return int(file.read().strip() or 0)
+    except FileNotFoundError:
+        return 0
+
+
+def save_watermark(filename: str, seq: int) -> None:
+    # replaced in one step, a crash leaves the old watermark and the next export repeats the changes
+    with open(filename + ".watermark.tmp", "w", encoding="utf-8") as file:
+        file.write(f"{seq}\n")
+    os.replace(filename + ".watermark.tmp", filename + ".watermark")
+
+
+def save_changes_since_watermark(database, filename: str, extension: str = "csv", compress: bool = False) -> tuple:
+    """
+    adds and cancellations logged after the watermark of filename -> (changes written, watermark),
+    the watermark only moves once the file is written, so the time follows the number of changes, not the schedule
+    """
+    watermark = read_watermark(filename)
+    written, last = save_changes(filename, database.iter_changes(watermark), extension, compress)
+    if last is not None:
+        save_watermark(filename, last)
+        watermark = last
+    return written, watermark
@@ -0,0 +1,166 @@
+import csv
+import json
+import os
+from datetime import datetime, timedelta
+
+from . import slots
+from .tools import headless, take_message
+from .reservation_validator import Validator, BOOKING_OPTIONS
+
+IMPORT_EXTENSIONS = ["csv", "json", "jsonl", "ndjson"]
+
+
+def read_reservations(filename: str, year: int = None):
+    """
+    yield (line, name, start_time, end_time, court) from a file written by the csv/json export or a jsonl file,
+    csv and jsonl are read as a stream, json keys are "DD.MM" so the year has to be given,
+    court is None for files without courts
+    """
+    extension = os.path.splitext(filename)[1][1:].lower()
+    with open(filename, newline="", encoding="utf-8") as file:
+        if extension == "csv":
+            # line 1 is the header
+            for line, row in enumerate(csv.DictReader(file), start=2):
+                yield line, row.get("name"), row.get("start_time"), row.get("end_time"), row.get("court") or None
+        elif extension in ["jsonl", "ndjson"]:
+            for line, text in enumerate(file, start=1):
+                if not text.strip():
+                    continue
+                try:
+                    row = json.loads(text)
+                except ValueError:
+                    yield line, None, None, None, None
+                    continue
+                if not isinstance(row, dict):
+                    # e.g. a list or a number, there are no fields to read
+                    yield line, None, None, None, None
+                    continue
+                yield line, row.get("name"), row.get("start_time"), row.get("end_time"), row.get("court")
+        elif extension == "json":
+            year = year or datetime.now().year
+            line = 0
+            for day, reservations in json.load(file).items():
+                for row in reservations:
+                    line += 1
+                    yield (line, row.get("name"), f"{day}.{year} {row.get('start_time')}",
+                           f"{day}.{year} {row.get('end_time')}", row.get("court"))
+        else:
+            raise ValueError(f"Unsupported extension -> {extension}")
+
+
+def _parse_date(date: str):
+    for date_format in ("%Y-%m-%d %H:%M:%S", "%d.%m.%Y %H:%M"):
+        try:
+            return datetime.strptime(date, date_format)
+        except (TypeError, ValueError):
+            continue
+    return
+
+
+class ImportReport(object):
+    def __init__(self):
+        self.accepted = 0
+        # (line, name, start_time, end_time, court, reason)
+        self.rejected = []
+
+    def reject(self, line: int, name, start_time, end_time, court, reason: str) -> None:
+        self.rejected.append((line, name, start_time, end_time, court, reason))
+
+    def save_rejections(self, filename: str) -> None:
+        with open(filename, "w", newline="", encoding="utf-8") as file:
+            writer = csv.writer(file)
+            writer.writerow(["line", "name", "start_time", "end_time", "court", "reason"])
+            writer.writerows(self.rejected)
+
+
+class ReservationImporter(object):
+    """
+    validates reservations with the Validator rules and writes the accepted ones in one transaction,
+    conflicts are checked against the database and the rows accepted earlier in the same file,
+    then again by book_many() inside the transaction, so rows taken meanwhile by another kiosk are rejected too,
+    a row without a court goes to the first court free at its time
+    """
+
+    def __init__(self, database):
+        self._database = database
+        # monday -> {(court, day): free slots bitmask}, {name: reservations in the week}
+        self.__weeks = {}
+
+    def import_file(self, filename: str, year: int = None) -> ImportReport:
+        return self.import_reservations(read_reservations(filename, year))
+
+    def import_reservations(self, rows) -> ImportReport:
+        report = ImportReport()
+        # (line, name, start_time, end_time, court) as read -> the reservation checked
+        accepted = []
+        with headless() as messages:
+            for line, name, start_time, end_time, court in rows:
+                reservation = self.__check(name, start_time, end_time, court)
+                if isinstance(reservation, tuple):
+                    # a row without a court gets the first court free when the rows are booked
+                    name_, start, end, free_court = reservation
+                    accepted.append(((line, name, start_time, end_time, court),
+                                     (name_, start, end, None if court is None else free_court)))
+                else:
+                    report.reject(line, name, start_time, end_time, court, reservation or take_message(messages))
+                take_message(messages)
+        booked = self._database.book_many([reservation for _, reservation in accepted])
+        for (row, _), court in zip(accepted, booked):
+            if court is None:
+                report.reject(*row, "The time is already booked.")
+        report.rejected.sort(key=lambda rejected: rejected[0])
+        report.accepted = len(accepted) - booked.count(None)
+        self.__weeks.clear()
+        return report
+
+    def __check(self, name, start_time, end_time, court):
+        """ (name, start, end, court) when the row can be imported, otherwise the reason or None if it was printed """
+        if name is None and start_time is None and end_time is None:
+            return "Not a reservation, a row needs name, start_time and end_time."
+        if not isinstance(name, str) or Validator._invalid_name_regex(name) is None:
+            return
+        start = _parse_date(start_time)
+        end = _parse_date(end_time)
+        if start is None or end is None:
+            return "Invalid date format."
+        if Validator._invalid_minutes(start) is None or Validator._invalid_minutes(end) is None:
+            return
+        if not Validator._check_time_range(start):
+            return
+        option = BOOKING_OPTIONS.get(int((end - start).total_seconds()) // 60)
+        if option is None:
+            return "Reservation must last 30, 60 or 90 minutes."
+        if Validator._invalid_booking_format(option, start) is None:
+            return
+        courts = slots.COURT_NUMBERS
+        if court is not None:
+            courts = (Validator._invalid_court_format(court),)
+            if courts[0] is None:
+                return
+
+        days, reservations = self.__week(start)
+        if reservations.get(name, 0) > 2:
+            return "You can't make more than 2 reservations in a week."
+        taken = slots.range_mask(slots.slot_index(start), slots.slot_index(end))
+        court = next((number for number in courts if days[(number, start.date())] & taken == taken), None)
+        if court is None:
+            return "The time is already booked."
+
+        days[(court, start.date())] &= ~taken
+        reservations[name] = reservations.get(name, 0) + 1
+        return name, start, end, court
+
+    def __week(self, date: datetime) -> tuple:
+        """ free slots and reservation counts of the week, loaded with one query the first time it's needed """
+        week_start, week_end = slots.week_range(date)
+        if week_start not in self.__weeks:
+            days = {(court, (week_start + timedelta(days=i)).date()): slots.FULL_DAY
+                    for court in slots.COURT_NUMBERS for i in range(7)}
+            reservations = {}
+            for name, start_time, end_time, court in self._database.get_reservations(week_start, week_end):
+                if (court, start_time.date()) in days:
+                    days[(court, start_time.date())] &= ~slots.range_mask(slots.slot_index(start_time),
+                                                                          slots.slot_index(end_time))
+                reservations[name] = reservations.get(name, 0) + 1
+            self.__weeks[week_start] = (days, reservations)
+        return self.__weeks[week_start]
@@ -0,0 +1,156 @@
+import functools
+import inspect
+import json
+import threading
+import time
+from bisect import bisect_left
+
+from .database.backend import BACKENDS, backend_class
+from .reservation_validator import Validator
+from .schedule import Reservations
+
+# upper bounds of the latency histogram buckets in microseconds, slower calls land in "inf"
+BUCKETS_US = (10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 25000, 50000, 100000, 250000, 500000, 1000000)
+
+DATABASE_METHODS = ["insert", "insert_many", "book_if_free", "book_series", "book_many", "delete",
+                    "check_availability", "free_court", "get_reservations", "iter_reservations", "iter_changes",
+                    "count_changes", "check_too_many_reservations", "get_reserved_times", "get_reserved_times_range",
+                    "get_user_reserved_times", "get_free_slots"]
+
+# checks without prompts, the interactive _invalid_*() methods mostly wait for the user
+VALIDATOR_METHODS = sorted(name for name in vars(Validator) if name.startswith("_check_")) + \
+                    ["_invalid_name_regex", "_invalid_date_format", "_invalid_booking_format"]
+
+
+def _instrumented() -> dict:
+    """ class -> names of its methods to measure, backends are imported here so they stay lazy until enable() """
+    instrumented = {}
+    for name in BACKENDS:
+        try:
+            instrumented[backend_class(name)] = DATABASE_METHODS
+        except ImportError:
+            # e.g. SQLAlchemy is not installed, the other backends can still be measured
+            continue
+    instrumented[Validator] = VALIDATOR_METHODS
+    return instrumented
+
+
+class _Operation(object):
+    __slots__ = ("calls", "total", "max", "rows", "max_rows", "histogram")
+
+    def __init__(self):
+        self.calls = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.rows = 0
+        self.max_rows = 0
+        self.histogram = [0] * (len(BUCKETS_US) + 1)
+
+    def as_dict(self) -> dict:
+        bounds = [f"<={bound}" for bound in BUCKETS_US] + ["inf"]
+        return {"calls": self.calls,
+                "total_ms": self.total * 1e3,
+                "mean_us": self.total / self.calls * 1e6 if self.calls else 0.0,
+                "max_us": self.max * 1e6,
+                "rows": self.rows,
+                "max_rows": self.max_rows,
+                "histogram_us": {bound: count for bound, count in zip(bounds, self.histogram) if count}}
+
+
+_lock = threading.Lock()
+_operations = {}
+# (class, name) -> attribute as it was before enable()
+_originals = {}
+
+
+def _record(name: str, elapsed: float, rows) -> None:
+    with _lock:
+        operation = _operations.get(name)
+        if operation is None:
+            operation = _operations[name] = _Operation()
+        operation.calls += 1
+        operation.total += elapsed
+        operation.max = max(operation.max, elapsed)
+        operation.histogram[bisect_left(BUCKETS_US, elapsed * 1e6)] += 1
+        if rows is not None:
+            operation.rows += rows
+            operation.max_rows = max(operation.max_rows, rows)
+
+
+def _timed(name: str, function):
+    if inspect.isgeneratorfunction(function):
+        @functools.wraps(function)
+        def generator(*args, **kwargs):
+            # the time of the whole iteration, including the time the caller spends between rows
+            start = time.perf_counter()
+            rows = 0
+            try:
+                for row in function(*args, **kwargs):
+                    rows += 1
+                    yield row
+            finally:
+                _record(name, time.perf_counter() - start, rows)
+        return generator
+
+    @functools.wraps(function)
+    def timed(*args, **kwargs):
+        start = time.perf_counter()
+        result = None
+        try:
+            result = function(*args, **kwargs)
+            return result
+        finally:
+            rows = len(result) if isinstance(result, (list, Reservations)) else None
+            _record(name, time.perf_counter() - start, rows)
+    return timed
+
+
+def enable() -> None:
+    """
+    wrap the database methods and the Validator checks, objects created before are measured too,
+    nothing is wrapped until this is called so disabled metrics cost nothing
+    """
+    instrumented = _instrumented()
+    with _lock:
+        for cls, names in instrumented.items():
+            for name in names:
+                if (cls, name) in _originals:
+                    continue
+                attribute = vars(cls)[name]
+                _originals[(cls, name)] = attribute
+                label = f"{cls.__name__}.{name}"
+                if isinstance(attribute, staticmethod):
+                    setattr(cls, name, staticmethod(_timed(label, attribute.__func__)))
+                else:
+                    setattr(cls, name, _timed(label, attribute))
+
+
+def disable() -> None:
+    with _lock:
+        for (cls, name), attribute in _originals.items():
+            setattr(cls, name, attribute)
+        _originals.clear()
+
+
+def enabled() -> bool:
+    return bool(_originals)
+
+
+def reset() -> None:
+    with _lock:
+        _operations.clear()
+
+
+def snapshot(database=None) -> dict:
+    """ everything measured so far, with the cache statistics of the database if given """
+    with _lock:
+        result = {"enabled": bool(_originals),
+                  "operations": {name: operation.as_dict() for name, operation in sorted(_operations.items())}}
+    if database is not None:
+        result["cache"] = database.cache_stats()
+    return result
+
+
+def dump(filename: str, database=None) -> None:
+    with open(filename, "w", encoding="utf-8") as file:
+        json.dump(snapshot(database), file, indent=2)
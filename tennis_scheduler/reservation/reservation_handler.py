@@ -1,15 +1,16 @@
-import csv
-import json
 from datetime import timedelta, datetime
 
 from .reservation_validator import Validator
+from . import export
+from .importer import ReservationImporter
+from .schedule import Reservations
 
 MAIN_DB = "tennis_scheduler.sqlite"
 
 
 class ReservationHandler(Validator):
-    def __init__(self):
-        super().__init__(MAIN_DB)
+    def __init__(self, database_name: str = MAIN_DB, backend: str = None, **options):
+        super().__init__(database_name, backend, **options)
 
     def execute_option(self, option: int) -> None:
         if option == 1:
@@ -23,6 +24,12 @@ class ReservationHandler(Validator):
         elif option == 5:
             self._database.close_database()
             exit()
+        elif option == 6:
+            self.__import_reservations()
+        elif option == 7:
+            self.__reserve_series()
+        elif option == 8:
+            self.__save_changes()
         else:
             self._invalid_option(option)
         return
@@ -48,15 +55,23 @@ class ReservationHandler(Validator):
             if self._check_availability(date, date + timedelta(minutes=book)) is not None:
                 break
 
-            # if date is not available, check for closest available time
-            closest_time = self._check_closest_reservation(date, book)
-            if closest_time is None:
-                return
-
-            choice = self.__get_final_choice(closest_time)
+            # if no court is free at that time, check for closest available time on every court
+            closest = self._check_closest_reservation(date, book)
+            if closest is None:
+                # the whole day is booked, look for the closest time on the following days
+                closest_times = self._check_next_available_times(date, book, count=1)
+                if closest_times is None:
+                    return
+                closest = closest_times[0]
+
+            court, closest_time = closest
+            choice = self.__get_final_choice(closest_time, court, date)
             if choice is None:
                 return
             elif choice:
+                # time from another day may fall into another week
+                if self._check_too_many_reservations(name, closest_time) is None:
+                    return
                 # user chose "yes" to the closest time, so we can book it
                 date = closest_time
                 break
@@ -64,14 +79,64 @@ class ReservationHandler(Validator):
                 # user chose "no" to the closest time, so we need to ask for new date
                 continue
 
-        self._database.insert(name, date, date + timedelta(minutes=book))
-        print("Reservation successful!")
+        # another kiosk may have booked the time since it was checked, the first court still free is booked
+        court = self._database.book_if_free(name, date, date + timedelta(minutes=book))
+        if court is None:
+            print("Sorry, this time has just been booked by someone else. Please try again.")
+            return
+        print(f"Reservation successful! Your court is {court}.")
         return
 
+    def __reserve_series(self) -> None:
+        name = self._invalid_name()
+        if name is None:
+            return
+
+        date = self._invalid_date("reservation")
+        if date is None:
+            return
+
+        book = self._invalid_booking(date)
+        if book is None:
+            return
+
+        repeat = self._invalid_repeat()
+        if repeat is None:
+            return
+
+        end_date = self._invalid_date("series_end")
+        if end_date is None:
+            return
+
+        if self._check_series_conditions(date, end_date) is None:
+            return
+
+        print("Would you like the closest free time of the day when a date is already booked? (yes/no)")
+        choice = input()
+        if choice.lower() not in ["y", "yes", "n", "no"]:
+            print("Invalid choice. Please choose yes or no.")
+            return
+
+        # every date of the series is checked and booked at once, on the first court free at its time
+        results = self._book_series(name, date, book, repeat, end_date, fallback=choice.lower() in ["y", "yes"])
+        print(f"Booked {sum(court is not None for _, court, _, _ in results)} of {len(results)} dates.")
+        for series_date, court, time, reason in results:
+            if court is None:
+                print(f"* {series_date.strftime('%d.%m.%Y %H:%M')} not booked -> {reason}")
+            elif time != series_date:
+                print(f"* {time.strftime('%d.%m.%Y %H:%M')} court {court} "
+                      f"instead of {series_date.strftime('%H:%M')}")
+            else:
+                print(f"* {time.strftime('%d.%m.%Y %H:%M')} court {court}")
+
     @staticmethod
-    def __get_final_choice(closest_time: datetime):
+    def __get_final_choice(closest_time: datetime, court: int, date: datetime):
+        if closest_time.date() == date.date():
+            closest = str(closest_time.time())[:-3]
+        else:
+            closest = closest_time.strftime("%d.%m.%Y %H:%M")
         print(f"The time you chose is unavailable, "
-              f"would you like to make a reservation for {str(closest_time.time())[:-3]} instead? (yes/no)")
+              f"would you like to make a reservation for {closest} on court {court} instead? (yes/no)")
         choice = input()
         if choice.lower() in ["y", "yes"]:
             return True
@@ -110,36 +175,30 @@ class ReservationHandler(Validator):
         if self._check_data_range(start_date, end_date) is None:
             return
 
-        # reservations are sorted by start date
-        # reservations = (name, start_date, end_date)*n
+        # reservations are sorted by start date and court, grouped by day from start_date on
         reservations = self._database.get_reservations(start_date, end_date)
-        self.__print_schedule(start_date, end_date, reservations)
+        self.__print_schedule(reservations)
 
     @staticmethod
-    def __print_schedule(start_date: datetime, end_date: datetime, reservations: list) -> None:
-        days = (end_date - start_date).days + 1
-
-        reservation_number = 0
+    def __print_schedule(reservations: Reservations) -> None:
+        today = datetime.now().date()
         # print reservations for each day
         # if there are no reservations for a given day, print "No reservations"
         # scheme looks like this: Today, Tomorrow, The_day_after_tomorrow...
-        for i in range(days):
-            if i == 0 and start_date.date() == datetime.now().date():
+        for i in range(reservations.days):
+            day = reservations.date(i)
+            if i == 0 and day == today:
                 print("Today:")
-            elif i == 1 and (start_date + timedelta(days=1)).date() == (datetime.now() + timedelta(days=1)).date():
+            elif i == 1 and day == today + timedelta(days=1):
                 print("Tomorrow:")
             else:
-                print((start_date.date() + timedelta(days=i)).strftime("%A") + ":")
-            reservation_number_copy = reservation_number
-            while reservation_number < len(reservations) \
-                    and reservations[reservation_number][1].date() == start_date.date() + timedelta(days=i):
-                print(
-                    f"* {reservations[reservation_number][0]} "
-                    f"{reservations[reservation_number][1].strftime('%d.%m.%Y %H:%M')} - "
-                    f"{reservations[reservation_number][2].strftime('%d.%m.%Y %H:%M')}")
-                reservation_number += 1
-
-            if reservation_number_copy == reservation_number:
+                print(day.strftime("%A") + ":")
+            # rows of the day come from its precomputed offsets, no date is compared per row
+            day_reservations = reservations.day(i)
+            for name, start_time, end_time, court in day_reservations:
+                print(f"* {name} {start_time.strftime('%d.%m.%Y %H:%M')} - {end_time.strftime('%d.%m.%Y %H:%M')} "
+                      f"court {court}")
+            if not day_reservations:
                 print("No reservations")
 
     def __save_reservations(self) -> None:
@@ -162,77 +221,55 @@ class ReservationHandler(Validator):
         if filename is None:
             return
 
-        # reservations are sorted by start date
-        # reservations = (name, start_date, end_date)*n
-        reservations = self._database.get_reservations(start_date, end_date)
+        # reservations are sorted by start date and court and streamed from the database in chunks
+        # reservations = (name, start_date, end_date, court)*n
+        reservations = self._database.iter_reservations(start_date, end_date)
+        compress = extension.endswith(".gz")
+        extension = extension.split(".")[0]
         if extension == "csv":
-            self.__save_to_csv(filename, reservations)
+            export.save_to_csv(filename, reservations, compress)
+        elif extension == "ndjson":
+            export.save_to_ndjson(filename, reservations, compress)
         elif extension == "json":
             choice = self._invalid_choice_json()
             if choice is None:
                 return
             if choice:
-                self.__save_to_json(filename, reservations, start_date, end_date)
+                export.save_to_json(filename, reservations, start_date, end_date, compress)
             elif not choice:
-                self.__save_to_json_no_empty(filename, reservations)
+                export.save_to_json_no_empty(filename, reservations, compress)
             else:
                 return
         print("Reservations saved!")
 
-    @staticmethod
-    def __save_to_csv(filename: str, reservations: list) -> None:
-        with open(filename + ".csv", "w", newline="",encoding='utf-8') as file:
-            writer = csv.writer(file)
-            writer.writerow(["name", "start_time", "end_time"])
-            for reservation in reservations:
-                writer.writerow([reservation[0], reservation[1], reservation[2]])
+    def __save_changes(self) -> None:
+        extension = self._invalid_extension(export.CHANGE_FORMATS)
+        if extension is None:
+            return
 
-    @staticmethod
-    def __save_to_json(filename: str, reservations: list, start_date: datetime, end_date: datetime) -> None:
-        days = (end_date - start_date).days + 1
-        json_dict = {}
-        reservation_number = 0
-        for i in range(days):
-            reservation_number_copy = reservation_number
-            while reservation_number < len(reservations) \
-                    and reservations[reservation_number][1].date() == start_date.date() + timedelta(days=i):
-
-                date = reservations[reservation_number][1].strftime("%d.%m")
-                name = reservations[reservation_number][0]
-                start_time = reservations[reservation_number][1].strftime("%H:%M")
-                end_time = reservations[reservation_number][2].strftime("%H:%M")
-                if date in json_dict:
-                    json_dict[date].append({"name": name,
-                                            "start_time": start_time,
-                                            "end_time": end_time})
-                else:
-                    json_dict[date] = [{"name": name,
-                                        "start_time": start_time,
-                                        "end_time": end_time}]
-                reservation_number += 1
-
-            if reservation_number_copy == reservation_number:
-                json_dict[(start_date + timedelta(days=i)).strftime("%d.%m")] = []
-
-        with open(filename + ".json", "w") as file:
-            json.dump(json_dict, file, indent=2)
+        filename = self._invalid_filename()
+        if filename is None:
+            return
 
-    @staticmethod
-    def __save_to_json_no_empty(filename: str, reservations: list) -> None:
-        json_dict = {}
-        for reservation in reservations:
-            date = reservation[1].strftime("%d.%m")
-            name = reservation[0]
-            start_time = reservation[1].strftime("%H:%M")
-            end_time = reservation[2].strftime("%H:%M")
-            if date in json_dict:
-                json_dict[date].append({"name": name,
-                                        "start_time": start_time,
-                                        "end_time": end_time})
-            else:
-                json_dict[date] = [{"name": name,
-                                    "start_time": start_time,
-                                    "end_time": end_time}]
+        # only what was added or cancelled since the last save to the same filename is read and written
+        written, watermark = export.save_changes_since_watermark(self._database, filename, extension.split(".")[0],
+                                                                 extension.endswith(".gz"))
+        print(f"Saved {written} changes, the next save starts after change {watermark}.")
+
+    def __import_reservations(self) -> None:
+        filename = self._invalid_import_file()
+        if filename is None:
+            return
+
+        year = None
+        if filename.lower().endswith(".json"):
+            # json export keeps only day and month
+            year = self._invalid_year()
+            if year is None:
+                return
 
-        with open(filename + ".json", "w") as file:
-            json.dump(json_dict, file, indent=2)
+        report = ReservationImporter(self._database).import_file(filename, year)
+        print(f"Imported {report.accepted} reservations, rejected {len(report.rejected)}.")
+        if report.rejected:
+            report.save_rejections(filename + ".rejected.csv")
+            print(f"Rejected reservations with reasons saved to {filename}.rejected.csv")
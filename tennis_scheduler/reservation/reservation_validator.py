@@ -1,25 +1,42 @@
 from .tools import terminal_clear
+from . import slots
+from .export import EXPORT_FORMATS
+import functools
+import operator
+import os
 import re
 from datetime import datetime, timedelta
-from .database.database import Database
-from .database.database_orm import DatabaseORM
+from .database.backend import open_backend
 
 INFORMATION = {"reservation": "When would you like to book?",
                "cancellation": "What date would you like to cancel?",
                "printing_start": "From what date would you like to get schedule?",
-               "printing_end": "Till what date would you like to get schedule?"}
+               "printing_end": "Till what date would you like to get schedule?",
+               "series_end": "Till what date would you like to repeat it?"}
 
 DATE_FORMAT = {"reservation": "{DD.MM.YYYY HH:MM} e.g. 10.07.2023 15:30\nMinutes must be :00 or :30.",
                "cancellation": "{DD.MM.YYYY HH:MM} e.g. 10.07.2023 15:30\nMinutes must be :00 or :30.",
                "printing_start": "{DD.MM.YYYY} e.g. 10.07.2023",
-               "printing_end": "{DD.MM.YYYY} e.g. 10.07.2023"}
+               "printing_end": "{DD.MM.YYYY} e.g. 10.07.2023",
+               "series_end": "{DD.MM.YYYY} e.g. 10.07.2023"}
+
+# length of a reservation in minutes -> option of _invalid_booking_format
+BOOKING_OPTIONS = {30: 1, 60: 2, 90: 3}
+
+# how often a series repeats -> time between its dates
+REPEATS = {"weekly": timedelta(weeks=1), "biweekly": timedelta(weeks=2)}
+REPEAT_OPTIONS = {1: "weekly", 2: "biweekly"}
+# a series is booked for one season at most
+MAX_SERIES_LENGTH = timedelta(days=365)
+# why a date of a series wasn't booked, see slots.claim_series()
+SERIES_REASONS = {slots.WEEK_FULL: "more than 2 reservations in the week", slots.TAKEN: "already booked"}
 
 
 class Validator:
 
-    def __init__(self, database_name: str) -> None:
-        #self._database = Database(database_name)
-        self._database = DatabaseORM(database_name)
+    def __init__(self, database_name: str, backend: str = None, **options) -> None:
+        # backend -> "raw", "orm" or "memory", see database/backend.py, options -> keyword arguments of the backend
+        self._database = open_backend(database_name, backend, **options)
 
     def _invalid_name(self):
         name = None
@@ -126,6 +143,44 @@ class Validator:
             return
         return book_hours[booking_time]
 
+    def _invalid_repeat(self):
+        repeat = None
+        print("How often would you like to repeat it?")
+        print("1) Every week")
+        print("2) Every 2 weeks")
+        try:
+            repeat = int(input())
+        except ValueError:
+            terminal_clear()
+            print(f"Invalid repeat -> {repeat}. Please provide a valid repeat -> 1, 2")
+            return
+        return self._invalid_repeat_format(REPEAT_OPTIONS.get(repeat, repeat))
+
+    @staticmethod
+    def _invalid_repeat_format(repeat):
+        if repeat not in REPEATS:
+            terminal_clear()
+            print(f"Invalid repeat -> {repeat}. Please provide one of {list(REPEATS)}.")
+            return
+        return repeat
+
+    def _check_series_conditions(self, date_start: datetime, date_end: datetime):
+        """ the weekly limit is checked for every date of the series when it's booked """
+        if not self._check_time_range(date_start):
+            return
+        if not self._check_if_not_in_past(date_start):
+            return
+        if date_end.date() < date_start.date():
+            print("End date must be after start date.")
+            return
+        if date_end - date_start > MAX_SERIES_LENGTH:
+            print(f"You can repeat a reservation for at most {MAX_SERIES_LENGTH.days} days.")
+            return
+        if date_end > datetime(2100, 12, 31):
+            print("Your date needs to be and at most to 31.12.2100 in the future.")
+            return
+        return True
+
     def _check_reservation_conditions(self, name: str, date_start: datetime):
         if not self._check_time_range(date_start):
             return
@@ -141,6 +196,16 @@ class Validator:
             return
         return True
 
+    @staticmethod
+    def _invalid_court_format(court):
+        if isinstance(court, str) and court.isdigit():
+            court = int(court)
+        if not isinstance(court, int) or isinstance(court, bool) or court not in slots.COURT_NUMBERS:
+            terminal_clear()
+            print(f"Invalid court -> {court}. Please provide a court from 1 to {slots.COURTS}.")
+            return
+        return court
+
     @staticmethod
     def _check_time_range(date: datetime):
         if date.hour < 8 or date.hour > 18 or (date.hour == 18 and date.minute != 0):
@@ -148,10 +213,9 @@ class Validator:
             return
         return True
 
-    def _check_availability(self, date_start: datetime, date_end: datetime):
-        if not self._database.check_availability(date_start, date_end):
-            return
-        return True
+    def _check_availability(self, date_start: datetime, date_end: datetime, court: int = None):
+        # the court if it's free, the first free court when court is None -> every court in one query
+        return self._database.free_court(date_start, date_end, court)
 
     @staticmethod
     def _check_if_not_in_past(date: datetime):
@@ -160,31 +224,81 @@ class Validator:
             return
         return True
 
-    def _check_closest_reservation(self, date_start: datetime, book_time: int):
-        closest_reservations = self._database.get_reserved_times(date_start)
-        if closest_reservations is None:
+    def _free_slots(self, date_start: datetime, last_day: datetime, book_time: int, court: int = None) -> tuple:
+        """
+        (slots where book_time can start, courts) -> the days of every court of courts packed one after another,
+        see slots.courts_free_mask(), read with one scan of the slot grid
+        """
+        days = (last_day.date() - date_start.date()).days + 1
+        courts = slots.COURT_NUMBERS if court is None else (court,)
+        first_slot = slots.slot_index(self._get_first_available_time(date_start))
+        # first_slot only limits the first day, e.g. no booking earlier than an hour from now
+        available_slots = self._database.get_free_slots(date_start, last_day, court) & \
+            ~slots.every_court(slots.range_mask(0, first_slot), days, len(courts))
+        # book_time//30 means how many slots in a row must be free
+        return slots.run_starts(available_slots, book_time // 30), courts
+
+    def _check_closest_reservation(self, date_start: datetime, book_time: int, court: int = None):
+        """ (court, time) of the day closest to date_start, every court is checked when court is None """
+        final_slots, courts = self._free_slots(date_start, date_start, book_time, court)
+        if final_slots == 0:
+            booked = "All courts are" if court is None else f"Court {court} is"
+            print(f"{booked} already booked and cannot be booked for another hour. Please choose another date.")
             return
 
-        available_times = self._get_base_available_times(date_start)
-        if len(available_times) == 0:
-            print("Court is already booked and cannot be booked for another hour. Please choose another date.")
+        target = (date_start.hour * 60 + date_start.minute - slots.DAY_START) / slots.SLOT_LENGTH
+        # the earlier time wins a tie, then the lower court
+        bit = min(slots.iter_slots(final_slots),
+                  key=lambda bit: (abs(bit % slots.DAY_STRIDE - target), bit % slots.DAY_STRIDE, bit))
+        return slots.court_slot_time(date_start, 1, bit, courts)
+
+    def _check_next_available_times(self, date_start: datetime, book_time: int, count: int = 3, days: int = 7,
+                                    court: int = None):
+        """
+        up to count (court, time) closest to date_start, from the day of date_start and the following days,
+        every time comes once with the lowest free court, every court is checked when court is None
+        """
+        last_day = min(date_start + timedelta(days=days - 1), datetime(2100, 12, 31))
+        days = (last_day.date() - date_start.date()).days + 1
+        if days <= 0:
             return
-
-        available_times = self._get_real_available_times(available_times, closest_reservations)
-        if len(available_times) == 0:
-            print("Court is already booked and cannot be booked for another hour. Please choose another date.")
+        final_slots, courts = self._free_slots(date_start, last_day, book_time, court)
+        if final_slots == 0:
+            booked = "All courts are" if court is None else f"Court {court} is"
+            print(f"{booked} already booked for the next {days} days. Please choose another date.")
             return
 
-        final_times = self._get_final_times(available_times, book_time)
-        if len(final_times) == 0:
-            print("Court is already booked and cannot be booked for another hour. Please choose another date.")
-            return
+        # times free on any court first, the court is only looked up for the times returned
+        court_masks = [slots.court_mask(final_slots, days, position + 1) for position in range(len(courts))]
+        final_times = [(bit, slots.days_slot_time(date_start, bit)) for bit in slots.iter_slots(
+            functools.reduce(operator.or_, court_masks))]
+        closest = sorted(final_times, key=lambda final: (abs(final[1] - date_start), final[1]))[:count]
+        return [(next(court for court, mask in zip(courts, court_masks) if mask >> bit & 1), time)
+                for bit, time in closest]
 
-        return min(final_times, key=lambda x: abs(x - date_start))
+    @staticmethod
+    def _series_dates(date_start: datetime, repeat: str, date_end: datetime) -> list:
+        """ date_start and its repeats till the day of date_end """
+        step = REPEATS[repeat]
+        return [date_start + step * i for i in range((date_end.date() - date_start.date()) // step + 1)]
+
+    def _book_series(self, name: str, date_start: datetime, book: int, repeat: str, date_end: datetime,
+                     court: int = None, fallback: bool = False) -> list:
+        """
+        (date, court, time, reason) of every date of the series -> court and time it was booked at, or the reason
+        it wasn't; all dates are checked and booked by one call of the database, with fallback a taken date
+        is booked at the closest free time of its day instead
+        """
+        dates = self._series_dates(date_start, repeat, date_end)
+        # the weekly limit is counted and the closest times are looked up in the transaction that books the series
+        booked = self._database.book_series(name, [(date, date + timedelta(minutes=book)) for date in dates], court,
+                                            slots.WEEK_LIMIT,
+                                            self._get_first_available_time(date_start) if fallback else None)
+        return [(date, booked_court, start_time, SERIES_REASONS.get(reason))
+                for date, (booked_court, start_time, reason) in zip(dates, booked)]
 
     @staticmethod
-    def _get_base_available_times(date_start: datetime) -> list:
-        available_times = []
+    def _get_first_available_time(date_start: datetime) -> datetime:
         start_hour = 8
         start_minutes = 0
         if date_start.date() == datetime.now().date():
@@ -196,33 +310,7 @@ class Validator:
             else:
                 start_hour = (datetime.now() + timedelta(hours=1)).hour
                 start_minutes = 30
-
-        start_time = date_start.replace(hour=start_hour, minute=start_minutes, second=0, microsecond=0)
-        end_time = date_start.replace(hour=18, minute=30, second=0, microsecond=0)
-        while start_time < end_time:
-            available_times.append([start_time, start_time + timedelta(minutes=30)])
-            # add every time from start hour to 18:00 with delta -> 30 minutes
-            start_time += timedelta(minutes=30)
-        return available_times
-
-    @staticmethod
-    def _get_real_available_times(available_times: list, closest_reservations: list) -> list:
-        available_times_copy = available_times.copy()
-        for start_time, end_time in closest_reservations:
-            for j in range(len(available_times)):
-                if start_time <= available_times[j][0] < end_time:
-                    if available_times[j] in available_times_copy:
-                        available_times_copy.remove(available_times[j])
-        return available_times_copy
-
-    @staticmethod
-    def _get_final_times(available_times: list, book_time: int) -> list:
-        final_times = []
-        # book_time//30 means which index of booking time user chose
-        for i in range(len(available_times) - book_time // 30 + 1):
-            if available_times[i][0] + timedelta(minutes=book_time) == available_times[i + book_time // 30 - 1][1]:
-                final_times.append(available_times[i][0])
-        return final_times
+        return date_start.replace(hour=start_hour, minute=start_minutes, second=0, microsecond=0)
 
     def _check_if_can_cancel(self, name: str, date_start: datetime):
         user_date = self._database.get_user_reserved_times(name, date_start)
@@ -260,23 +348,27 @@ class Validator:
             return
         return True
 
-    def _invalid_extension(self):
+    def _invalid_extension(self, formats: list = EXPORT_FORMATS):
         extension = None
+        choices = "{" + "/".join(formats) + "}"
         try:
-            extension = input("What extension would you like the file to be saved in? {csv/json}\n")
+            extension = input(f"What extension would you like the file to be saved in? {choices}\n"
+                              f"Add .gz to compress the file e.g. {formats[0]}.gz\n")
         except ValueError:
             terminal_clear()
-            print(f"Invalid extension -> {extension}. Please provide a valid extension -> {{csv/json}}.")
+            print(f"Invalid extension -> {extension}. Please provide a valid extension -> {choices}.")
             return
-        return self._invalid_extension_format(extension)
+        return self._invalid_extension_format(extension, formats)
 
     @staticmethod
-    def _invalid_extension_format(extension: str):
-        if extension.lower() not in ["csv", "json"]:
+    def _invalid_extension_format(extension: str, formats: list = EXPORT_FORMATS):
+        extension = extension.lower()
+        if extension not in formats and extension not in [f"{file_format}.gz" for file_format in formats]:
             terminal_clear()
-            print(f"Invalid extension -> {extension}. Please provide a valid extension -> {{csv/json}}.")
+            print(f"Invalid extension -> {extension}. Please provide a valid extension -> "
+                  f"{{{'/'.join(formats)}}}.")
             return
-        return extension.lower()
+        return extension
 
     def _invalid_filename(self):
         filename = None
@@ -317,3 +409,42 @@ class Validator:
         print(f"Invalid option -> {choice}. Please provide a valid option {{yes/no}}.")
         return
 
+    def _invalid_import_file(self):
+        filename = None
+        try:
+            filename = input("What file would you like to import? {csv/json/jsonl}\n")
+        except ValueError:
+            terminal_clear()
+            print(f"Invalid file -> {filename}. Please provide a path to an existing file.")
+            return
+        return self._invalid_import_file_format(filename)
+
+    @staticmethod
+    def _invalid_import_file_format(filename: str):
+        if os.path.splitext(filename)[1].lower() not in [".csv", ".json", ".jsonl", ".ndjson"]:
+            terminal_clear()
+            print(f"Invalid file -> {filename}. Please provide a file with extension {{csv/json/jsonl}}.")
+            return
+        if not os.path.isfile(filename):
+            terminal_clear()
+            print(f"Invalid file -> {filename}. Please provide a path to an existing file.")
+            return
+        return filename
+
+    def _invalid_year(self):
+        year = None
+        try:
+            year = int(input("What year are the reservations from? {YYYY} e.g. 2023\n"))
+        except ValueError:
+            terminal_clear()
+            print(f"Invalid year -> {year}. Please provide a valid year {{YYYY}}.")
+            return
+        return self._invalid_year_format(year)
+
+    @staticmethod
+    def _invalid_year_format(year: int):
+        if year < datetime.now().year - 1 or year > 2100:
+            terminal_clear()
+            print(f"Invalid year -> {year}. Please provide a year from last year to 2100.")
+            return
+        return year
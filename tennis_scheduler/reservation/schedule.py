@@ -0,0 +1,128 @@
+from array import array
+from collections.abc import Sequence
+from datetime import date, datetime, timedelta
+
+# result of get_reservations() -> the rows of a range kept in columns instead of one tuple of objects per row,
+# starts and ends are int32 minutes since midnight of the first day, day_offsets[i]..day_offsets[i + 1]
+# are the rows starting on day i so grouping by day needs no date arithmetic per row
+MINUTE = timedelta(minutes=1)
+MINUTES_PER_DAY = 24 * 60
+# offsets into the day and the next one, a row is rebuilt from the day's datetime without making new timedeltas
+_OFFSETS = [timedelta(minutes=minute) for minute in range(2 * MINUTES_PER_DAY + 1)]
+
+
+class Reservation(object):
+    """ one reservation, unpacks and indexes like the (name, start_time, end_time, court) tuples it replaces """
+    __slots__ = ("name", "start_time", "end_time", "court")
+
+    def __init__(self, name: str, start_time: datetime, end_time: datetime, court: int):
+        self.name = name
+        self.start_time = start_time
+        self.end_time = end_time
+        self.court = court
+
+    def __iter__(self):
+        return iter((self.name, self.start_time, self.end_time, self.court))
+
+    def __getitem__(self, index):
+        return (self.name, self.start_time, self.end_time, self.court)[index]
+
+    def __len__(self) -> int:
+        return 4
+
+    def __eq__(self, other) -> bool:
+        if isinstance(other, (Reservation, tuple)):
+            return tuple(self) == tuple(other)
+        return NotImplemented
+
+    def __hash__(self) -> int:
+        return hash(tuple(self))
+
+    def __repr__(self) -> str:
+        return f"Reservation{tuple(self)!r}"
+
+
+class Reservations(Sequence):
+    """
+    reservations of days first_day..first_day + days - 1 in the order of the backends -> start_time, court, end_time,
+    times are kept with minute precision, rows are created as Reservation when they are read
+    """
+    __slots__ = ("origin", "names", "starts", "ends", "courts", "day_offsets")
+
+    def __init__(self, first_day: date, days: int):
+        self.origin = datetime.combine(first_day, datetime.min.time())
+        self.names = []
+        self.starts = array("i")
+        self.ends = array("i")
+        self.courts = array("B")
+        self.day_offsets = array("i", [0] * (max(days, 0) + 1))
+
+    @classmethod
+    def from_rows(cls, rows, first_day: date, days: int) -> "Reservations":
+        """
+        rows -> (name, start_time, end_time, court) sorted by start_time, starting from first_day for days days,
+        rows may be a cursor, they are read one at a time and only the columns are kept
+        """
+        origin = datetime.combine(first_day, datetime.min.time())
+        return cls.from_minutes(((name, (start_time - origin) // MINUTE, (end_time - origin) // MINUTE, court)
+                                 for name, start_time, end_time, court in rows), first_day, days)
+
+    @classmethod
+    def from_minutes(cls, rows, first_day: date, days: int) -> "Reservations":
+        """ rows -> (name, start minute, end minute, court) counted from midnight of first_day, sorted by start """
+        reservations = cls(first_day, days)
+        names, starts, ends, courts = reservations.names, reservations.starts, reservations.ends, reservations.courts
+        # every name is stored once however many reservations it has
+        interned = {}
+        for name, start, end, court in rows:
+            names.append(interned.setdefault(name, name))
+            starts.append(start)
+            ends.append(end)
+            courts.append(court)
+        # rows before day i -> first index whose start falls on day i or later, starts are sorted
+        offsets = reservations.day_offsets
+        row = 0
+        for day in range(1, len(offsets)):
+            bound = day * MINUTES_PER_DAY
+            while row < len(starts) and starts[row] < bound:
+                row += 1
+            offsets[day] = row
+        offsets[-1] = len(starts)
+        return reservations
+
+    @property
+    def days(self) -> int:
+        return len(self.day_offsets) - 1
+
+    def date(self, day: int) -> date:
+        return (self.origin + timedelta(days=day)).date()
+
+    def day(self, day: int) -> list:
+        """ reservations starting on day number day of the range """
+        base, midnight = self.origin + timedelta(days=day), day * MINUTES_PER_DAY
+        names, starts, ends, courts = self.names, self.starts, self.ends, self.courts
+        # reservations never span more than a day, so the end is at most one day after midnight of the start
+        return [Reservation(names[row], base + _OFFSETS[starts[row] - midnight], base + _OFFSETS[ends[row] - midnight],
+                            courts[row])
+                for row in range(self.day_offsets[day], self.day_offsets[day + 1])]
+
+    def __len__(self) -> int:
+        return len(self.starts)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[row] for row in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("reservation index out of range")
+        return Reservation(self.names[index], self.origin + timedelta(minutes=self.starts[index]),
+                           self.origin + timedelta(minutes=self.ends[index]), self.courts[index])
+
+    def __eq__(self, other) -> bool:
+        if isinstance(other, (Reservations, list, tuple)):
+            return len(self) == len(other) and all(mine == theirs for mine, theirs in zip(self, other))
+        return NotImplemented
+
+    def __repr__(self) -> str:
+        return f"Reservations({list(self)!r})"
@@ -0,0 +1,182 @@
+import asyncio
+import json
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit, parse_qsl
+
+from .batch import CommandRunner
+from .reservation_validator import Validator
+
+# (method, path) -> command of CommandRunner, parameters come from the query string and the JSON body
+ROUTES = {("POST", "/reservations"): "reserve",
+          ("POST", "/series"): "series",
+          ("DELETE", "/reservations"): "cancel",
+          ("GET", "/schedule"): "schedule",
+          ("GET", "/closest"): "closest",
+          ("GET", "/metrics"): "metrics"}
+
+STATUS_CODES = {"ok": 200, "unavailable": 409, "error": 400}
+
+REASONS = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed", 409: "Conflict",
+           413: "Payload Too Large", 431: "Request Header Fields Too Large", 500: "Internal Server Error"}
+
+MAX_BODY = 64 * 1024
+MAX_HEADERS = 100
+
+
+class HttpError(Exception):
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+
+
+class ReservationServer(object):
+    """
+    HTTP/1.1 front-end of the reservation engine, e.g.
+
+    POST   /reservations  {"name": "John Smith", "date": "10.07.2050 15:30", "duration": 60, "court": 3}
+    POST   /series        {"name": "John Smith", "date": "10.07.2050 15:30", "duration": 60, "until": "25.09.2050"}
+    DELETE /reservations?name=John+Smith&date=10.07.2050+15:30
+    GET    /schedule?start=10.07.2050&end=14.07.2050
+    GET    /closest?date=10.07.2050+15:30&duration=60&count=3
+    GET    /metrics
+
+    connections are kept alive and pipelined requests are answered in order,
+    the database work runs in a thread pool of at most `workers` threads
+    """
+
+    def __init__(self, validator: Validator, workers: int = 4):
+        self.__runner = CommandRunner(validator)
+        self.__executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="reservation")
+        self.__server = None
+
+    async def start(self, host: str = "127.0.0.1", port: int = 8080) -> tuple:
+        """ start listening, returns the bound (host, port) -> port 0 picks a free one """
+        self.__server = await asyncio.start_server(self.__handle_connection, host, port)
+        return self.__server.sockets[0].getsockname()[:2]
+
+    async def serve_forever(self) -> None:
+        async with self.__server:
+            await self.__server.serve_forever()
+
+    async def close(self) -> None:
+        if self.__server is not None:
+            self.__server.close()
+            await self.__server.wait_closed()
+        self.__executor.shutdown(wait=True)
+
+    async def __handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            keep_alive = True
+            while keep_alive:
+                try:
+                    request = await self.__read_request(reader)
+                except HttpError as e:
+                    await self.__respond(writer, e.status, {"status": "error", "message": str(e)}, False)
+                    return
+                if request is None:
+                    return
+                method, target, version, headers, body = request
+                connection = headers.get("connection", "").lower()
+                keep_alive = connection == "keep-alive" if version == "HTTP/1.0" else connection != "close"
+                try:
+                    status, result = await self.__dispatch(method, target, body)
+                except Exception as e:
+                    # a failed request is answered like any other and the connection keeps serving
+                    status, result = 500, {"status": "error", "message": f"Request failed -> {type(e).__name__}: {e}"}
+                await self.__respond(writer, status, result, keep_alive)
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    @staticmethod
+    async def __read_request(reader: asyncio.StreamReader):
+        """ (method, target, version, headers, body) of the next request, None when the client is gone """
+        line = await ReservationServer.__read_line(reader, 400, "Request line is too long.")
+        if not line:
+            return
+        try:
+            method, target, version = line.decode("latin-1").split()
+        except ValueError:
+            raise HttpError(400, "Malformed request line.")
+
+        headers = {}
+        while True:
+            line = await ReservationServer.__read_line(reader, 431, "Header line is too long.")
+            if line in (b"\r\n", b"\n", b""):
+                break
+            if len(headers) >= MAX_HEADERS:
+                raise HttpError(431, "Too many headers.")
+            name, _, value = line.decode("latin-1").partition(":")
+            headers[name.strip().lower()] = value.strip()
+
+        try:
+            length = int(headers.get("content-length", 0))
+        except ValueError:
+            raise HttpError(400, "Invalid Content-Length.")
+        if length < 0:
+            raise HttpError(400, "Invalid Content-Length.")
+        if length > MAX_BODY:
+            raise HttpError(413, "Request body is too large.")
+        body = await reader.readexactly(length) if length > 0 else b""
+        return method.upper(), target, version.upper(), headers, body
+
+    @staticmethod
+    async def __read_line(reader: asyncio.StreamReader, status: int, message: str) -> bytes:
+        # a line longer than the limit of the reader raises instead of returning -> answered with status
+        try:
+            return await reader.readline()
+        except (ValueError, asyncio.LimitOverrunError):
+            raise HttpError(status, message)
+
+    async def __dispatch(self, method: str, target: str, body: bytes) -> tuple:
+        url = urlsplit(target)
+        if url.path not in {path for _, path in ROUTES}:
+            return 404, {"status": "error", "message": f"Unknown path -> {url.path}."}
+        command_name = ROUTES.get((method, url.path))
+        if command_name is None:
+            return 405, {"status": "error", "message": f"Method {method} is not allowed for {url.path}."}
+
+        command = dict(parse_qsl(url.query))
+        if body:
+            try:
+                payload = json.loads(body)
+            except ValueError:
+                payload = None
+            if not isinstance(payload, dict):
+                return 400, {"status": "error", "message": "Request body must be a JSON object."}
+            command.update(payload)
+        # numbers in the query string arrive as text
+        for key in ["duration", "count", "court"]:
+            if isinstance(command.get(key), str) and command[key].isdigit():
+                command[key] = int(command[key])
+        command["command"] = command_name
+
+        loop = asyncio.get_running_loop()
+        result = await loop.run_in_executor(self.__executor, self.__runner.execute, command)
+        return STATUS_CODES.get(result["status"], 400), result
+
+    @staticmethod
+    async def __respond(writer: asyncio.StreamWriter, status: int, result: dict, keep_alive: bool) -> None:
+        body = json.dumps(result).encode("utf-8")
+        writer.write(f"HTTP/1.1 {status} {REASONS.get(status, '')}\r\n"
+                     f"Content-Type: application/json\r\n"
+                     f"Content-Length: {len(body)}\r\n"
+                     f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n".encode("latin-1") + body)
+        await writer.drain()
+
+
+def serve(validator: Validator, host: str = "127.0.0.1", port: int = 8080, workers: int = 4) -> None:
+    async def run():
+        server = ReservationServer(validator, workers)
+        bound_host, bound_port = await server.start(host, port)
+        print(f"Serving reservations on http://{bound_host}:{bound_port}")
+        try:
+            await server.serve_forever()
+        finally:
+            await server.close()
+
+    try:
+        asyncio.run(run())
+    except KeyboardInterrupt:
+        pass
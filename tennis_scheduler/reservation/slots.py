@@ -0,0 +1,219 @@
+from collections import Counter
+from datetime import date, datetime, timedelta
+
+# court works from 8:00 and the last reservation can start at 18:00,
+# so a day is 21 half-hour slots -> 08:00-08:30 is slot 0, 18:00-18:30 is slot 20
+# the occupancy of a day is an int, bit n set means slot n is free
+DAY_START = 8 * 60
+SLOT_LENGTH = 30
+SLOTS_PER_DAY = 21
+FULL_DAY = (1 << SLOTS_PER_DAY) - 1
+
+# the club has COURTS courts numbered from 1, every court has its own slot grid
+COURTS = 12
+COURT_NUMBERS = tuple(range(1, COURTS + 1))
+
+
+def slot_index(date: datetime) -> int:
+    """ index of the first slot starting at or after the date, may fall outside of the day """
+    minutes = date.hour * 60 + date.minute - DAY_START
+    return -(-minutes // SLOT_LENGTH)
+
+
+def slot_time(day: datetime, index: int) -> datetime:
+    return datetime.combine(day.date(), datetime.min.time()) + timedelta(minutes=DAY_START + index * SLOT_LENGTH)
+
+
+def range_mask(first: int, last: int) -> int:
+    """ bits of slots first..last-1, clipped to the day """
+    first = min(max(first, 0), SLOTS_PER_DAY)
+    last = min(max(last, 0), SLOTS_PER_DAY)
+    if first >= last:
+        return 0
+    return ((1 << last) - 1) ^ ((1 << first) - 1)
+
+
+def run_starts(mask: int, length: int) -> int:
+    """ bits of slots that start a run of at least length free slots """
+    runs = mask
+    for shift in range(1, length):
+        runs &= mask >> shift
+    return runs
+
+
+def iter_slots(mask: int):
+    """ indexes of the set bits, from the earliest slot """
+    while mask:
+        lowest = mask & -mask
+        yield lowest.bit_length() - 1
+        mask ^= lowest
+
+
+# a range of days is packed into one int, DAY_STRIDE bits per day -> bit day * DAY_STRIDE + slot
+# bits between SLOTS_PER_DAY and DAY_STRIDE always stay 0, so a run of free slots never
+# crosses into the next day and run_starts() checks every day of the range at once
+DAY_STRIDE = 32
+
+
+def days_free_mask(first_day: datetime, days: int, reservations, first_slot: int = 0) -> int:
+    """ free slots of days first_day..first_day+days-1, reservations are (start_time, end_time) pairs of those days """
+    mask = sum(FULL_DAY << (day * DAY_STRIDE) for day in range(days))
+    # first_slot only limits the first day, e.g. no booking earlier than an hour from now
+    mask &= ~range_mask(0, first_slot)
+    for start_time, end_time in reservations:
+        # a slot is taken when its start is inside [start_time, end_time)
+        day = (start_time.date() - first_day.date()).days
+        if 0 <= day < days:
+            mask &= ~(range_mask(slot_index(start_time), slot_index(end_time)) << (day * DAY_STRIDE))
+    return mask
+
+
+def days_slot_time(first_day: datetime, bit: int) -> datetime:
+    return slot_time(first_day + timedelta(days=bit // DAY_STRIDE), bit % DAY_STRIDE)
+
+
+# the slot grid of the database (slots table) stores cells as (day number since 1970-01-01, slot index)
+EPOCH_DAY = date(1970, 1, 1)
+
+
+def day_number(day: datetime) -> int:
+    return (day.date() - EPOCH_DAY).days
+
+
+def grid_cells(start_time: datetime, end_time: datetime):
+    """ (day number, first slot, slot after the last one) of a reservation on the half-hour grid of one day, else None """
+    first, last = slot_index(start_time), slot_index(end_time)
+    if start_time.date() != end_time.date() or not 0 <= first < last <= SLOTS_PER_DAY:
+        return
+    if slot_time(start_time, first) != start_time or slot_time(end_time, last) != end_time:
+        return
+    return day_number(start_time), first, last
+
+
+def claimed_free_mask(first_day: datetime, days: int, cells) -> int:
+    """ like days_free_mask(), from claimed (day number, slot index) cells of the slot grid """
+    mask = sum(FULL_DAY << (day * DAY_STRIDE) for day in range(days))
+    first = day_number(first_day)
+    for day, index in cells:
+        if 0 <= day - first < days and 0 <= index < SLOTS_PER_DAY:
+            mask &= ~(1 << ((day - first) * DAY_STRIDE + index))
+    return mask
+
+
+# the grids of every court are packed one after another -> bit ((court - 1) * days + day) * DAY_STRIDE + slot,
+# so run_starts() and iter_slots() look at all courts of a range of days in one pass
+
+
+def every_court(mask: int, days: int, courts: int = COURTS) -> int:
+    """ a mask of days repeated for every court, e.g. to limit all courts at once """
+    return sum(mask << (court * days * DAY_STRIDE) for court in range(courts))
+
+
+def courts_free_mask(first_day: datetime, days: int, cells) -> int:
+    """ free slots of every court, from claimed (court, day number, slot index) cells of the slot grid """
+    mask = every_court(sum(FULL_DAY << (day * DAY_STRIDE) for day in range(days)), days)
+    first = day_number(first_day)
+    for court, day, index in cells:
+        if 0 < court <= COURTS and 0 <= day - first < days and 0 <= index < SLOTS_PER_DAY:
+            mask &= ~(1 << (((court - 1) * days + day - first) * DAY_STRIDE + index))
+    return mask
+
+
+def court_slot_time(first_day: datetime, days: int, bit: int, courts: tuple = COURT_NUMBERS) -> tuple:
+    """ (court, time) of a bit of courts_free_mask(), courts -> the courts packed in the mask """
+    court, bit = divmod(bit, days * DAY_STRIDE)
+    return courts[court], days_slot_time(first_day, bit)
+
+
+def court_mask(mask: int, days: int, court: int) -> int:
+    """ the days of one court cut out of a courts_free_mask() """
+    return (mask >> ((court - 1) * days * DAY_STRIDE)) & ((1 << (days * DAY_STRIDE)) - 1)
+
+
+def claimed_by_day(cells) -> dict:
+    """ {(court, day number): bits of the claimed slots} from (court, day number, slot index) cells of the slot grid """
+    claimed = {}
+    for court, day, index in cells:
+        claimed[(court, day)] = claimed.get((court, day), 0) | 1 << index
+    return claimed
+
+
+def claim_courts(claimed: dict, reservations, courts: tuple = COURT_NUMBERS) -> list:
+    """
+    court of every (start_time, end_time) of reservations -> the first of courts with none of its slots in claimed,
+    None when all of them are taken, the slots of every reservation given a court are added to claimed
+    """
+    booked = []
+    for start_time, end_time in reservations:
+        day = day_number(start_time)
+        # the cells the trigger of the slot grid will claim for it
+        taken = range_mask(slot_index(start_time), slot_index(end_time))
+        court = next((court for court in courts if not claimed.get((court, day), 0) & taken), None)
+        if court is not None:
+            claimed[(court, day)] = claimed.get((court, day), 0) | taken
+        booked.append(court)
+    return booked
+
+
+def closest_court(claimed: dict, start_time: datetime, end_time: datetime, courts: tuple = COURT_NUMBERS,
+                  first_slot: int = 0):
+    """
+    (court, start_time) of the free time of the day closest to start_time that is as long as the reservation,
+    the earlier time wins a tie, then the first of courts, None when there is none from first_slot on,
+    its slots are added to claimed like in claim_courts()
+    """
+    day = day_number(start_time)
+    length = (end_time - start_time) // timedelta(minutes=SLOT_LENGTH)
+    target = (start_time.hour * 60 + start_time.minute - DAY_START) / SLOT_LENGTH
+    closest = None
+    for court in courts:
+        free = run_starts(FULL_DAY & ~claimed.get((court, day), 0) & ~range_mask(0, first_slot), length)
+        for index in iter_slots(free):
+            if closest is None or (abs(index - target), index) < (abs(closest[1] - target), closest[1]):
+                closest = court, index
+    if closest is None:
+        return
+    court, index = closest
+    claimed[(court, day)] = claimed.get((court, day), 0) | range_mask(index, index + length)
+    return court, slot_time(start_time, index)
+
+
+def week_range(date: datetime) -> tuple:
+    """ [monday, next monday) of the ISO week the date belongs to """
+    monday = datetime.combine(date.date() - timedelta(days=date.weekday()), datetime.min.time())
+    return monday, monday + timedelta(days=7)
+
+
+# a name can book while it has at most WEEK_LIMIT reservations in the ISO week
+WEEK_LIMIT = 2
+
+# why book_series() didn't book a reservation
+WEEK_FULL = "week_full"
+TAKEN = "taken"
+
+
+def claim_series(claimed: dict, reservations, courts: tuple, name_times=(), week_limit: int = None,
+                 fallback_from: datetime = None) -> list:
+    """
+    (court, start_time, reason) of every (start_time, end_time) of reservations, booked like claim_courts(),
+    reason is WEEK_FULL when name_times (start times of the reservations of the name) already have more than
+    week_limit in its week and TAKEN when no court is free, None for the booked ones; with fallback_from a taken
+    reservation is booked at the closest free time of its day instead, not earlier than fallback_from
+    """
+    weeks = Counter(week_range(time)[0] for time in name_times)
+    results = []
+    for start_time, end_time in reservations:
+        week = week_range(start_time)[0]
+        if week_limit is not None and weeks[week] > week_limit:
+            results.append((None, None, WEEK_FULL))
+            continue
+        court = claim_courts(claimed, [(start_time, end_time)], courts)[0]
+        if court is None and fallback_from is not None:
+            first_slot = slot_index(fallback_from) if fallback_from.date() == start_time.date() else 0
+            court, start_time = closest_court(claimed, start_time, end_time, courts, first_slot) or (None, None)
+        if court is None:
+            results.append((None, None, TAKEN))
+        else:
+            weeks[week] += 1
+            results.append((court, start_time, None))
+    return results
@@ -1,9 +1,70 @@
+import io
 import os
+import sys
+import threading
+from contextlib import contextmanager
+
+_local = threading.local()
+
+
+class _StdoutRouter(io.TextIOBase):
+    """ sends writes of a thread inside headless() to its buffer and everything else to the real stdout """
+
+    def __init__(self, stdout):
+        self.stdout = stdout
+
+    def write(self, text: str) -> int:
+        buffer = getattr(_local, "buffer", None)
+        if buffer is None:
+            return self.stdout.write(text)
+        return buffer.write(text)
+
+    def flush(self) -> None:
+        if getattr(_local, "buffer", None) is None:
+            self.stdout.flush()
 
 
 # check what is the user's os and clear the terminal
 def terminal_clear():
+    if getattr(_local, "buffer", None) is not None:
+        return
     if os.name == "nt":
         os.system("cls")
     else:
-        os.system("clear")
\ No newline at end of file
+        os.system("clear")
+
+
+_router_lock = threading.Lock()
+_router_users = 0
+
+
+@contextmanager
+def headless():
+    """
+    run the interactive checks without a terminal -> nothing is cleared and whatever they print
+    lands in the returned buffer of the current thread, e.g. to report why a check failed
+    """
+    global _router_users
+    with _router_lock:
+        # stdout is routed only while some thread is headless
+        if _router_users == 0:
+            sys.stdout = _StdoutRouter(sys.stdout)
+        _router_users += 1
+    previous = getattr(_local, "buffer", None)
+    _local.buffer = io.StringIO()
+    try:
+        yield _local.buffer
+    finally:
+        _local.buffer = previous
+        with _router_lock:
+            _router_users -= 1
+            if _router_users == 0 and isinstance(sys.stdout, _StdoutRouter):
+                sys.stdout = sys.stdout.stdout
+
+
+def take_message(buffer: io.StringIO) -> str:
+    """ text printed into a headless() buffer since the last call, as one line """
+    message = " ".join(buffer.getvalue().split())
+    buffer.seek(0)
+    buffer.truncate()
+    return message
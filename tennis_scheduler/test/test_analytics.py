@@ -0,0 +1,109 @@
+import csv
+import io
+import json
+import os
+import tempfile
+import unittest
+from datetime import datetime
+
+from tennis_scheduler.reservation.batch import CommandRunner
+from tennis_scheduler.reservation.database.database import Database
+from tennis_scheduler.reservation.database.database_orm import DatabaseORM
+from tennis_scheduler.reservation.database.memory import MemoryDatabase
+from tennis_scheduler.reservation.reservation_validator import Validator
+
+try:
+    from tennis_scheduler.reservation import analytics
+except ImportError:
+    # NumPy is optional, only the report needs it
+    analytics = None
+
+# 03.01.2050 is a Monday
+RESERVATIONS = [("Jan Nowak", datetime(2050, 1, 3, 8, 0), datetime(2050, 1, 3, 9, 30), 1),
+                ("Ewa Lis", datetime(2050, 1, 3, 8, 0), datetime(2050, 1, 3, 9, 0), 2),
+                ("Ewa Lis", datetime(2050, 1, 10, 18, 0), datetime(2050, 1, 10, 18, 30), 1),
+                ("Adam Kowalski", datetime(2050, 1, 4, 12, 0), datetime(2050, 1, 4, 13, 0), 1),
+                ("Adam Kowalski", datetime(2050, 1, 17, 12, 0), datetime(2050, 1, 17, 13, 0), 1)]
+
+
+@unittest.skipIf(analytics is None, "the report needs NumPy")
+class TestAnalytics(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.directory = tempfile.TemporaryDirectory()
+        self.filename = os.path.join(self.directory.name, "report")
+
+    def fill(self, db) -> None:
+        db.insert_many(RESERVATIONS)
+        db.delete("Adam Kowalski", datetime(2050, 1, 4, 12, 0))
+
+    def test_report(self) -> None:
+        db = MemoryDatabase()
+        self.fill(db)
+        report = analytics.report(db, datetime(2050, 1, 3), datetime(2050, 1, 17), top=2)
+        self.assertEqual((report["days"], report["reservations"], report["hours_booked"]), (14, 3, 3.0))
+        # 6 cells of 14 days * 12 courts * 21 slots
+        self.assertEqual(report["fill_rate"], 6 / (14 * 12 * 21))
+        self.assertEqual(len(report["hours_of_week"]), 7 * 11)
+        self.assertEqual(report["hours_of_week"][0], {"weekday": "Monday", "hour": "08:00", "booked_slots": 4,
+                                                      "capacity": 2 * 12 * 2, "fill_rate": 4 / 48})
+        # 18:00 is one slot only
+        self.assertEqual(report["hours_of_week"][10], {"weekday": "Monday", "hour": "18:00", "booked_slots": 1,
+                                                       "capacity": 2 * 12, "fill_rate": 1 / 24})
+        self.assertEqual([(peak["weekday"], peak["time"], peak["booked_slots"]) for peak in report["peak_slots"]],
+                         [("Monday", "08:00", 2), ("Monday", "08:30", 2)])
+        self.assertEqual(report["top_users"], [{"name": "Ewa Lis", "reservations": 2, "hours": 1.5},
+                                               {"name": "Jan Nowak", "reservations": 1, "hours": 1.5}])
+        # the reservation of the 17th is outside of the range
+        self.assertEqual(report["cancellations"], {"added": 4, "cancelled": 1, "rate": 0.25})
+
+    def test_backends_agree(self) -> None:
+        memory = MemoryDatabase()
+        self.fill(memory)
+        self.assertEqual(memory.count_changes(datetime(2050, 1, 4), datetime(2050, 1, 5)), {"add": 1, "cancel": 1})
+        expected = analytics.report(memory, datetime(2050, 1, 1), datetime(2050, 2, 1))
+        for backend in (Database, DatabaseORM):
+            db = backend(os.path.join(self.directory.name, backend.__name__ + ".sqlite"), cache_size=0)
+            self.fill(db)
+            self.assertEqual(analytics.report(db, datetime(2050, 1, 1), datetime(2050, 2, 1)), expected)
+            db.close_database()
+
+    def test_save_report(self) -> None:
+        db = MemoryDatabase()
+        self.fill(db)
+        report = analytics.report(db, datetime(2050, 1, 3), datetime(2050, 1, 17))
+        self.assertEqual(analytics.save_report(self.filename, report), [self.filename + ".json"])
+        with open(self.filename + ".json", encoding="utf-8") as file:
+            self.assertEqual(json.load(file), report)
+        self.assertEqual(analytics.save_report(self.filename, report, "csv"),
+                         [f"{self.filename}_{table}.csv" for table in ("summary", "hours", "peaks", "users")])
+        with open(self.filename + "_users.csv", encoding="utf-8") as file:
+            self.assertEqual(list(csv.reader(file)), [["name", "reservations", "hours"], ["Ewa Lis", "2", "1.5"],
+                                                      ["Jan Nowak", "1", "1.5"]])
+        with open(self.filename + "_summary.csv", encoding="utf-8") as file:
+            self.assertIn(["cancellations_rate", "0.25"], list(csv.reader(file)))
+
+    def test_report_command(self) -> None:
+        # batch file names can't have a directory -> the files are written in the temporary one
+        cwd = os.getcwd()
+        os.chdir(self.directory.name)
+        try:
+            validator = Validator("batch.sqlite")
+            self.fill(validator._database)
+            output = io.StringIO()
+            CommandRunner(validator).run([json.dumps({"command": "report", "start": "03.01.2050", "end": "16.01.2050",
+                                                      "format": "csv", "filename": "season"}),
+                                          json.dumps({"command": "report", "start": "03.01.2050", "end": "16.01.2050",
+                                                      "format": "json.gz", "filename": "season"})], output)
+            validator._database.close_database()
+        finally:
+            os.chdir(cwd)
+        results = [json.loads(line) for line in output.getvalue().splitlines()]
+        self.assertEqual((results[0]["status"], results[0]["reservations"], results[0]["cancellation_rate"]),
+                         ("ok", 3, 0.25))
+        self.assertEqual(results[0]["files"], [f"season_{table}.csv" for table in ("summary", "hours", "peaks",
+                                                                                   "users")])
+        self.assertEqual(results[1]["status"], "error")
+
+    def tearDown(self) -> None:
+        self.directory.cleanup()
@@ -0,0 +1,145 @@
+import os
+import subprocess
+import sys
+import unittest
+from datetime import datetime, timedelta
+from unittest.mock import patch
+
+from tennis_scheduler.reservation.database.backend import BACKENDS, StorageBackend, backend_class, open_backend
+from tennis_scheduler.reservation.database.memory import MemoryDatabase
+from tennis_scheduler.reservation.schedule import Reservations
+
+TEST_DB = "test_backends_db.sqlite"
+
+
+class TestStorageBackends(unittest.TestCase):
+    """ every backend gives the same answers for the same reservations """
+
+    def scenario(self, db) -> list:
+        db.insert("Adam Kowalski", datetime(2050, 1, 3, 12, 0), datetime(2050, 1, 3, 13, 0))
+        db.insert_many([("Jan Nowak", datetime(2050, 1, 3, 8, 0), datetime(2050, 1, 3, 9, 30)),
+                        ("Jan Nowak", datetime(2050, 1, 4, 17, 0), datetime(2050, 1, 4, 18, 30)),
+                        ("Jan Nowak", datetime(2050, 1, 5, 10, 0), datetime(2050, 1, 5, 10, 30), 12)])
+        results = [db.book_if_free("Ewa Lis", datetime(2050, 1, 3, 12, 30), datetime(2050, 1, 3, 13, 30), 1),
+                   db.book_if_free("Ewa Lis", datetime(2050, 1, 3, 13, 0), datetime(2050, 1, 3, 14, 0), 1),
+                   db.check_availability(datetime(2050, 1, 3, 9, 0), datetime(2050, 1, 3, 10, 0), 1),
+                   db.check_availability(datetime(2050, 1, 3, 9, 30), datetime(2050, 1, 3, 10, 0), 1),
+                   db.book_if_free("Ewa Lis", datetime(2050, 1, 3, 12, 0), datetime(2050, 1, 3, 12, 30)),
+                   db.free_court(datetime(2050, 1, 3, 12, 0), datetime(2050, 1, 3, 13, 0)),
+                   db.free_court(datetime(2050, 1, 5, 10, 0), datetime(2050, 1, 5, 10, 30), 12),
+                   db.check_availability(datetime(2050, 1, 3, 9, 0), datetime(2050, 1, 3, 10, 0)),
+                   db.get_reservations(datetime(2050, 1, 3), datetime(2050, 1, 5)),
+                   list(db.iter_reservations(datetime(2050, 1, 3, 9, 0), datetime(2050, 1, 6), chunk_size=2)),
+                   db.check_too_many_reservations("Jan Nowak", datetime(2050, 1, 6, 12, 0)),
+                   db.check_too_many_reservations("Ewa Lis", datetime(2050, 1, 6, 12, 0)),
+                   db.get_reserved_times(datetime(2050, 1, 3, 15, 0)),
+                   db.get_reserved_times_range(datetime(2050, 1, 4), datetime(2050, 1, 5)),
+                   db.get_user_reserved_times("Jan Nowak", datetime(2050, 1, 4, 17, 0)),
+                   db.get_user_reserved_times("Jan Nowak", datetime(2050, 1, 4, 17, 30)),
+                   db.get_free_slots(datetime(2050, 1, 3), datetime(2050, 1, 5)),
+                   db.get_free_slots(datetime(2050, 1, 3), datetime(2050, 1, 5), 12),
+                   db.book_series("Ewa Lis", [(datetime(2050, 1, 3, 12, 0), datetime(2050, 1, 3, 13, 0)),
+                                              (datetime(2050, 1, 10, 12, 0), datetime(2050, 1, 10, 13, 0))], 1),
+                   # the second reservation can't take the court given to the first one
+                   db.book_series("Ewa Lis", [(datetime(2050, 1, 10, 12, 0), datetime(2050, 1, 10, 13, 0)),
+                                              (datetime(2050, 1, 10, 12, 30), datetime(2050, 1, 10, 13, 0))])]
+        db.delete("Jan Nowak", datetime(2050, 1, 4, 17, 0), 2)
+        db.delete("Ewa Lis", datetime(2050, 1, 3, 12, 0))
+        db.delete("Jan Nowak", datetime(2050, 1, 5, 10, 0), 12)
+        results.append(db.get_reservations(datetime(2050, 1, 3), datetime(2050, 1, 6)))
+        results.append(db.check_too_many_reservations("Jan Nowak", datetime(2050, 1, 6, 12, 0)))
+        results.append([tuple(change) for change in db.iter_changes(7, chunk_size=2)])
+        return [tuple(result) if isinstance(result, (list, Reservations)) else result for result in results]
+
+    def test_backends_agree(self) -> None:
+        results = {}
+        for name in BACKENDS:
+            db = open_backend(TEST_DB, name)
+            self.assertIsInstance(db, StorageBackend)
+            results[name] = self.scenario(db)
+            db.close_database()
+            if os.path.exists(TEST_DB):
+                os.remove(TEST_DB)
+        self.assertEqual(results["raw"], results["orm"])
+        self.assertEqual(results["memory"], results["orm"])
+        self.assertEqual(results["memory"][:8], [None, 1, False, True, 2, 3, None, True])
+        self.assertEqual(results["memory"][8][:3],
+                         (("Jan Nowak", datetime(2050, 1, 3, 8, 0), datetime(2050, 1, 3, 9, 30), 1),
+                          ("Adam Kowalski", datetime(2050, 1, 3, 12, 0), datetime(2050, 1, 3, 13, 0), 1),
+                          ("Ewa Lis", datetime(2050, 1, 3, 12, 0), datetime(2050, 1, 3, 12, 30), 2)))
+        self.assertEqual(results["memory"][10:12], [False, True])
+        self.assertEqual(results["memory"][18:20],
+                         [((None, None, "taken"), (1, datetime(2050, 1, 10, 12, 0), None)),
+                          ((2, datetime(2050, 1, 10, 12, 0), None), (3, datetime(2050, 1, 10, 12, 30), None))])
+        # the delete on the wrong court kept the reservation
+        self.assertEqual(len(results["memory"][-3]), 4)
+        # 4 inserts, 2 + 2 booked, then the deletes
+        self.assertEqual([change[:3] for change in results["memory"][-1]],
+                         [(8, "add", "Ewa Lis"), (9, "add", "Ewa Lis"), (10, "cancel", "Ewa Lis"),
+                          (11, "cancel", "Jan Nowak")])
+
+    def test_book_series_week_limit_and_fallback(self) -> None:
+        for name in BACKENDS:
+            db = open_backend(TEST_DB, name)
+            db.insert_many([("Ewa Lis", datetime(2050, 1, day, 8, 0), datetime(2050, 1, day, 9, 0), 2)
+                            for day in (3, 4, 5)])
+            db.insert("Jan Nowak", datetime(2050, 1, 10, 12, 0), datetime(2050, 1, 10, 13, 0), 1)
+            # the week of 03.01 is full, 12:00 of 10.01 is taken -> 11:00 wins the tie with 13:00
+            self.assertEqual(db.book_series("Ewa Lis", [(datetime(2050, 1, 6, 12, 0), datetime(2050, 1, 6, 13, 0)),
+                                                        (datetime(2050, 1, 10, 12, 0), datetime(2050, 1, 10, 13, 0)),
+                                                        (datetime(2050, 1, 17, 12, 0), datetime(2050, 1, 17, 13, 0))],
+                                            1, 2, datetime(2050, 1, 6, 8, 0)),
+                             [(None, None, "week_full"), (1, datetime(2050, 1, 10, 11, 0), None),
+                              (1, datetime(2050, 1, 17, 12, 0), None)], name)
+            # nothing before fallback_from on its day
+            self.assertEqual(db.book_series("Marek Lis", [(datetime(2050, 1, 10, 12, 0), datetime(2050, 1, 10, 13, 0))],
+                                            1, 2, datetime(2050, 1, 10, 13, 30)),
+                             [(1, datetime(2050, 1, 10, 13, 30), None)], name)
+            self.assertEqual([row[1:] for row in db.get_reservations(datetime(2050, 1, 10), datetime(2050, 1, 11))],
+                             [(datetime(2050, 1, 10, 11, 0), datetime(2050, 1, 10, 12, 0), 1),
+                              (datetime(2050, 1, 10, 12, 0), datetime(2050, 1, 10, 13, 0), 1),
+                              (datetime(2050, 1, 10, 13, 30), datetime(2050, 1, 10, 14, 30), 1)], name)
+            db.close_database()
+            if os.path.exists(TEST_DB):
+                os.remove(TEST_DB)
+
+    def test_book_many(self) -> None:
+        reservations = [("Jan Nowak", datetime(2050, 1, 3, 12, 0), datetime(2050, 1, 3, 13, 0), 1),
+                        # taken by the row before
+                        ("Ewa Lis", datetime(2050, 1, 3, 12, 30), datetime(2050, 1, 3, 13, 0), 1),
+                        ("Ewa Lis", datetime(2050, 1, 3, 12, 30), datetime(2050, 1, 3, 13, 0), None),
+                        ("Adam Kowalski", datetime(2050, 1, 9, 8, 0), datetime(2050, 1, 9, 9, 0), 12)]
+        for name in BACKENDS:
+            db = open_backend(TEST_DB, name)
+            self.assertEqual(db.book_many(reservations), [1, None, 2, 12], name)
+            self.assertEqual(db.book_many([]), [], name)
+            self.assertEqual(len(db.get_reservations(datetime(2050, 1, 3), datetime(2050, 1, 10))), 3, name)
+            db.close_database()
+            if os.path.exists(TEST_DB):
+                os.remove(TEST_DB)
+
+    def test_memory_backend_writes_nothing(self) -> None:
+        db = MemoryDatabase(TEST_DB)
+        db.insert("Adam Kowalski", datetime(2050, 1, 3, 12, 0), datetime(2050, 1, 3, 13, 0))
+        self.assertFalse(os.path.exists(TEST_DB))
+        # times within the next hour can't be booked anymore
+        soon = datetime.now().replace(second=0, microsecond=0) + timedelta(minutes=30)
+        db.insert("Adam Kowalski", soon, soon + timedelta(minutes=30))
+        self.assertEqual(db.get_reserved_times(soon), [])
+
+    def test_backend_selection(self) -> None:
+        self.assertEqual(backend_class("memory"), MemoryDatabase)
+        with patch.dict(os.environ, {"TENNIS_SCHEDULER_BACKEND": "memory"}):
+            self.assertEqual(backend_class(), MemoryDatabase)
+            self.assertEqual(backend_class("raw").__name__, "Database")
+        with self.assertRaises(ValueError):
+            backend_class("postgres")
+
+    def test_sqlalchemy_is_imported_lazily(self) -> None:
+        code = ("import sys\n"
+                "from tennis_scheduler.reservation.reservation_handler import ReservationHandler\n"
+                "from tennis_scheduler.reservation import batch, metrics\n"
+                "ReservationHandler('unused', 'memory')\n"
+                "print('sqlalchemy' in sys.modules)")
+        result = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True)
+        self.assertEqual(result.stdout.strip(), "False")
@@ -0,0 +1,113 @@
+import io
+import json
+import os
+import sqlite3
+import unittest
+from unittest.mock import patch
+
+from tennis_scheduler.reservation.batch import CommandRunner
+from tennis_scheduler.reservation.reservation_validator import Validator
+
+TEST_DB = "test_batch_db.sqlite"
+
+
+class TestCommandRunner(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.validator = Validator(TEST_DB)
+        self.runner = CommandRunner(self.validator)
+
+    def run_commands(self, *commands) -> list:
+        output = io.StringIO()
+        with patch("os.system") as system:
+            self.runner.run([json.dumps(command) if isinstance(command, dict) else command
+                             for command in commands], output)
+        system.assert_not_called()
+        return [json.loads(line) for line in output.getvalue().splitlines()]
+
+    def test_reserve_and_cancel(self) -> None:
+        results = self.run_commands(
+            {"command": "reserve", "name": "John Smith", "date": "10.07.2050 15:30", "duration": 60, "id": "a"},
+            {"command": "reserve", "name": "Jan Nowak", "date": "10.07.2050 16:00", "duration": 30, "court": 1},
+            {"command": "reserve", "name": "Jan Nowak", "date": "10.07.2050 16:00", "duration": 30, "court": 1,
+             "accept_closest": True},
+            {"command": "reserve", "name": "Ewa Lis", "date": "10.07.2050 16:00", "duration": 30},
+            {"command": "cancel", "name": "John Smith", "date": "10.07.2050 15:30"},
+            {"command": "schedule", "start": "10.07.2050", "end": "11.07.2050"},
+            {"command": "closest", "date": "10.07.2050 16:30", "duration": 90, "count": 2},
+            {"command": "closest", "date": "10.07.2050 16:00", "duration": 90, "count": 2, "court": 2})
+        self.assertEqual(results[0], {"status": "ok", "id": "a",
+                                      "reservation": {"name": "John Smith", "start_time": "10.07.2050 15:30",
+                                                      "end_time": "10.07.2050 16:30", "court": 1}})
+        # the same time on the next court is the closest one
+        self.assertEqual(results[1], {"status": "unavailable", "closest": "10.07.2050 16:00", "court": 2})
+        self.assertEqual((results[2]["reservation"]["start_time"], results[2]["reservation"]["court"]),
+                         ("10.07.2050 16:00", 2))
+        self.assertEqual(results[3]["reservation"]["court"], 3)
+        self.assertEqual(results[4], {"status": "ok"})
+        self.assertEqual(results[5], {"status": "ok",
+                                      "reservations": [{"name": "Jan Nowak", "start_time": "10.07.2050 16:00",
+                                                        "end_time": "10.07.2050 16:30", "court": 2},
+                                                       {"name": "Ewa Lis", "start_time": "10.07.2050 16:00",
+                                                        "end_time": "10.07.2050 16:30", "court": 3}]})
+        self.assertEqual(results[6], {"status": "ok", "times": ["10.07.2050 16:30", "10.07.2050 16:00"],
+                                      "courts": [1, 1]})
+        self.assertEqual(results[7], {"status": "ok", "times": ["10.07.2050 16:30", "10.07.2050 17:00"],
+                                      "courts": [2, 2]})
+
+    def test_series(self) -> None:
+        results = self.run_commands(
+            {"command": "reserve", "name": "Jan Nowak", "date": "17.07.2050 15:30", "duration": 30, "court": 3},
+            {"command": "series", "name": "John Smith", "date": "10.07.2050 15:30", "duration": 60,
+             "repeat": "weekly", "until": "31.07.2050", "court": 3},
+            {"command": "series", "name": "Ewa Lis", "date": "10.07.2050 15:30", "duration": 60,
+             "repeat": "biweekly", "until": "24.07.2050", "court": 3, "fallback": True},
+            {"command": "series", "name": "Ewa Lis", "date": "10.07.2050 15:30", "duration": 60,
+             "repeat": "daily", "until": "24.07.2050"})
+        self.assertEqual([reservation["start_time"] for reservation in results[1]["reservations"]],
+                         ["10.07.2050 15:30", "24.07.2050 15:30", "31.07.2050 15:30"])
+        self.assertEqual(results[1]["not_booked"], [{"date": "17.07.2050 15:30", "reason": "already booked"}])
+        self.assertEqual([(reservation["start_time"], reservation["court"])
+                          for reservation in results[2]["reservations"]],
+                         [("10.07.2050 14:30", 3), ("24.07.2050 14:30", 3)])
+        self.assertEqual(results[3]["status"], "error")
+        self.assertIn("Invalid repeat", results[3]["message"])
+
+    def test_errors(self) -> None:
+        results = self.run_commands(
+            "not json",
+            {"command": "fly"},
+            {"command": "reserve", "name": "john smith", "date": "10.07.2050 15:30", "duration": 60},
+            {"command": "reserve", "name": "John Smith", "date": "10.07.2050 15:31", "duration": 60},
+            {"command": "reserve", "name": "John Smith", "date": "10.07.2050 15:30", "duration": 45},
+            {"command": "reserve", "name": "John Smith", "date": "10.07.2050 19:00", "duration": 30},
+            {"command": "reserve", "name": "John Smith", "date": "10.07.2050 15:30", "duration": 30, "court": 13},
+            {"command": "cancel", "name": "John Smith", "date": "10.07.2050 15:30"},
+            {"command": "export", "start": "10.07.2050", "end": "11.07.2050", "format": "txt", "filename": "x"},
+            # unhashable, not looked up in the booking options
+            {"command": "reserve", "name": "John Smith", "date": "10.07.2050 15:30", "duration": [60]},
+            {"command": "closest", "date": "10.07.2050 15:30", "duration": {"minutes": 60}})
+        self.assertEqual([result["status"] for result in results], ["error"] * len(results))
+        self.assertIn("Invalid name", results[2]["message"])
+        self.assertIn("Minutes must be :00 or :30", results[3]["message"])
+        self.assertIn("30, 60 or 90", results[4]["message"])
+        self.assertIn("Your time must be", results[5]["message"])
+        self.assertIn("Invalid court", results[6]["message"])
+        self.assertIn("no reservation on specified date", results[7]["message"])
+        self.assertIn("Invalid extension", results[8]["message"])
+        self.assertIn("30, 60 or 90", results[9]["message"])
+        self.assertIn("30, 60 or 90", results[10]["message"])
+
+    def test_unexpected_error(self) -> None:
+        with patch.object(self.validator._database, "book_if_free", side_effect=sqlite3.OperationalError("locked")):
+            results = self.run_commands(
+                {"command": "reserve", "name": "John Smith", "date": "10.07.2050 15:30", "duration": 60, "id": 1},
+                {"command": "closest", "date": "10.07.2050 15:30", "duration": 60})
+        # the run goes on after a failed command
+        self.assertEqual(results[0], {"status": "error", "message": "Command failed -> OperationalError: locked",
+                                      "id": 1})
+        self.assertEqual(results[1]["status"], "ok")
+
+    def tearDown(self) -> None:
+        self.validator._database.close_database()
+        os.remove(TEST_DB)
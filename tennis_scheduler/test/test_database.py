@@ -0,0 +1,677 @@
+import multiprocessing
+import os
+import random
+import sqlite3
+import time
+import unittest
+from datetime import date, datetime, timedelta
+from unittest.mock import patch
+
+from sqlalchemy import event, exc
+
+from tennis_scheduler.reservation import slots
+from tennis_scheduler.reservation.database import schema, migrate, archive
+from tennis_scheduler.reservation.database.cache import ScheduleCache
+from tennis_scheduler.reservation.database.database_orm import DatabaseORM
+from tennis_scheduler.reservation.database.database import Database
+
+TEST_DB = "test_schema_db.sqlite"
+
+
+class TestSchema(unittest.TestCase):
+
+    def setUp(self) -> None:
+        if os.path.exists(TEST_DB):
+            os.remove(TEST_DB)
+
+    def test_migrate_legacy_file(self) -> None:
+        conn = sqlite3.connect(TEST_DB)
+        conn.execute("CREATE TABLE clients (name TEXT, start_time DATE, end_time DATE)")
+        conn.execute("INSERT INTO clients VALUES ('Adam Kowalski', '2050-01-01 12:00:00', '2050-01-01 13:00:00')")
+        conn.execute("INSERT INTO clients VALUES ('Jan Nowak', '2050-01-01 13:00:00', '2050-01-01 14:00:00')")
+        conn.commit()
+        conn.close()
+
+        db = Database(TEST_DB)
+        self.assertEqual(db.get_reservations(datetime(2050, 1, 1), datetime(2050, 1, 2)),
+                         [("Adam Kowalski", datetime(2050, 1, 1, 12, 0), datetime(2050, 1, 1, 13, 0), 1),
+                          ("Jan Nowak", datetime(2050, 1, 1, 13, 0), datetime(2050, 1, 1, 14, 0), 1)])
+
+        conn = sqlite3.connect(TEST_DB)
+        self.assertEqual(schema.get_schema_version(conn), schema.SCHEMA_VERSION)
+        self.assertEqual([row[1] for row in conn.execute("PRAGMA table_info(clients)")],
+                         ["id", "name", "start_time", "end_time", "court"])
+        self.assertEqual(conn.execute("SELECT id, name FROM clients ORDER BY id").fetchall(),
+                         [(1, "Adam Kowalski"), (2, "Jan Nowak")])
+        conn.close()
+        # the reservations already in the file are the first changes
+        self.assertEqual([change[:3] for change in db.iter_changes()], [(1, "add", "Adam Kowalski"),
+                                                                       (2, "add", "Jan Nowak")])
+        db.close_database()
+
+    def test_migrate_single_court_file(self) -> None:
+        conn = sqlite3.connect(TEST_DB)
+        with patch.object(schema, "SCHEMA_VERSION", 3):
+            schema.migrate(conn)
+        conn.execute("INSERT INTO clients (name, start_time, end_time) "
+                     "VALUES ('Adam Kowalski', '2050-01-01 12:00:00', '2050-01-01 13:00:00')")
+        conn.commit()
+        conn.close()
+
+        db = Database(TEST_DB)
+        self.assertEqual(db.get_reservations(datetime(2050, 1, 1), datetime(2050, 1, 2)),
+                         [("Adam Kowalski", datetime(2050, 1, 1, 12, 0), datetime(2050, 1, 1, 13, 0), 1)])
+        # the cells claimed before the migration still block court 1 only
+        self.assertIsNone(db.book_if_free("Jan Nowak", datetime(2050, 1, 1, 12, 30), datetime(2050, 1, 1, 13, 0), 1))
+        self.assertEqual(db.book_if_free("Jan Nowak", datetime(2050, 1, 1, 12, 30), datetime(2050, 1, 1, 13, 0)), 2)
+        db.close_database()
+
+        conn = sqlite3.connect(TEST_DB)
+        self.assertEqual(sorted(row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'index' "
+                                                               "AND name LIKE 'idx_clients_%'")),
+                         ["idx_clients_court_start", "idx_clients_name_start", "idx_clients_start_court"])
+        self.assertEqual(conn.execute("SELECT court, day, slot_index FROM slots ORDER BY court, slot_index").fetchall(),
+                         [(1, 29220, 8), (1, 29220, 9), (2, 29220, 9)])
+        conn.close()
+
+    def test_migrate_is_idempotent(self) -> None:
+        Database(TEST_DB).insert("Adam Kowalski", datetime(2050, 1, 1, 12, 0), datetime(2050, 1, 1, 13, 0))
+        db = DatabaseORM(TEST_DB)
+        self.assertFalse(db.check_availability(datetime(2050, 1, 1, 12, 30), datetime(2050, 1, 1, 13, 30), 1))
+        db.close_database()
+
+    def test_migrate_orm_times(self) -> None:
+        conn = sqlite3.connect(TEST_DB)
+        with patch.object(schema, "SCHEMA_VERSION", 5):
+            schema.migrate(conn)
+        # how DateTime columns stored the times before
+        conn.execute("INSERT INTO clients (name, start_time, end_time, court) "
+                     "VALUES ('Adam Kowalski', '2050-01-01 12:00:00.000000', '2050-01-01 13:00:00.000000', 2)")
+        conn.commit()
+        conn.close()
+
+        db = Database(TEST_DB)
+        self.assertEqual(db.get_reservations(datetime(2050, 1, 1), datetime(2050, 1, 2)),
+                         [("Adam Kowalski", datetime(2050, 1, 1, 12, 0), datetime(2050, 1, 1, 13, 0), 2)])
+        self.assertEqual(db.get_user_reserved_times("Adam Kowalski", datetime(2050, 1, 1, 12, 0)),
+                         datetime(2050, 1, 1, 12, 0))
+        db.close_database()
+        conn = sqlite3.connect(TEST_DB)
+        for table in ("clients", "changes"):
+            self.assertEqual(conn.execute(f"SELECT start_time, end_time FROM {table}").fetchall(),
+                             [("2050-01-01 12:00:00", "2050-01-01 13:00:00")])
+        conn.close()
+
+    def test_backends_read_each_other(self) -> None:
+        reservation = ("Adam Kowalski", datetime(2050, 1, 1, 12, 0), datetime(2050, 1, 1, 13, 0), 3)
+        for writer, reader in ((DatabaseORM, Database), (Database, DatabaseORM)):
+            written, read = writer(TEST_DB, cache_size=0), reader(TEST_DB, cache_size=0)
+            written.insert(*reservation)
+            self.assertEqual(read.get_reservations(datetime(2050, 1, 1), datetime(2050, 1, 2)), [reservation])
+            self.assertEqual(list(read.iter_reservations(datetime(2050, 1, 1), datetime(2050, 1, 2))), [reservation])
+            self.assertEqual([change[1:] for change in read.iter_changes()], [("add", *reservation)])
+            self.assertEqual(read.get_user_reserved_times(*reservation[:2]), reservation[1])
+            read.delete(*reservation[:2])
+            self.assertEqual(written.get_reservations(datetime(2050, 1, 1), datetime(2050, 1, 2)), [])
+            self.assertEqual([change[1] for change in written.iter_changes()], ["add", "cancel"])
+            written.close_database()
+            read.close_database()
+            os.remove(TEST_DB)
+
+    def tearDown(self) -> None:
+        if os.path.exists(TEST_DB):
+            os.remove(TEST_DB)
+
+
+class TestDatabaseConnection(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.db = Database(TEST_DB)
+
+    def test_connection_is_reused(self) -> None:
+        with patch("sqlite3.connect") as connect:
+            self.db.insert("Adam Kowalski", datetime(2050, 1, 1, 12, 0), datetime(2050, 1, 1, 13, 0))
+            self.assertFalse(self.db.check_availability(datetime(2050, 1, 1, 12, 0), datetime(2050, 1, 1, 12, 30), 1))
+            self.db.delete("Adam Kowalski", datetime(2050, 1, 1, 12, 0))
+        connect.assert_not_called()
+
+    def test_orm_pool_is_reused(self) -> None:
+        db = DatabaseORM(TEST_DB, cache_size=0)
+        connects = []
+        event.listen(db.engine, "connect", lambda *args: connects.append(args))
+        for _ in range(3):
+            db.insert("Adam Kowalski", datetime(2050, 1, 1, 12, 0), datetime(2050, 1, 1, 13, 0))
+            db.check_availability(datetime(2050, 1, 1, 12, 0), datetime(2050, 1, 1, 12, 30))
+            db.get_reservations(datetime(2050, 1, 1), datetime(2050, 1, 2))
+            db.delete("Adam Kowalski", datetime(2050, 1, 1, 12, 0))
+        db.close_database()
+        self.assertLessEqual(len(connects), 1)
+
+    def test_transaction_rollback(self) -> None:
+        with self.assertRaises(ValueError):
+            with self.db.transaction():
+                self.db.insert("Adam Kowalski", datetime(2050, 1, 1, 12, 0), datetime(2050, 1, 1, 13, 0))
+                raise ValueError
+        self.assertTrue(self.db.check_availability(datetime(2050, 1, 1, 12, 0), datetime(2050, 1, 1, 13, 0)))
+
+    def test_transaction_commit(self) -> None:
+        with self.db.transaction("IMMEDIATE"):
+            self.db.insert("Adam Kowalski", datetime(2050, 1, 1, 12, 0), datetime(2050, 1, 1, 13, 0))
+            self.db.insert("Jan Nowak", datetime(2050, 1, 1, 13, 0), datetime(2050, 1, 1, 14, 0))
+        self.db.close_database()
+        self.db = Database(TEST_DB)
+        self.assertEqual(len(self.db.get_reservations(datetime(2050, 1, 1), datetime(2050, 1, 2))), 2)
+
+    def tearDown(self) -> None:
+        self.db.close_database()
+        os.remove(TEST_DB)
+
+
+class TestSlotGrid(unittest.TestCase):
+
+    def setUp(self) -> None:
+        if os.path.exists(TEST_DB):
+            os.remove(TEST_DB)
+
+    def cells(self) -> list:
+        conn = sqlite3.connect(TEST_DB)
+        cells = conn.execute("SELECT day, slot_index, reservation_id FROM slots ORDER BY day, slot_index").fetchall()
+        conn.close()
+        return cells
+
+    def test_migration_fills_slots(self) -> None:
+        conn = sqlite3.connect(TEST_DB)
+        conn.execute("CREATE TABLE clients (name TEXT, start_time DATE, end_time DATE)")
+        conn.executemany("INSERT INTO clients VALUES (?, ?, ?)",
+                         [("Adam Kowalski", "2050-01-01 08:00:00", "2050-01-01 09:00:00"),
+                          ("Jan Nowak", "2050-01-01 08:30:00", "2050-01-01 09:30:00"),
+                          ("Ewa Lis", "2050-01-02 17:30:00.000000", "2050-01-02 18:30:00.000000")])
+        conn.commit()
+        conn.close()
+        Database(TEST_DB).close_database()
+        # the overlapping row only gets the cell nobody claimed before
+        self.assertEqual(self.cells(), [(29220, 0, 1), (29220, 1, 1), (29220, 2, 2), (29221, 19, 3), (29221, 20, 3)])
+
+    def test_overlaps_are_rejected(self) -> None:
+        for backend, error in ((Database, sqlite3.IntegrityError), (DatabaseORM, exc.IntegrityError)):
+            db = backend(TEST_DB)
+            db.insert("Adam Kowalski", datetime(2050, 1, 1, 12, 0), datetime(2050, 1, 1, 13, 0))
+            with self.assertRaises(error):
+                db.insert("Jan Nowak", datetime(2050, 1, 1, 12, 30), datetime(2050, 1, 1, 13, 30))
+            self.assertEqual(len(db.get_reservations(datetime(2050, 1, 1), datetime(2050, 1, 2))), 1)
+            self.assertFalse(db.check_availability(datetime(2050, 1, 1, 12, 30), datetime(2050, 1, 1, 13, 30), 1))
+            self.assertEqual(db.get_free_slots(datetime(2050, 1, 1), datetime(2050, 1, 1), 1),
+                             slots.FULL_DAY & ~slots.range_mask(8, 10))
+            db.delete("Adam Kowalski", datetime(2050, 1, 1, 12, 0))
+            self.assertEqual(self.cells(), [])
+            db.close_database()
+            os.remove(TEST_DB)
+
+    def test_courts_claim_their_own_cells(self) -> None:
+        for backend in (Database, DatabaseORM):
+            db = backend(TEST_DB)
+            db.insert("Adam Kowalski", datetime(2050, 1, 1, 12, 0), datetime(2050, 1, 1, 13, 0), 3)
+            db.insert("Jan Nowak", datetime(2050, 1, 1, 12, 0), datetime(2050, 1, 1, 13, 0), 12)
+            self.assertEqual(db.free_court(datetime(2050, 1, 1, 12, 30), datetime(2050, 1, 1, 13, 0), 3), None)
+            self.assertEqual(db.free_court(datetime(2050, 1, 1, 12, 30), datetime(2050, 1, 1, 13, 0)), 1)
+            # off the half-hour grid -> the reservations themselves are checked
+            self.assertEqual(db.free_court(datetime(2050, 1, 1, 12, 45), datetime(2050, 1, 1, 13, 15), 12), None)
+            free = db.get_free_slots(datetime(2050, 1, 1), datetime(2050, 1, 2))
+            self.assertEqual(slots.court_mask(free, 2, 3), slots.every_court(slots.FULL_DAY, 1, 2)
+                             & ~slots.range_mask(8, 10))
+            self.assertEqual(slots.court_mask(free, 2, 12), slots.court_mask(free, 2, 3))
+            self.assertEqual(slots.court_mask(free, 2, 1), slots.every_court(slots.FULL_DAY, 1, 2))
+            self.assertEqual(db.get_free_slots(datetime(2050, 1, 1), datetime(2050, 1, 2), 3),
+                             slots.court_mask(free, 2, 3))
+            db.delete("Jan Nowak", datetime(2050, 1, 1, 12, 0), 3)
+            db.delete("Adam Kowalski", datetime(2050, 1, 1, 12, 0), 3)
+            self.assertEqual(db.get_reservations(datetime(2050, 1, 1), datetime(2050, 1, 2)),
+                             [("Jan Nowak", datetime(2050, 1, 1, 12, 0), datetime(2050, 1, 1, 13, 0), 12)])
+            db.close_database()
+            os.remove(TEST_DB)
+
+    def test_epoch_times_claim_the_same_cells(self) -> None:
+        db = Database(TEST_DB, time_format="epoch")
+        db.insert("Adam Kowalski", datetime(2050, 1, 1, 12, 0), datetime(2050, 1, 1, 13, 0))
+        db.close_database()
+        with patch("builtins.print"):
+            migrate.main([TEST_DB, "--time-format", "text"])
+        db = Database(TEST_DB)
+        db.insert("Jan Nowak", datetime(2050, 1, 1, 13, 0), datetime(2050, 1, 1, 13, 30))
+        db.close_database()
+        self.assertEqual(self.cells(), [(29220, 8, 1), (29220, 9, 1), (29220, 10, 2)])
+
+    def tearDown(self) -> None:
+        if os.path.exists(TEST_DB):
+            os.remove(TEST_DB)
+
+
+class TestTimeFormat(unittest.TestCase):
+
+    def setUp(self) -> None:
+        if os.path.exists(TEST_DB):
+            os.remove(TEST_DB)
+
+    def fill(self, db) -> None:
+        db.insert("Adam Kowalski", datetime(2050, 1, 1, 12, 0), datetime(2050, 1, 1, 13, 0))
+        db.insert_many([("Jan Nowak", datetime(2050, 1, 2, 8, 0), datetime(2050, 1, 2, 9, 30)),
+                        ("Jan Nowak", datetime(2050, 1, 3, 17, 30), datetime(2050, 1, 3, 18, 0))])
+
+    def assertReservations(self, db) -> None:
+        self.assertEqual(db.get_reservations(datetime(2050, 1, 1), datetime(2050, 1, 4)),
+                         [("Adam Kowalski", datetime(2050, 1, 1, 12, 0), datetime(2050, 1, 1, 13, 0), 1),
+                          ("Jan Nowak", datetime(2050, 1, 2, 8, 0), datetime(2050, 1, 2, 9, 30), 1),
+                          ("Jan Nowak", datetime(2050, 1, 3, 17, 30), datetime(2050, 1, 3, 18, 0), 1)])
+
+    def test_epoch_minutes(self) -> None:
+        db = Database(TEST_DB, cache_size=0, time_format="epoch")
+        self.fill(db)
+        self.assertReservations(db)
+        self.assertEqual(list(db.iter_reservations(datetime(2050, 1, 2), datetime(2050, 1, 4), chunk_size=1)),
+                         db.get_reservations(datetime(2050, 1, 2), datetime(2050, 1, 4)))
+        self.assertFalse(db.check_availability(datetime(2050, 1, 2, 9, 0), datetime(2050, 1, 2, 10, 0), 1))
+        self.assertTrue(db.check_availability(datetime(2050, 1, 2, 9, 30), datetime(2050, 1, 2, 10, 0), 1))
+        self.assertEqual(db.get_user_reserved_times("Jan Nowak", datetime(2050, 1, 2, 8, 0)),
+                         datetime(2050, 1, 2, 8, 0))
+        self.assertTrue(db.check_too_many_reservations("Jan Nowak", datetime(2050, 1, 5, 12, 0)))
+        db.delete("Jan Nowak", datetime(2050, 1, 2, 8, 0))
+        self.assertEqual(db.get_user_reserved_times("Jan Nowak", datetime(2050, 1, 2, 8, 0)), [])
+        db.close_database()
+
+        conn = sqlite3.connect(TEST_DB)
+        # 2050-01-01 -> day 29220 since the epoch
+        self.assertEqual(conn.execute("SELECT start_time, end_time FROM clients ORDER BY id").fetchall(),
+                         [(29220 * 1440 + 720, 29220 * 1440 + 780), (29222 * 1440 + 1050, 29222 * 1440 + 1080)])
+        conn.close()
+        # the file keeps its format when it is opened again
+        db = Database(TEST_DB)
+        self.assertEqual(db.time_format, "epoch")
+        db.close_database()
+        with self.assertRaises(ValueError):
+            DatabaseORM(TEST_DB)
+
+    def test_convert_existing_file(self) -> None:
+        db = Database(TEST_DB)
+        self.fill(db)
+        db.close_database()
+        with self.assertRaises(ValueError):
+            Database(TEST_DB, time_format="epoch")
+
+        with patch("builtins.print"):
+            self.assertEqual(migrate.main([TEST_DB, "--time-format", "epoch"]), 0)
+        db = Database(TEST_DB, cache_size=0)
+        self.assertEqual(db.time_format, "epoch")
+        self.assertReservations(db)
+        # the change log is converted with the reservations
+        self.assertEqual(list(db.iter_changes(2)),
+                         [(3, "add", "Jan Nowak", datetime(2050, 1, 3, 17, 30), datetime(2050, 1, 3, 18, 0), 1)])
+        db.close_database()
+
+        with patch("builtins.print"):
+            self.assertEqual(migrate.main([TEST_DB, "--time-format", "text"]), 0)
+        db = DatabaseORM(TEST_DB, cache_size=0)
+        self.assertReservations(db)
+        db.close_database()
+
+    def tearDown(self) -> None:
+        if os.path.exists(TEST_DB):
+            os.remove(TEST_DB)
+
+
+class TestArchive(unittest.TestCase):
+    ROWS = [("Adam Kowalski", datetime(2048, 6, 1, 10, 0), datetime(2048, 6, 1, 11, 0), 1),
+            ("Jan Nowak", datetime(2048, 12, 31, 20, 0), datetime(2048, 12, 31, 21, 0), 2),
+            ("Jan Nowak", datetime(2049, 3, 1, 8, 0), datetime(2049, 3, 1, 9, 30), 1),
+            ("Adam Kowalski", datetime(2049, 12, 31, 17, 0), datetime(2049, 12, 31, 18, 0), 1),
+            ("Jan Nowak", datetime(2050, 1, 2, 12, 0), datetime(2050, 1, 2, 13, 0), 1),
+            ("Adam Kowalski", datetime(2050, 1, 2, 12, 0), datetime(2050, 1, 2, 12, 30), 3)]
+
+    def setUp(self) -> None:
+        if os.path.exists(TEST_DB):
+            os.remove(TEST_DB)
+
+    def archive(self, *argv) -> None:
+        with patch("builtins.print"):
+            self.assertEqual(archive.main([TEST_DB, "--before", "2050-01-01", *argv]), 0)
+
+    def assertUnified(self, backend) -> None:
+        db = backend(TEST_DB, cache_size=0)
+        self.assertEqual(db.get_reservations(datetime(2048, 1, 1), datetime(2051, 1, 1)), self.ROWS)
+        self.assertEqual(list(db.iter_reservations(datetime(2048, 1, 1), datetime(2051, 1, 1), chunk_size=1)),
+                         self.ROWS)
+        self.assertEqual(db.get_reservations(datetime(2048, 12, 31), datetime(2049, 3, 2)), self.ROWS[1:3])
+        self.assertEqual(list(db.iter_reservations(datetime(2049, 12, 31), datetime(2050, 1, 3))), self.ROWS[3:])
+        self.assertEqual(db.get_reservations(datetime(2050, 1, 1), datetime(2050, 1, 3)), self.ROWS[4:])
+        db.close_database()
+
+    def test_archive_moves_past_reservations(self) -> None:
+        db = Database(TEST_DB)
+        db.insert_many(self.ROWS)
+        db.close_database()
+        self.archive("--batch-size", "1")
+
+        conn = sqlite3.connect(TEST_DB)
+        self.assertEqual(schema.get_archive_tables(conn), ["clients_archive_2048", "clients_archive_2049"])
+        self.assertEqual(schema.get_archived_before(conn), datetime(2050, 1, 1))
+        self.assertEqual(conn.execute("SELECT COUNT(*) FROM clients").fetchone()[0], 2)
+        self.assertEqual(conn.execute("SELECT COUNT(*) FROM clients_archive_2049").fetchone()[0], 2)
+        # the cells of the archived days are released, archiving is not logged as cancellations
+        self.assertEqual(conn.execute("SELECT DISTINCT day FROM slots").fetchall(), [(slots.day_number(
+            datetime(2050, 1, 2)),)])
+        self.assertEqual(conn.execute("SELECT DISTINCT operation FROM changes").fetchall(), [("add",)])
+        conn.close()
+        for backend in (Database, DatabaseORM):
+            self.assertUnified(backend)
+
+        # nothing left to move, a reservation booked into the archived past is merged in order
+        self.archive()
+        db = Database(TEST_DB, cache_size=0)
+        late = ("Adam Kowalski", datetime(2049, 3, 1, 10, 0), datetime(2049, 3, 1, 11, 0), 1)
+        db.insert(*late)
+        self.assertEqual(list(db.iter_reservations(datetime(2049, 1, 1), datetime(2049, 6, 1))),
+                         [self.ROWS[2], late])
+        db.close_database()
+
+    def test_archive_epoch_file(self) -> None:
+        db = Database(TEST_DB, time_format="epoch")
+        db.insert_many(self.ROWS)
+        db.close_database()
+        self.archive()
+        self.assertUnified(Database)
+        # archived rows are converted with the others
+        with patch("builtins.print"):
+            self.assertEqual(migrate.main([TEST_DB, "--time-format", "text"]), 0)
+        self.assertUnified(DatabaseORM)
+
+    def tearDown(self) -> None:
+        if os.path.exists(TEST_DB):
+            os.remove(TEST_DB)
+
+
+class TestReplica(unittest.TestCase):
+    MONDAY = datetime(2050, 1, 3)
+
+    def setUp(self) -> None:
+        if os.path.exists(TEST_DB):
+            os.remove(TEST_DB)
+        # another process writing the same file
+        self.other = Database(TEST_DB, cache_size=0)
+        self.other.insert("Adam Kowalski", datetime(2050, 1, 3, 8, 0), datetime(2050, 1, 3, 9, 0))
+
+    def names(self, db) -> list:
+        return [reservation.name for reservation in db.get_reservations(self.MONDAY, self.MONDAY + timedelta(days=1))]
+
+    def test_reads_follow_own_writes(self) -> None:
+        db = Database(TEST_DB, cache_size=0, replica=True)
+        self.other.insert("Jan Nowak", datetime(2050, 1, 3, 9, 0), datetime(2050, 1, 3, 10, 0))
+        # the copy was made before, the file isn't read
+        self.assertEqual(self.names(db), ["Adam Kowalski"])
+        self.assertTrue(db.check_availability(datetime(2050, 1, 3, 9, 0), datetime(2050, 1, 3, 10, 0), 1))
+
+        # a write of its own replays everything logged since, in the order of the file
+        db.insert("Ewa Lis", datetime(2050, 1, 3, 10, 0), datetime(2050, 1, 3, 11, 0))
+        self.assertEqual(self.names(db), ["Adam Kowalski", "Jan Nowak", "Ewa Lis"])
+        self.assertFalse(db.check_availability(datetime(2050, 1, 3, 9, 0), datetime(2050, 1, 3, 10, 0), 1))
+        db.delete("Adam Kowalski", datetime(2050, 1, 3, 8, 0))
+        self.assertEqual(self.names(db), ["Jan Nowak", "Ewa Lis"])
+        self.assertEqual(list(db.iter_changes()), list(self.other.iter_changes()))
+        self.assertEqual(db.get_free_slots(self.MONDAY, self.MONDAY, 1),
+                         self.other.get_free_slots(self.MONDAY, self.MONDAY, 1))
+
+        # inside a transaction reads see its uncommitted rows in the file
+        with db.transaction("IMMEDIATE"):
+            db.insert("Adam Kowalski", datetime(2050, 1, 3, 12, 0), datetime(2050, 1, 3, 13, 0))
+            self.assertEqual(db.free_court(datetime(2050, 1, 3, 12, 0), datetime(2050, 1, 3, 12, 30)), 2)
+        self.assertEqual(db.free_court(datetime(2050, 1, 3, 12, 0), datetime(2050, 1, 3, 12, 30)), 2)
+        db.close_database()
+
+    def test_refresh(self) -> None:
+        db = Database(TEST_DB, cache_size=4, replica=True, refresh_interval=0.05)
+        self.assertEqual(self.names(db), ["Adam Kowalski"])
+        self.other.insert("Jan Nowak", datetime(2050, 1, 3, 9, 0), datetime(2050, 1, 3, 10, 0))
+        for _ in range(100):
+            if len(self.names(db)) == 2:
+                break
+            time.sleep(0.05)
+        self.assertEqual(self.names(db), ["Adam Kowalski", "Jan Nowak"])
+        db.close_database()
+
+    def test_archived_file_is_copied_again(self) -> None:
+        db = Database(TEST_DB, cache_size=0, replica=True)
+        # archiving isn't logged, the replica still has the moved reservation claiming its cells
+        conn = sqlite3.connect(TEST_DB)
+        schema.archive_reservations(conn, datetime(2050, 1, 4))
+        conn.close()
+        db.insert("Jan Nowak", datetime(2050, 1, 3, 8, 0), datetime(2050, 1, 3, 9, 0))
+        self.assertEqual(self.names(db), ["Adam Kowalski", "Jan Nowak"])
+        self.assertEqual([reservation.court for reservation in db.get_reservations(self.MONDAY, self.MONDAY
+                                                                                   + timedelta(days=1))], [1, 1])
+        db.close_database()
+
+    def tearDown(self) -> None:
+        self.other.close_database()
+        if os.path.exists(TEST_DB):
+            os.remove(TEST_DB)
+
+
+def _book(backend, db_file: str, worker: int) -> int:
+    database = backend(db_file, cache_size=0)
+    rng = random.Random(worker)
+    booked = 0
+    for _ in range(100):
+        start_time = datetime(2050, 1, 3, 8, 0) + timedelta(days=rng.randrange(2), minutes=30 * rng.randrange(21))
+        booked += database.book_if_free(f"Player {worker}", start_time, start_time + timedelta(minutes=60),
+                                        rng.choice([None, 1])) is not None
+    database.close_database()
+    return booked
+
+
+class TestBookIfFree(unittest.TestCase):
+
+    def setUp(self) -> None:
+        if os.path.exists(TEST_DB):
+            os.remove(TEST_DB)
+
+    def test_book_if_free(self) -> None:
+        for backend in (Database, DatabaseORM):
+            db = backend(TEST_DB)
+            self.assertEqual(db.book_if_free("Adam Kowalski", datetime(2050, 1, 1, 12, 0),
+                                             datetime(2050, 1, 1, 13, 0)), 1)
+            self.assertIsNone(db.book_if_free("Jan Nowak", datetime(2050, 1, 1, 12, 30),
+                                              datetime(2050, 1, 1, 13, 0), 1))
+            self.assertEqual(db.book_if_free("Jan Nowak", datetime(2050, 1, 1, 12, 30), datetime(2050, 1, 1, 13, 0)), 2)
+            self.assertEqual(db.book_if_free("Jan Nowak", datetime(2050, 1, 1, 13, 0), datetime(2050, 1, 1, 14, 0)), 1)
+            self.assertEqual(db.get_reserved_times(datetime(2050, 1, 1)),
+                             [(datetime(2050, 1, 1, 12, 0), datetime(2050, 1, 1, 13, 0)),
+                              (datetime(2050, 1, 1, 12, 30), datetime(2050, 1, 1, 13, 0)),
+                              (datetime(2050, 1, 1, 13, 0), datetime(2050, 1, 1, 14, 0))])
+            db.close_database()
+            os.remove(TEST_DB)
+
+    def test_no_double_booking_across_processes(self) -> None:
+        for backend in (Database, DatabaseORM):
+            backend(TEST_DB).close_database()
+            with multiprocessing.get_context("spawn").Pool(4) as pool:
+                booked = sum(pool.starmap(_book, [(backend, TEST_DB, worker) for worker in range(4)]))
+
+            conn = sqlite3.connect(TEST_DB)
+            self.assertEqual(conn.execute("PRAGMA journal_mode").fetchone()[0], "wal")
+            self.assertEqual(conn.execute("SELECT COUNT(*) FROM clients").fetchone()[0], booked)
+            self.assertEqual(conn.execute("SELECT COUNT(*) FROM clients a JOIN clients b ON a.id < b.id "
+                                          "AND a.court = b.court AND a.start_time < b.end_time "
+                                          "AND b.start_time < a.end_time").fetchone()[0], 0)
+            conn.close()
+            os.remove(TEST_DB)
+
+    def tearDown(self) -> None:
+        if os.path.exists(TEST_DB):
+            os.remove(TEST_DB)
+
+
+class TestWeeklyLimit(unittest.TestCase):
+
+    def test_week_range(self) -> None:
+        self.assertEqual(slots.week_range(datetime(2050, 1, 2, 16, 0)),
+                         (datetime(2049, 12, 27), datetime(2050, 1, 3)))
+        self.assertEqual(slots.week_range(datetime(2050, 1, 3, 8, 0)),
+                         (datetime(2050, 1, 3), datetime(2050, 1, 10)))
+
+    def test_same_week_number_of_other_year(self) -> None:
+        for backend in (Database, DatabaseORM):
+            db = backend(TEST_DB)
+            # 2049-12-30 and 2050-12-29 are both in ISO week 52
+            db.insert("Jan Nowak", datetime(2049, 12, 30, 12, 0), datetime(2049, 12, 30, 13, 0))
+            db.insert("Jan Nowak", datetime(2049, 12, 31, 12, 0), datetime(2049, 12, 31, 13, 0))
+            db.insert("Jan Nowak", datetime(2050, 12, 27, 12, 0), datetime(2050, 12, 27, 13, 0))
+            self.assertTrue(db.check_too_many_reservations("Jan Nowak", datetime(2050, 12, 29, 12, 0)))
+            db.insert("Jan Nowak", datetime(2050, 12, 26, 12, 0), datetime(2050, 12, 26, 13, 0))
+            db.insert("Jan Nowak", datetime(2051, 1, 1, 12, 0), datetime(2051, 1, 1, 13, 0))
+            self.assertFalse(db.check_too_many_reservations("Jan Nowak", datetime(2050, 12, 29, 12, 0)))
+            # the next monday is outside of the week
+            self.assertTrue(db.check_too_many_reservations("Jan Nowak", datetime(2051, 1, 2, 12, 0)))
+            db.close_database()
+            os.remove(TEST_DB)
+
+
+class TestQueryPlans(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.conn = sqlite3.connect(TEST_DB)
+        schema.migrate(self.conn)
+
+    def assertUsesIndex(self, sql: str, params: tuple) -> None:
+        plan = " ".join(row[3] for row in self.conn.execute("EXPLAIN QUERY PLAN " + sql, params))
+        # MAX() of the primary key is a single seek, reported without the key it uses
+        if plan != "SEARCH changes":
+            self.assertIn("USING", plan, sql)
+        self.assertNotIn("SCAN clients", plan, sql)
+        self.assertNotIn("SCAN changes", plan, sql)
+
+    def test_database_queries_use_indexes(self) -> None:
+        statements = []
+        with patch("sqlite3.connect", side_effect=lambda *args, **kwargs: self.__traced(statements, *args, **kwargs)):
+            db = Database(TEST_DB, cache_size=0)
+        self.__run_queries(db)
+        db.close_database()
+        self.assertGreaterEqual(len(statements), 6)
+        for sql in statements:
+            if sql.startswith(("SELECT", "DELETE")):
+                self.assertUsesIndex(sql, ())
+
+    def test_database_orm_queries_use_indexes(self) -> None:
+        statements = []
+        db = DatabaseORM(TEST_DB, cache_size=0)
+        event.listen(db.engine, "before_cursor_execute",
+                     lambda conn, cursor, sql, params, context, many: statements.append((sql, params)))
+        self.__run_queries(db)
+        db.close_database()
+        self.assertGreaterEqual(len(statements), 6)
+        for sql, params in statements:
+            if sql.startswith(("SELECT", "DELETE")):
+                self.assertUsesIndex(sql, params)
+
+    @staticmethod
+    def __traced(statements: list, *args, **kwargs):
+        conn = sqlite3.Connection(*args, **kwargs)
+        conn.set_trace_callback(statements.append)
+        return conn
+
+    @staticmethod
+    def __run_queries(db) -> None:
+        db.check_availability(datetime(2050, 1, 1, 12, 0), datetime(2050, 1, 1, 13, 0))
+        db.get_reservations(datetime(2050, 1, 1), datetime(2050, 1, 8))
+        db.check_too_many_reservations("Adam Kowalski", datetime(2050, 1, 1, 12, 0))
+        db.get_reserved_times(datetime(2050, 1, 1, 12, 0))
+        db.get_user_reserved_times("Adam Kowalski", datetime(2050, 1, 1, 12, 0))
+        db.delete("Adam Kowalski", datetime(2050, 1, 1, 12, 0))
+        # per court lookups seek the court first, off the grid too
+        db.check_availability(datetime(2050, 1, 1, 12, 15), datetime(2050, 1, 1, 13, 15), 5)
+        db.free_court(datetime(2050, 1, 1, 12, 15), datetime(2050, 1, 1, 13, 15))
+        db.get_free_slots(datetime(2050, 1, 1), datetime(2050, 1, 7), 5)
+        db.get_free_slots(datetime(2050, 1, 1), datetime(2050, 1, 7))
+        db.delete("Adam Kowalski", datetime(2050, 1, 1, 12, 0), 5)
+        db.book_series("Adam Kowalski", [(datetime(2050, 1, 1, 12, 0), datetime(2050, 1, 1, 13, 0)),
+                                         (datetime(2050, 1, 8, 12, 0), datetime(2050, 1, 8, 13, 0))])
+        list(db.iter_changes(1))
+        db.count_changes(datetime(2050, 1, 1), datetime(2050, 1, 8))
+
+    def tearDown(self) -> None:
+        self.conn.close()
+        os.remove(TEST_DB)
+
+
+class TestScheduleCache(unittest.TestCase):
+
+    def test_lru_eviction(self) -> None:
+        cache = ScheduleCache(2)
+        loads = []
+
+        def load(first_day, last_day):
+            loads.append((first_day, last_day))
+            return []
+
+        cache.read(date(2050, 1, 1), date(2050, 1, 2), load)
+        cache.read(date(2050, 1, 1), date(2050, 1, 1), load)
+        cache.read(date(2050, 1, 3), date(2050, 1, 3), load)
+        # 02.01 was the least recently used day
+        cache.read(date(2050, 1, 1), date(2050, 1, 2), load)
+        # longer than the cache -> not cached at all
+        cache.read(date(2050, 1, 1), date(2050, 1, 3), load)
+        self.assertEqual(loads, [(date(2050, 1, 1), date(2050, 1, 2)), (date(2050, 1, 3), date(2050, 1, 3)),
+                                 (date(2050, 1, 2), date(2050, 1, 2)), (date(2050, 1, 1), date(2050, 1, 3))])
+        self.assertEqual((cache.stats()["hits"], cache.stats()["misses"]), (2, 4))
+
+    def test_writes_invalidate_days(self) -> None:
+        for backend in (Database, DatabaseORM):
+            db = backend(TEST_DB, cache_size=8)
+            self.assertEqual(db.get_reservations(datetime(2050, 1, 1), datetime(2050, 1, 3)), [])
+            db.insert("Adam Kowalski", datetime(2050, 1, 2, 12, 0), datetime(2050, 1, 2, 13, 0))
+            self.assertEqual(db.get_reservations(datetime(2050, 1, 1), datetime(2050, 1, 3)),
+                             [("Adam Kowalski", datetime(2050, 1, 2, 12, 0), datetime(2050, 1, 2, 13, 0), 1)])
+            self.assertEqual(db.get_reserved_times(datetime(2050, 1, 2, 8, 0)),
+                             [(datetime(2050, 1, 2, 12, 0), datetime(2050, 1, 2, 13, 0))])
+            # 01.01 and 03.01 stayed cached, 02.01 was read again after the insert and then hit
+            self.assertEqual((db.cache_stats()["hits"], db.cache_stats()["misses"]), (3, 4), backend.__name__)
+            db.delete("Adam Kowalski", datetime(2050, 1, 2, 12, 0))
+            self.assertEqual(db.get_reserved_times(datetime(2050, 1, 2, 8, 0)), [])
+            db.insert_many([("Jan Nowak", datetime(2050, 1, 3, 8, 0), datetime(2050, 1, 3, 9, 0))])
+            self.assertEqual(db.get_reserved_times_range(datetime(2050, 1, 1), datetime(2050, 1, 3)),
+                             [(datetime(2050, 1, 3, 8, 0), datetime(2050, 1, 3, 9, 0))])
+            db.close_database()
+            os.remove(TEST_DB)
+
+    def test_cached_minutes(self) -> None:
+        # the cached rows are epoch minutes for both formats, bounds inside a minute round like the datetimes
+        for time_format in ("text", "epoch"):
+            db = Database(TEST_DB, cache_size=8, time_format=time_format)
+            db.insert("Adam Kowalski", datetime(2050, 1, 1, 12, 0), datetime(2050, 1, 1, 13, 0))
+            db.insert("Jan Nowak", datetime(2050, 1, 2, 23, 30), datetime(2050, 1, 3, 0, 30))
+            adam = ("Adam Kowalski", datetime(2050, 1, 1, 12, 0), datetime(2050, 1, 1, 13, 0), 1)
+            jan = ("Jan Nowak", datetime(2050, 1, 2, 23, 30), datetime(2050, 1, 3, 0, 30), 1)
+            for start_date, end_date, expected in [(datetime(2050, 1, 1), datetime(2050, 1, 3, 1, 0), [adam, jan]),
+                                                   (datetime(2050, 1, 1, 12, 0, 30), datetime(2050, 1, 3, 1, 0), [jan]),
+                                                   (datetime(2050, 1, 1), datetime(2050, 1, 1, 13, 0, 30), [adam]),
+                                                   (datetime(2050, 1, 1), datetime(2050, 1, 3, 0, 29, 59), [adam])]:
+                self.assertEqual(db.get_reservations(start_date, end_date), expected, (time_format, start_date))
+            self.assertEqual(db.get_reserved_times_range(datetime(2050, 1, 1), datetime(2050, 1, 3)),
+                             [(datetime(2050, 1, 1, 12, 0), datetime(2050, 1, 1, 13, 0)),
+                              (datetime(2050, 1, 2, 23, 30), datetime(2050, 1, 3, 0, 30))])
+            db.close_database()
+            os.remove(TEST_DB)
+
+    def test_writes_of_other_connections(self) -> None:
+        for backend in (Database, DatabaseORM):
+            db, other = backend(TEST_DB, cache_size=8), backend(TEST_DB, cache_size=8)
+            self.assertEqual(db.get_reservations(datetime(2050, 1, 1), datetime(2050, 1, 3)), [])
+            other.insert("Adam Kowalski", datetime(2050, 1, 2, 12, 0), datetime(2050, 1, 2, 13, 0))
+            self.assertEqual(db.get_reservations(datetime(2050, 1, 1), datetime(2050, 1, 3)),
+                             [("Adam Kowalski", datetime(2050, 1, 2, 12, 0), datetime(2050, 1, 2, 13, 0), 1)])
+            other.delete("Adam Kowalski", datetime(2050, 1, 2, 12, 0))
+            self.assertEqual(db.get_reserved_times_range(datetime(2050, 1, 1), datetime(2050, 1, 3)), [])
+            # nothing written since -> served from the cache
+            hits = db.cache_stats()["hits"]
+            db.get_reservations(datetime(2050, 1, 1), datetime(2050, 1, 3))
+            self.assertEqual(db.cache_stats()["hits"], hits + 3)
+            db.close_database()
+            other.close_database()
+            os.remove(TEST_DB)
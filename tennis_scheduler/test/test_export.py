@@ -0,0 +1,106 @@
+import gzip
+import json
+import os
+import tempfile
+import unittest
+from datetime import datetime
+
+from tennis_scheduler.reservation import export
+from tennis_scheduler.reservation.database.database import Database
+from tennis_scheduler.reservation.database.database_orm import DatabaseORM
+from tennis_scheduler.reservation.importer import read_reservations
+
+RESERVATIONS = [("Szymon Szymański", datetime(2050, 3, 21, 14, 30), datetime(2050, 3, 21, 15, 30), 1),
+                ("Andrzej Zapasnik", datetime(2050, 3, 21, 15, 30), datetime(2050, 3, 21, 17, 0), 2),
+                ("John Smith", datetime(2050, 3, 23, 12, 0), datetime(2050, 3, 23, 13, 0), 12)]
+
+
+def entry(reservation: tuple) -> dict:
+    return {"name": reservation[0],
+            "start_time": reservation[1].strftime("%H:%M"),
+            "end_time": reservation[2].strftime("%H:%M"),
+            "court": reservation[3]}
+
+
+class TestExport(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.directory = tempfile.TemporaryDirectory()
+        self.filename = os.path.join(self.directory.name, "export")
+
+    def read(self, extension: str) -> str:
+        with open(self.filename + extension, encoding="utf-8") as file:
+            return file.read()
+
+    def test_save_to_json(self) -> None:
+        export.save_to_json(self.filename, iter(RESERVATIONS), datetime(2050, 3, 20), datetime(2050, 3, 24))
+        expected = {"20.03": [], "21.03": [entry(RESERVATIONS[0]), entry(RESERVATIONS[1])], "22.03": [],
+                    "23.03": [entry(RESERVATIONS[2])], "24.03": []}
+        self.assertEqual(self.read(".json"), json.dumps(expected, indent=2))
+
+        export.save_to_json(self.filename, iter([]), datetime(2050, 3, 20), datetime(2050, 3, 20))
+        self.assertEqual(self.read(".json"), json.dumps({"20.03": []}, indent=2))
+
+    def test_save_to_json_no_empty(self) -> None:
+        export.save_to_json_no_empty(self.filename, iter(RESERVATIONS))
+        expected = {"21.03": [entry(RESERVATIONS[0]), entry(RESERVATIONS[1])], "23.03": [entry(RESERVATIONS[2])]}
+        self.assertEqual(self.read(".json"), json.dumps(expected, indent=2))
+
+        export.save_to_json_no_empty(self.filename, iter([]))
+        self.assertEqual(self.read(".json"), json.dumps({}, indent=2))
+
+    def test_save_to_csv_compressed(self) -> None:
+        export.save_to_csv(self.filename, iter(RESERVATIONS), compress=True)
+        with gzip.open(self.filename + ".csv.gz", "rt", encoding="utf-8") as file:
+            self.assertEqual(file.read().splitlines(),
+                             ["name,start_time,end_time,court",
+                              "Szymon Szymański,2050-03-21 14:30:00,2050-03-21 15:30:00,1",
+                              "Andrzej Zapasnik,2050-03-21 15:30:00,2050-03-21 17:00:00,2",
+                              "John Smith,2050-03-23 12:00:00,2050-03-23 13:00:00,12"])
+
+    def test_save_to_ndjson_can_be_imported(self) -> None:
+        export.save_to_ndjson(self.filename, iter(RESERVATIONS))
+        self.assertEqual([row[1:] for row in read_reservations(self.filename + ".ndjson")],
+                         [(name, str(start_time), str(end_time), court)
+                          for name, start_time, end_time, court in RESERVATIONS])
+
+    def test_iter_reservations(self) -> None:
+        for backend in (Database, DatabaseORM):
+            db = backend(os.path.join(self.directory.name, backend.__name__ + ".sqlite"))
+            for reservation in RESERVATIONS:
+                db.insert(*reservation)
+            # overlapping rows are rejected by the slot grid of a court, the extra rows are on other courts
+            db.insert("Jan Nowak", datetime(2050, 3, 21, 15, 0), datetime(2050, 3, 21, 15, 30), 3)
+            db.insert("Ewa Lis", datetime(2050, 3, 21, 15, 30), datetime(2050, 3, 21, 16, 0), 1)
+            self.assertEqual([tuple(row) for row in db.iter_reservations(datetime(2050, 3, 21), datetime(2050, 3, 24),
+                                                                         chunk_size=2)],
+                             [tuple(row) for row in db.get_reservations(datetime(2050, 3, 21),
+                                                                        datetime(2050, 3, 24))])
+            self.assertEqual([row[3] for row in db.iter_reservations(datetime(2050, 3, 21, 15, 0),
+                                                                     datetime(2050, 3, 23), chunk_size=1)], [3, 1, 2])
+            db.close_database()
+
+    def test_save_changes_since_watermark(self) -> None:
+        for backend in (Database, DatabaseORM):
+            db = backend(os.path.join(self.directory.name, backend.__name__ + ".sqlite"))
+            filename = os.path.join(self.directory.name, backend.__name__)
+            db.insert_many(RESERVATIONS[:2])
+            self.assertEqual(export.save_changes_since_watermark(db, filename), (2, 2))
+            db.delete(*RESERVATIONS[0][:2])
+            db.insert(*RESERVATIONS[2])
+            self.assertEqual(export.save_changes_since_watermark(db, filename), (2, 4))
+            with open(filename + ".csv", encoding="utf-8") as file:
+                self.assertEqual(file.read().splitlines(),
+                                 ["seq,operation,name,start_time,end_time,court",
+                                  "3,cancel,Szymon Szymański,2050-03-21 14:30:00,2050-03-21 15:30:00,1",
+                                  "4,add,John Smith,2050-03-23 12:00:00,2050-03-23 13:00:00,12"])
+            # nothing changed -> an empty file and the same watermark
+            self.assertEqual(export.save_changes_since_watermark(db, filename), (0, 4))
+            self.assertEqual(export.read_watermark(filename), 4)
+            self.assertEqual(export.save_changes_since_watermark(db, filename + "_all", "ndjson", True), (4, 4))
+            with gzip.open(filename + "_all.ndjson.gz", "rt", encoding="utf-8") as file:
+                self.assertEqual([json.loads(line)["operation"] for line in file], ["add", "add", "cancel", "add"])
+            db.close_database()
+
+    def tearDown(self) -> None:
+        self.directory.cleanup()
@@ -0,0 +1,107 @@
+import json
+import os
+import unittest
+from datetime import datetime
+from unittest.mock import patch
+
+from tennis_scheduler.reservation.database.database import Database
+from tennis_scheduler.reservation.database.database_orm import DatabaseORM
+from tennis_scheduler.reservation.importer import ReservationImporter
+
+TEST_DB = "test_import_db.sqlite"
+TEST_FILE = "test_import"
+
+
+class TestImporter(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.db = Database(TEST_DB)
+        self.db.insert("Adam Kowalski", datetime(2050, 1, 3, 12, 0), datetime(2050, 1, 3, 13, 0))
+        self.importer = ReservationImporter(self.db)
+
+    def test_import_csv(self) -> None:
+        with open(TEST_FILE + ".csv", "w", encoding="utf-8") as file:
+            file.write("name,start_time,end_time,court\n"
+                       "Jan Nowak,2050-01-03 13:00:00,2050-01-03 14:00:00,1\n"
+                       # conflicts with the database
+                       "Jan Nowak,2050-01-03 12:30:00,2050-01-03 13:00:00,1\n"
+                       # conflicts with the row accepted above
+                       "Szymon Szymański,2050-01-03 13:30:00,2050-01-03 15:00:00,1\n"
+                       "jan nowak,2050-01-04 12:00:00,2050-01-04 13:00:00,1\n"
+                       "Jan Nowak,2050-01-04 12:15:00,2050-01-04 13:15:00,1\n"
+                       "Jan Nowak,2050-01-04 18:30:00,2050-01-04 19:00:00,1\n"
+                       "Jan Nowak,2050-01-04 17:00:00,2050-01-04 19:00:00,1\n"
+                       "Jan Nowak,2050-01-04 08:00:00,2050-01-04 09:30:00,1\n"
+                       # no court -> the first court free at 12:00
+                       "Ewa Lis,2050-01-03 12:00:00,2050-01-03 13:00:00,\n"
+                       "Ewa Lis,2050-01-05 12:00:00,2050-01-05 13:00:00,13\n")
+        with patch("os.system") as system:
+            report = self.importer.import_file(TEST_FILE + ".csv")
+        system.assert_not_called()
+
+        self.assertEqual(report.accepted, 3)
+        self.assertEqual([rejection[0] for rejection in report.rejected], [3, 4, 5, 6, 7, 8, 11])
+        self.assertIn("already booked", report.rejected[0][5])
+        self.assertIn("Invalid name", report.rejected[2][5])
+        self.assertIn("Minutes must be", report.rejected[3][5])
+        self.assertIn("Invalid court", report.rejected[6][5])
+        self.assertEqual(self.db.get_reservations(datetime(2050, 1, 3), datetime(2050, 1, 5)),
+                         [("Adam Kowalski", datetime(2050, 1, 3, 12, 0), datetime(2050, 1, 3, 13, 0), 1),
+                          ("Ewa Lis", datetime(2050, 1, 3, 12, 0), datetime(2050, 1, 3, 13, 0), 2),
+                          ("Jan Nowak", datetime(2050, 1, 3, 13, 0), datetime(2050, 1, 3, 14, 0), 1),
+                          ("Jan Nowak", datetime(2050, 1, 4, 8, 0), datetime(2050, 1, 4, 9, 30), 1)])
+
+    def test_import_jsonl_weekly_limit(self) -> None:
+        with open(TEST_FILE + ".jsonl", "w", encoding="utf-8") as file:
+            for day in range(4, 9):
+                file.write(json.dumps({"name": "Adam Kowalski",
+                                       "start_time": f"2050-01-0{day} 10:00:00",
+                                       "end_time": f"2050-01-0{day} 11:00:00"}) + "\n")
+            file.write("not json\n")
+            # valid json, but not an object
+            file.write("[1, 2]\n42\n")
+        report = self.importer.import_file(TEST_FILE + ".jsonl")
+        # one reservation is already in the database, so two more fit in the week
+        self.assertEqual(report.accepted, 2)
+        self.assertEqual([rejection[0] for rejection in report.rejected], [3, 4, 5, 6, 7, 8])
+        self.assertIn("2 reservations in a week", report.rejected[0][5])
+        self.assertEqual({rejection[5] for rejection in report.rejected[3:]},
+                         {"Not a reservation, a row needs name, start_time and end_time."})
+
+    def test_time_booked_during_the_import(self) -> None:
+        other = Database(TEST_DB)
+
+        def rows():
+            yield 1, "Jan Nowak", "2050-01-03 13:00:00", "2050-01-03 14:00:00", 1
+            # another kiosk books after the week was read, the importer's view of it is stale
+            other.insert("Ewa Lis", datetime(2050, 1, 3, 14, 0), datetime(2050, 1, 3, 15, 0), 1)
+            yield 2, "Jan Nowak", "2050-01-03 14:00:00", "2050-01-03 15:00:00", 1
+            yield 3, "Marek Lis", "2050-01-03 14:00:00", "2050-01-03 15:00:00", None
+
+        report = self.importer.import_reservations(rows())
+        other.close_database()
+        self.assertEqual(report.accepted, 2)
+        self.assertEqual(report.rejected, [(2, "Jan Nowak", "2050-01-03 14:00:00", "2050-01-03 15:00:00", 1,
+                                            "The time is already booked.")])
+        # the row without a court went to the first court free when it was booked
+        self.assertEqual(self.db.get_reservations(datetime(2050, 1, 3, 14, 0), datetime(2050, 1, 3, 15, 0)),
+                         [("Ewa Lis", datetime(2050, 1, 3, 14, 0), datetime(2050, 1, 3, 15, 0), 1),
+                          ("Marek Lis", datetime(2050, 1, 3, 14, 0), datetime(2050, 1, 3, 15, 0), 2)])
+
+    def test_import_json_export(self) -> None:
+        with open(TEST_FILE + ".json", "w", encoding="utf-8") as file:
+            json.dump({"03.01": [{"name": "Jan Nowak", "start_time": "14:00", "end_time": "15:00"}],
+                       "04.01": []}, file)
+        db = DatabaseORM(TEST_DB)
+        report = ReservationImporter(db).import_file(TEST_FILE + ".json", 2050)
+        db.close_database()
+        self.assertEqual((report.accepted, report.rejected), (1, []))
+        self.assertFalse(self.db.check_availability(datetime(2050, 1, 3, 14, 0), datetime(2050, 1, 3, 14, 30), 1))
+        self.assertTrue(self.db.check_availability(datetime(2050, 1, 3, 14, 0), datetime(2050, 1, 3, 14, 30)))
+
+    def tearDown(self) -> None:
+        self.db.close_database()
+        os.remove(TEST_DB)
+        for extension in [".csv", ".json", ".jsonl"]:
+            if os.path.exists(TEST_FILE + extension):
+                os.remove(TEST_FILE + extension)
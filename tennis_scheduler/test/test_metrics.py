@@ -0,0 +1,66 @@
+import io
+import json
+import os
+import unittest
+from datetime import datetime
+
+from tennis_scheduler.reservation import metrics
+from tennis_scheduler.reservation.batch import CommandRunner
+from tennis_scheduler.reservation.database.database import Database
+from tennis_scheduler.reservation.reservation_validator import Validator
+
+TEST_DB = "test_metrics_db.sqlite"
+
+
+class TestMetrics(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.insert = Database.insert
+        metrics.reset()
+        metrics.enable()
+        self.db = Database(TEST_DB)
+
+    def test_database_calls(self) -> None:
+        self.db.insert("Adam Kowalski", datetime(2050, 1, 1, 12, 0), datetime(2050, 1, 1, 13, 0))
+        self.db.insert("Jan Nowak", datetime(2050, 1, 1, 13, 0), datetime(2050, 1, 1, 14, 0))
+        self.assertEqual(len(self.db.get_reservations(datetime(2050, 1, 1), datetime(2050, 1, 2))), 2)
+        self.assertEqual(len(list(self.db.iter_reservations(datetime(2050, 1, 1), datetime(2050, 1, 2)))), 2)
+        self.db.check_availability(datetime(2050, 1, 1, 12, 0), datetime(2050, 1, 1, 12, 30))
+
+        operations = metrics.snapshot(self.db)["operations"]
+        self.assertEqual(operations["Database.insert"]["calls"], 2)
+        self.assertEqual(sum(operations["Database.insert"]["histogram_us"].values()), 2)
+        self.assertEqual((operations["Database.get_reservations"]["rows"],
+                          operations["Database.get_reservations"]["max_rows"]), (2, 2))
+        self.assertEqual(operations["Database.iter_reservations"]["rows"], 2)
+        self.assertEqual(operations["Database.check_availability"]["rows"], 0)
+        self.assertIn("hit_rate", metrics.snapshot(self.db)["cache"])
+
+    def test_validator_checks(self) -> None:
+        validator = Validator(TEST_DB)
+        # static checks keep working through the instance and the class
+        self.assertEqual(validator._invalid_booking_format(2, datetime(2050, 1, 1, 12, 0)), 60)
+        self.assertEqual(Validator._invalid_booking_format(1, datetime(2050, 1, 1, 12, 0)), 30)
+        self.assertTrue(validator._check_availability(datetime(2050, 1, 1, 12, 0), datetime(2050, 1, 1, 13, 0)))
+
+        output = io.StringIO()
+        CommandRunner(validator).run([json.dumps({"command": "metrics"})], output)
+        result = json.loads(output.getvalue())
+        self.assertTrue(result["metrics"]["enabled"])
+        operations = result["metrics"]["operations"]
+        self.assertEqual(operations["Validator._invalid_booking_format"]["calls"], 2)
+        self.assertEqual(operations["Validator._check_availability"]["calls"], 1)
+        self.assertEqual(operations["DatabaseORM.free_court"]["calls"], 1)
+        validator._database.close_database()
+
+    def test_disable(self) -> None:
+        metrics.disable()
+        self.assertIs(Database.insert, self.insert)
+        self.db.insert("Adam Kowalski", datetime(2050, 1, 1, 12, 0), datetime(2050, 1, 1, 13, 0))
+        self.assertEqual(metrics.snapshot(), {"enabled": False, "operations": {}})
+
+    def tearDown(self) -> None:
+        metrics.disable()
+        metrics.reset()
+        self.db.close_database()
+        os.remove(TEST_DB)
@@ -3,18 +3,30 @@ import unittest
 from datetime import datetime, timedelta
 from unittest.mock import patch
 
-from tennis_scheduler.reservation.database.database_orm import DatabaseORM
-from tennis_scheduler.reservation.database.database import Database
 from tennis_scheduler.reservation.reservation_validator import Validator
 
 TEST_DB = "test_db.sqlite"
 
 
+def list_search_closest(date_start: datetime, book_time: int, reserved: list):
+    """ closest time of the original list search over the half-hour times of one court, None when none is free """
+    times = []
+    start_time = date_start.replace(hour=8, minute=0, second=0, microsecond=0)
+    while start_time < date_start.replace(hour=18, minute=30, second=0, microsecond=0):
+        times.append([start_time, start_time + timedelta(minutes=30)])
+        start_time += timedelta(minutes=30)
+    free = [time for time in times if not any(start <= time[0] < end for start, end in reserved)]
+    final_times = [free[i][0] for i in range(len(free) - book_time // 30 + 1)
+                   if free[i][0] + timedelta(minutes=book_time) == free[i + book_time // 30 - 1][1]]
+    return min(final_times, key=lambda x: abs(x - date_start)) if final_times else None
+
+
 class TestValidator(unittest.TestCase):
+    BACKEND = "orm"
 
     def setUp(self) -> None:
-        # create new database for each test
-        self.db = DatabaseORM(TEST_DB)
+        self.validator = Validator(TEST_DB, self.BACKEND)
+        self.db = self.validator._database
         self.db.insert("Adam Kowalski", datetime(2050, 1, 1, 12, 0), datetime(2050, 1, 1, 13, 0))
         self.db.insert("Adam Kowalski", datetime(2050, 1, 2, 12, 0), datetime(2050, 1, 2, 13, 0))
         self.db.insert("Adam Kowalski", datetime(2049, 12, 30, 16, 0), datetime(2049, 12, 30, 16, 30))
@@ -23,8 +35,6 @@ class TestValidator(unittest.TestCase):
         self.db.insert("Szymon Szymański", datetime(2050, 1, 1, 8, 0), datetime(2050, 1, 1, 9, 0))
         self.db.insert("Błażej Błażejowski", datetime(2050, 1, 2, 16, 0), datetime(2050, 1, 2, 17, 0))
 
-        self.validator = Validator(TEST_DB)
-
     @patch('tennis_scheduler.reservation.reservation_validator.Validator._invalid_name',
            return_value='Marek Kowalski')
     def test_invalid_name(self, mock_input) -> None:
@@ -97,25 +107,109 @@ class TestValidator(unittest.TestCase):
         self.assertTrue(self.validator._check_if_not_in_past(datetime.now() + timedelta(minutes=60, seconds=1)))
 
     def test_check_availability(self) -> None:
-        self.assertTrue(self.validator._check_availability(datetime(2050, 1, 2, 14, 0), datetime(2050, 1, 2, 15, 30)))
-        self.assertIsNone(self.validator._check_availability(datetime(2050, 1, 1, 13, 30), datetime(2050, 1, 1, 14, 0)))
-        self.assertTrue(self.validator._check_availability(datetime(2050, 1, 1, 14, 0), datetime(2050, 1, 1, 15, 0)))
+        self.assertEqual(self.validator._check_availability(datetime(2050, 1, 2, 14, 0),
+                                                            datetime(2050, 1, 2, 15, 30), 1), 1)
+        self.assertIsNone(self.validator._check_availability(datetime(2050, 1, 1, 13, 30),
+                                                             datetime(2050, 1, 1, 14, 0), 1))
+        self.assertEqual(self.validator._check_availability(datetime(2050, 1, 1, 14, 0),
+                                                            datetime(2050, 1, 1, 15, 0), 1), 1)
+        # court 1 is taken, any court -> the next one
+        self.assertEqual(self.validator._check_availability(datetime(2050, 1, 1, 13, 30),
+                                                            datetime(2050, 1, 1, 14, 0)), 2)
+        self.assertEqual(self.validator._check_availability(datetime(2050, 1, 1, 13, 30),
+                                                            datetime(2050, 1, 1, 14, 0), 12), 12)
 
     def test_check_closest_reservation(self) -> None:
         self.assertEqual(self.validator._check_closest_reservation
-                         (datetime(2050, 1, 1, 12, 0), 60), datetime(2050, 1, 1, 11, 0))
+                         (datetime(2050, 1, 1, 12, 0), 60, court=1), (1, datetime(2050, 1, 1, 11, 0)))
         self.assertEqual(self.validator._check_closest_reservation
-                         (datetime(2050, 1, 1, 12, 0), 90), datetime(2050, 1, 1, 10, 30))
+                         (datetime(2050, 1, 1, 12, 0), 90, court=1), (1, datetime(2050, 1, 1, 10, 30)))
         self.assertEqual(self.validator._check_closest_reservation
-                         (datetime(2049, 12, 30, 16, 0), 30), datetime(2049, 12, 30, 15, 30))
-        self.assertEqual(self.validator._check_closest_reservation(datetime(2050, 1, 1, 14, 30), 90),
-                         datetime(2050, 1, 1, 16, 30))
-        self.assertEqual(self.validator._check_closest_reservation(datetime(2050, 1, 2, 16, 30), 60),
-                         datetime(2050, 1, 2, 17, 0))
+                         (datetime(2049, 12, 30, 16, 0), 30, court=1), (1, datetime(2049, 12, 30, 15, 30)))
+        self.assertEqual(self.validator._check_closest_reservation(datetime(2050, 1, 1, 14, 30), 90, court=1),
+                         (1, datetime(2050, 1, 1, 16, 30)))
+        self.assertEqual(self.validator._check_closest_reservation(datetime(2050, 1, 2, 16, 30), 60, court=1),
+                         (1, datetime(2050, 1, 2, 17, 0)))
+        # the same time on another court is closer than any time on court 1
+        self.assertEqual(self.validator._check_closest_reservation(datetime(2050, 1, 1, 12, 0), 60),
+                         (2, datetime(2050, 1, 1, 12, 0)))
+        for court in range(2, 13):
+            self.db.insert("Jan Nowak", datetime(2050, 1, 1, 12, 0), datetime(2050, 1, 1, 13, 0), court)
+        self.assertEqual(self.validator._check_closest_reservation(datetime(2050, 1, 1, 12, 0), 60),
+                         (1, datetime(2050, 1, 1, 11, 0)))
+        self.assertEqual(self.validator._check_closest_reservation(datetime(2050, 1, 1, 12, 30), 30),
+                         (2, datetime(2050, 1, 1, 13, 0)))
+
+    def test_closest_matches_list_search(self) -> None:
+        # the slot masks keep the answers of the list search they replaced, off the grid times too
+        for day in [datetime(2049, 12, 30), datetime(2050, 1, 1), datetime(2050, 1, 2)]:
+            reserved = self.db.get_reserved_times(day)
+            for minutes in range(8 * 60, 18 * 60 + 1, 15):
+                date_start = day + timedelta(minutes=minutes)
+                for book_time in range(30, 181, 30):
+                    expected = list_search_closest(date_start, book_time, reserved)
+                    self.assertEqual(self.validator._check_closest_reservation(date_start, book_time, court=1),
+                                     None if expected is None else (1, expected), (date_start, book_time))
+
+    def test_check_next_available_times(self) -> None:
+        self.assertEqual(self.validator._check_next_available_times(datetime(2050, 1, 1, 12, 0), 60, court=1),
+                         [(1, datetime(2050, 1, 1, 11, 0)), (1, datetime(2050, 1, 1, 10, 30)),
+                          (1, datetime(2050, 1, 1, 10, 0))])
+        self.assertEqual(self.validator._check_next_available_times(datetime(2050, 1, 1, 12, 0), 60),
+                         [(2, datetime(2050, 1, 1, 12, 0)), (2, datetime(2050, 1, 1, 11, 30)),
+                          (2, datetime(2050, 1, 1, 12, 30))])
+        self.validator._database.insert("Jan Nowak", datetime(2050, 1, 5, 8, 0), datetime(2050, 1, 5, 18, 30))
+        self.assertIsNone(self.validator._check_closest_reservation(datetime(2050, 1, 5, 12, 0), 30, court=1))
+        self.assertEqual(self.validator._check_next_available_times(datetime(2050, 1, 5, 12, 0), 90, count=2,
+                                                                    court=1),
+                         [(1, datetime(2050, 1, 6, 8, 0)), (1, datetime(2050, 1, 6, 8, 30))])
+        self.assertIsNone(self.validator._check_next_available_times(datetime(2050, 1, 5, 12, 0), 90, days=1,
+                                                                     court=1))
+        self.assertEqual(self.validator._check_next_available_times(datetime(2050, 1, 5, 12, 0), 90, count=1,
+                                                                    days=1),
+                         [(2, datetime(2050, 1, 5, 12, 0))])
 
-    def test_get_base_available_times(self) -> None:
-        self.assertIsNotNone(self.validator._get_base_available_times(datetime(2050, 1, 1, 16, 0)))
-        self.assertIsNotNone(self.validator._get_base_available_times(datetime(2050, 1, 2, 11, 0)))
+    def test_book_series(self) -> None:
+        self.assertEqual(self.validator._series_dates(datetime(2050, 1, 1, 12, 0), "biweekly",
+                                                      datetime(2050, 1, 29)),
+                         [datetime(2050, 1, 1, 12, 0), datetime(2050, 1, 15, 12, 0), datetime(2050, 1, 29, 12, 0)])
+        self.db.insert("Jan Nowak", datetime(2050, 1, 15, 12, 0), datetime(2050, 1, 15, 13, 0))
+        self.assertEqual(self.validator._book_series("Ewa Lis", datetime(2050, 1, 1, 12, 0), 60, "weekly",
+                                                     datetime(2050, 1, 21), court=1),
+                         [(datetime(2050, 1, 1, 12, 0), None, None, "already booked"),
+                          (datetime(2050, 1, 8, 12, 0), 1, datetime(2050, 1, 8, 12, 0), None),
+                          (datetime(2050, 1, 15, 12, 0), None, None, "already booked")])
+        # every court but 12 is taken on 15.01 -> the series goes there, the closest time on court 1 otherwise
+        for court in range(2, 12):
+            self.db.insert("Jan Nowak", datetime(2050, 1, 15, 12, 0), datetime(2050, 1, 15, 13, 0), court)
+        self.assertEqual(self.validator._book_series("Marek Lis", datetime(2050, 1, 8, 12, 0), 60, "weekly",
+                                                     datetime(2050, 1, 15)),
+                         [(datetime(2050, 1, 8, 12, 0), 2, datetime(2050, 1, 8, 12, 0), None),
+                          (datetime(2050, 1, 15, 12, 0), 12, datetime(2050, 1, 15, 12, 0), None)])
+        self.assertEqual(self.validator._book_series("Ewa Lis", datetime(2050, 1, 1, 12, 0), 60, "weekly",
+                                                     datetime(2050, 1, 15), court=1, fallback=True),
+                         [(datetime(2050, 1, 1, 12, 0), 1, datetime(2050, 1, 1, 11, 0), None),
+                          (datetime(2050, 1, 8, 12, 0), 1, datetime(2050, 1, 8, 11, 0), None),
+                          (datetime(2050, 1, 15, 12, 0), 1, datetime(2050, 1, 15, 11, 0), None)])
+        # Adam Kowalski has 3 reservations in the week of 01.01
+        self.assertEqual(self.validator._book_series("Adam Kowalski", datetime(2050, 1, 2, 8, 0), 30, "weekly",
+                                                     datetime(2050, 1, 9))[0][3],
+                         "more than 2 reservations in the week")
+
+    def test_check_series_conditions(self) -> None:
+        self.assertTrue(self.validator._check_series_conditions(datetime(2050, 1, 1, 12, 0), datetime(2050, 6, 1)))
+        self.assertIsNone(self.validator._check_series_conditions(datetime(2050, 1, 1, 19, 0), datetime(2050, 6, 1)))
+        self.assertIsNone(self.validator._check_series_conditions(datetime(2050, 1, 1, 12, 0), datetime(2049, 6, 1)))
+        self.assertIsNone(self.validator._check_series_conditions(datetime(2050, 1, 1, 12, 0), datetime(2051, 6, 1)))
+        self.assertEqual(self.validator._invalid_repeat_format("weekly"), "weekly")
+        self.assertIsNone(self.validator._invalid_repeat_format("daily"))
+
+    def test_get_first_available_time(self) -> None:
+        # days other than today start at 8:00
+        self.assertEqual(self.validator._get_first_available_time(datetime(2050, 1, 1, 16, 0)),
+                         datetime(2050, 1, 1, 8, 0))
+        # today it depends on the current time, it stays on the half-hour grid
+        self.assertIn(self.validator._get_first_available_time(datetime.now()).minute, (0, 30))
 
     def test_check_if_can_cancel(self) -> None:
         self.assertEqual(self.validator._check_if_can_cancel
@@ -158,9 +252,15 @@ class TestValidator(unittest.TestCase):
         self.assertIsNone(self.validator._invalid_choice_json_format("nOpE"))
 
     def tearDown(self) -> None:
-        if hasattr(self.db, "close_database"):
-            self.db.close_database()
+        self.db.close_database()
+        # every test starts from the same reservations
+        if os.path.exists(TEST_DB):
+            os.remove(TEST_DB)
+
+
+class TestValidatorRaw(TestValidator):
+    BACKEND = "raw"
+
 
-    @classmethod
-    def tearDownClass(cls) -> None:
-        os.remove(TEST_DB)
+class TestValidatorMemory(TestValidator):
+    BACKEND = "memory"
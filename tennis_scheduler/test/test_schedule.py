@@ -0,0 +1,50 @@
+import unittest
+from datetime import date, datetime
+
+from tennis_scheduler.reservation.database.memory import MemoryDatabase
+from tennis_scheduler.reservation.schedule import Reservation, Reservations
+
+
+class TestReservations(unittest.TestCase):
+    ROWS = [("Jan Nowak", datetime(2050, 1, 3, 8, 0), datetime(2050, 1, 3, 9, 30), 1),
+            ("Ewa Lis", datetime(2050, 1, 3, 12, 0), datetime(2050, 1, 3, 12, 30), 2),
+            ("Jan Nowak", datetime(2050, 1, 5, 23, 30), datetime(2050, 1, 6, 0, 30), 12)]
+
+    def test_columns(self) -> None:
+        reservations = Reservations.from_rows(iter(self.ROWS), date(2050, 1, 3), 4)
+        self.assertEqual(list(reservations.starts), [8 * 60, 12 * 60, 2 * 1440 + 23 * 60 + 30])
+        self.assertEqual(list(reservations.ends), [9 * 60 + 30, 12 * 60 + 30, 3 * 1440 + 30])
+        self.assertEqual(list(reservations.courts), [1, 2, 12])
+        # the same name is kept once
+        self.assertIs(reservations.names[0], reservations.names[2])
+        self.assertEqual(reservations, self.ROWS)
+        self.assertEqual(reservations[-1], self.ROWS[-1])
+        self.assertEqual(reservations[1:], self.ROWS[1:])
+        with self.assertRaises(IndexError):
+            reservations[3]
+
+    def test_days(self) -> None:
+        reservations = Reservations.from_rows(self.ROWS, date(2050, 1, 3), 4)
+        self.assertEqual(reservations.days, 4)
+        self.assertEqual(list(reservations.day_offsets), [0, 2, 2, 3, 3])
+        self.assertEqual(reservations.date(2), date(2050, 1, 5))
+        self.assertEqual(reservations.day(0), self.ROWS[:2])
+        self.assertEqual(reservations.day(1), [])
+        self.assertEqual(reservations.day(2), self.ROWS[2:])
+
+    def test_record(self) -> None:
+        reservation = Reservation(*self.ROWS[0])
+        name, start_time, end_time, court = reservation
+        self.assertEqual((name, start_time, end_time, court), self.ROWS[0])
+        self.assertEqual((reservation.name, reservation[1], reservation.court), ("Jan Nowak", self.ROWS[0][1], 1))
+        self.assertEqual(hash(reservation), hash(self.ROWS[0]))
+        self.assertFalse(hasattr(reservation, "__dict__"))
+
+    def test_backend_result(self) -> None:
+        db = MemoryDatabase()
+        db.insert_many(self.ROWS)
+        reservations = db.get_reservations(datetime(2050, 1, 3), datetime(2050, 1, 7))
+        self.assertIsInstance(reservations, Reservations)
+        self.assertEqual(reservations, self.ROWS)
+        self.assertEqual(reservations.days, 5)
+        self.assertEqual(db.get_reservations(datetime(2050, 1, 7), datetime(2050, 1, 3)), [])
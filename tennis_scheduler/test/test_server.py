@@ -0,0 +1,103 @@
+import asyncio
+import json
+import os
+import unittest
+from unittest.mock import patch
+
+from tennis_scheduler.reservation.batch import CommandRunner
+from tennis_scheduler.reservation.reservation_validator import Validator
+from tennis_scheduler.reservation.server import ReservationServer
+
+TEST_DB = "test_server_db.sqlite"
+
+
+async def read_response(reader: asyncio.StreamReader) -> tuple:
+    status = int((await reader.readline()).split()[1])
+    headers = {}
+    while True:
+        line = (await reader.readline()).decode()
+        if line == "\r\n":
+            break
+        name, _, value = line.partition(":")
+        headers[name.lower()] = value.strip()
+    return status, headers, json.loads(await reader.readexactly(int(headers["content-length"])))
+
+
+class TestReservationServer(unittest.IsolatedAsyncioTestCase):
+
+    async def asyncSetUp(self) -> None:
+        self.validator = Validator(TEST_DB)
+        self.server = ReservationServer(self.validator, workers=2)
+        host, port = await self.server.start("127.0.0.1", 0)
+        self.reader, self.writer = await asyncio.open_connection(host, port)
+
+    async def test_pipelined_requests(self) -> None:
+        body = json.dumps({"name": "John Smith", "date": "10.07.2050 15:30", "duration": 60, "court": 1}).encode()
+        # all requests are sent before any response is read
+        self.writer.write(b"POST /reservations HTTP/1.1\r\nContent-Length: " + str(len(body)).encode() +
+                          b"\r\n\r\n" + body +
+                          b"POST /reservations HTTP/1.1\r\nContent-Length: " + str(len(body)).encode() +
+                          b"\r\n\r\n" + body +
+                          b"GET /schedule?start=10.07.2050&end=11.07.2050 HTTP/1.1\r\n\r\n"
+                          b"GET /closest?date=10.07.2050+15%3A30&duration=30&count=2&court=1 HTTP/1.1\r\n\r\n"
+                          b"DELETE /reservations?name=John+Smith&date=10.07.2050+15%3A30 HTTP/1.1\r\n\r\n")
+        await self.writer.drain()
+
+        status, headers, result = await read_response(self.reader)
+        self.assertEqual((status, headers["connection"], result["status"]), (200, "keep-alive", "ok"))
+        status, _, result = await read_response(self.reader)
+        self.assertEqual((status, result), (409, {"status": "unavailable", "closest": "10.07.2050 15:30", "court": 2}))
+        status, _, result = await read_response(self.reader)
+        self.assertEqual(result["reservations"], [{"name": "John Smith", "start_time": "10.07.2050 15:30",
+                                                   "end_time": "10.07.2050 16:30", "court": 1}])
+        status, _, result = await read_response(self.reader)
+        self.assertEqual((result["times"], result["courts"]), (["10.07.2050 15:00", "10.07.2050 14:30"], [1, 1]))
+        status, _, result = await read_response(self.reader)
+        self.assertEqual((status, result), (200, {"status": "ok"}))
+
+    async def test_errors(self) -> None:
+        self.writer.write(b"GET /nothing HTTP/1.1\r\n\r\n"
+                          b"GET /reservations HTTP/1.1\r\n\r\n"
+                          b"POST /reservations HTTP/1.1\r\nContent-Length: 2\r\n\r\n[]"
+                          b"GET /schedule?start=10.07.2050&end=30.07.2050 HTTP/1.1\r\nConnection: close\r\n\r\n")
+        await self.writer.drain()
+        self.assertEqual((await read_response(self.reader))[0], 404)
+        self.assertEqual((await read_response(self.reader))[0], 405)
+        self.assertEqual((await read_response(self.reader))[0], 400)
+        status, headers, result = await read_response(self.reader)
+        self.assertEqual((status, headers["connection"]), (400, "close"))
+        self.assertIn("only 7 days", result["message"])
+        self.assertEqual(await self.reader.read(), b"")
+
+    async def test_malformed_requests(self) -> None:
+        # lines longer than the 64 KiB limit of the reader and a negative body length are answered and closed
+        host, port = self.writer.get_extra_info("peername")[:2]
+        for request, status in [(b"GET /" + b"a" * 70000 + b" HTTP/1.1\r\n\r\n", 400),
+                                (b"GET /metrics HTTP/1.1\r\nX-Long: " + b"a" * 70000 + b"\r\n\r\n", 431),
+                                (b"POST /reservations HTTP/1.1\r\nContent-Length: -5\r\n\r\n", 400)]:
+            reader, writer = await asyncio.open_connection(host, port)
+            writer.write(request)
+            await writer.drain()
+            response_status, headers, result = await read_response(reader)
+            self.assertEqual((response_status, headers["connection"], result["status"]), (status, "close", "error"))
+            self.assertEqual(await reader.read(), b"")
+            writer.close()
+
+    async def test_unexpected_error(self) -> None:
+        self.writer.write(b"GET /schedule?start=10.07.2050&end=11.07.2050 HTTP/1.1\r\n\r\n")
+        await self.writer.drain()
+        with patch.object(CommandRunner, "execute", side_effect=RuntimeError("executor is gone")):
+            status, headers, result = await read_response(self.reader)
+        self.assertEqual((status, headers["connection"]), (500, "keep-alive"))
+        self.assertEqual(result, {"status": "error", "message": "Request failed -> RuntimeError: executor is gone"})
+        # the same connection still answers
+        self.writer.write(b"GET /schedule?start=10.07.2050&end=11.07.2050 HTTP/1.1\r\n\r\n")
+        await self.writer.drain()
+        status, _, result = await read_response(self.reader)
+        self.assertEqual((status, result["reservations"]), (200, []))
+
+    async def asyncTearDown(self) -> None:
+        self.writer.close()
+        await self.server.close()
+        self.validator._database.close_database()
+        os.remove(TEST_DB)
@@ -0,0 +1,68 @@
+import unittest
+from datetime import datetime
+
+from tennis_scheduler.reservation import slots
+
+
+class TestSlots(unittest.TestCase):
+
+    def test_slot_index(self) -> None:
+        self.assertEqual(slots.slot_index(datetime(2050, 1, 1, 8, 0)), 0)
+        self.assertEqual(slots.slot_index(datetime(2050, 1, 1, 18, 0)), 20)
+        self.assertEqual(slots.slot_index(datetime(2050, 1, 1, 18, 30)), slots.SLOTS_PER_DAY)
+        self.assertEqual(slots.slot_index(datetime(2050, 1, 1, 12, 10)), 9)
+        self.assertEqual(slots.slot_time(datetime(2050, 1, 1, 15, 0), 9), datetime(2050, 1, 1, 12, 30))
+
+    def test_free_mask_of_a_day(self) -> None:
+        day = datetime(2050, 1, 1)
+        self.assertEqual(slots.days_free_mask(day, 1, []), slots.FULL_DAY)
+        self.assertEqual(slots.days_free_mask(day, 1, [], 30), 0)
+        mask = slots.days_free_mask(day, 1, [(datetime(2050, 1, 1, 8, 0), datetime(2050, 1, 1, 9, 0)),
+                                             (datetime(2050, 1, 1, 18, 0), datetime(2050, 1, 1, 19, 0))], 1)
+        self.assertEqual(list(slots.iter_slots(mask)), list(range(2, 20)))
+
+    def test_run_starts(self) -> None:
+        mask = 0b1110111
+        self.assertEqual(list(slots.iter_slots(slots.run_starts(mask, 1))), [0, 1, 2, 4, 5, 6])
+        self.assertEqual(list(slots.iter_slots(slots.run_starts(mask, 3))), [0, 4])
+        self.assertEqual(slots.run_starts(mask, 4), 0)
+        # 90 minutes can't start at 17:30, there is no 18:30 slot
+        self.assertEqual(max(slots.iter_slots(slots.run_starts(slots.FULL_DAY, 3))), 18)
+
+    def test_days_free_mask(self) -> None:
+        first_day = datetime(2050, 1, 1, 12, 0)
+        mask = slots.days_free_mask(first_day, 2, [(datetime(2050, 1, 1, 8, 0), datetime(2050, 1, 1, 18, 30)),
+                                                   (datetime(2050, 1, 2, 8, 30), datetime(2050, 1, 2, 18, 30))])
+        self.assertEqual([slots.days_slot_time(first_day, bit) for bit in slots.iter_slots(mask)],
+                         [datetime(2050, 1, 2, 8, 0)])
+        # free slots at the end of a day and the start of the next one are not one run
+        mask = slots.days_free_mask(first_day, 2, [(datetime(2050, 1, 1, 8, 0), datetime(2050, 1, 1, 18, 0)),
+                                                   (datetime(2050, 1, 2, 8, 30), datetime(2050, 1, 2, 18, 30))])
+        self.assertEqual(slots.run_starts(mask, 2), 0)
+        self.assertEqual(slots.days_free_mask(first_day, 1, [], 10), slots.FULL_DAY & ~0b1111111111)
+
+    def test_courts_free_mask(self) -> None:
+        first_day = datetime(2050, 1, 1)
+        day = slots.day_number(first_day)
+        mask = slots.courts_free_mask(first_day, 2, [(1, day, 0), (12, day + 1, 20), (13, day, 0), (2, day + 2, 0)])
+        self.assertEqual(slots.court_mask(mask, 2, 1), slots.FULL_DAY & ~1 | slots.FULL_DAY << slots.DAY_STRIDE)
+        self.assertEqual(slots.court_mask(mask, 2, 2), slots.every_court(slots.FULL_DAY, 1, 2))
+        self.assertEqual(slots.court_mask(mask, 2, 12),
+                         slots.FULL_DAY | (slots.FULL_DAY & ~(1 << 20)) << slots.DAY_STRIDE)
+        self.assertEqual(slots.court_slot_time(first_day, 2, 0), (1, datetime(2050, 1, 1, 8, 0)))
+        self.assertEqual(slots.court_slot_time(first_day, 2, 3 * slots.DAY_STRIDE + 1),
+                         (2, datetime(2050, 1, 2, 8, 30)))
+        self.assertEqual(slots.court_slot_time(first_day, 1, slots.DAY_STRIDE, (5, 7)), (7, datetime(2050, 1, 1, 8, 0)))
+
+    def test_closest_court(self) -> None:
+        day = slots.day_number(datetime(2050, 1, 1))
+        # court 1 is taken 9:00-12:00, court 2 10:00-11:00
+        claimed = {(1, day): slots.range_mask(2, 8), (2, day): slots.range_mask(4, 6)}
+        self.assertEqual(slots.closest_court(claimed, datetime(2050, 1, 1, 10, 0), datetime(2050, 1, 1, 11, 0), (1,)),
+                         (1, datetime(2050, 1, 1, 8, 0)))
+        # 9:00 and 11:00 on court 2 are as close, the earlier time wins
+        self.assertEqual(slots.closest_court(claimed, datetime(2050, 1, 1, 10, 0), datetime(2050, 1, 1, 11, 0),
+                                             (1, 2)), (2, datetime(2050, 1, 1, 9, 0)))
+        self.assertEqual(claimed[(2, day)], slots.range_mask(2, 6))
+        self.assertIsNone(slots.closest_court(claimed, datetime(2050, 1, 1, 10, 0), datetime(2050, 1, 1, 11, 0),
+                                              (1,), first_slot=20))